@@ -67,8 +67,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'crm.profiling.ProfilingMiddleware',
 ]
 
+# Share of requests profiled by crm.profiling.ProfilingMiddleware (0 disables it, 1 profiles everything).
+# Results are kept in memory per process and shown to staff at /profiling/.
+CRM_PROFILING_SAMPLE_RATE = 0.0
+CRM_PROFILING_MAX_SAMPLES = 1000
+
+# Delivers new Messages to open event message streams. The default only reaches streams served by
+# the same process; with several ASGI workers use a class backed by shared pub/sub (see crm/broker.py).
+CRM_MESSAGE_BROKER = 'crm.broker.InProcessBroker'
+
+# Who gets the overdue task digest (crm/reminders.py). None sends it to every active staff user with an email.
+CRM_TASK_REMINDER_RECIPIENTS = None
+
 ROOT_URLCONF = 'DjangoProject.urls'
 
 TEMPLATES = [
@@ -105,6 +118,23 @@ DATABASES = {
 }
 
 
+# Cache
+# Web workers, the django_q cluster and management commands must share one cache: counters,
+# collection versions and cached pages written or invalidated by one are read by the others. A
+# per-process cache (LocMemCache, the default) would keep serving what another process changed.
+# Files work for processes on one host; with several hosts point this at Redis or Memcached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,  # Month grids, calendar feeds, counters and versions
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
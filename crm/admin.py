@@ -1,25 +1,80 @@
 from __future__ import unicode_literals
 
-import calendar
+import csv
 import datetime
-from calendar import HTMLCalendar
+import io
 
-from django.contrib import admin
-from django.urls import reverse
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q, Sum
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from django.utils.timezone import now
+from django.utils.timezone import localdate
 
-from .forms import ClientForm
-from .models import Client, Event, Task, Message, Vendor, Calendar
+from . import admin_calendar, ics, rollups, tasks, versions
+from .conversion import pending_batches, pending_leads
+from .forms import ClientForm, ContactImportForm
+from .pagination import EstimatedCountPaginator
+from .importers import guess_format, import_rows, read_rows
+from .dedupe import apply_suggestion
+from .models import (
+    Client, Event, Task, Message, Vendor, Calendar, Lead, LeadMergeSuggestion, LeadConversionBatch,
+    Email, EmailDeliveryBatch, RecurringEvent, RecurringSchedule, TaskReminderRun,
+)
 
 
 # Constants
-CALENDAR_CELL_WIDTH = 150
-CALENDAR_CELL_HEIGHT = 150
+IMPORT_REPORT_LIMIT = 500  # Error rows shown on the import page
+
+
+class ImportContactsMixin:
+    """Adds an "Import" page to the changelist that feeds an uploaded file to crm.importers."""
+    import_kind = None
+    change_list_template = 'admin/crm/import_change_list.html'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='%s_%s_import' % info),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Validate and bulk insert an uploaded file, then show the per-row error report."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ContactImportForm(request.POST or None, request.FILES or None)
+        report = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            file_format = form.cleaned_data['file_format'] or guess_format(upload.name)
+            try:
+                rows = read_rows(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), file_format)
+                report = import_rows(self.import_kind, rows, dry_run=form.cleaned_data['dry_run'])
+            except (ValueError, csv.Error) as error:
+                form.add_error('file', str(error))
+            else:
+                if report.ok and not report.dry_run:
+                    self.message_user(request, f"Imported {report.created} {self.model._meta.verbose_name_plural}.",
+                                      messages.SUCCESS)
+                    return redirect(f'admin:{self.model._meta.app_label}_{self.model._meta.model_name}_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f"Import {self.model._meta.verbose_name_plural}",
+            'opts': self.model._meta,
+            'form': form,
+            'report': report,
+            'errors': report.errors[:IMPORT_REPORT_LIMIT] if report else [],
+        }
+        return TemplateResponse(request, 'admin/crm/import_form.html', context)
 
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(ImportContactsMixin, admin.ModelAdmin):
+    import_kind = 'clients'
     form = ClientForm
     list_display = ('first_name', 'last_name', 'email', 'phone_number', 'created_at')
     search_fields = ('first_name', 'last_name', 'email')
@@ -30,29 +85,69 @@ class ClientAdmin(admin.ModelAdmin):
 class EventAdmin(admin.ModelAdmin):
     list_display = ('name', 'event_date', 'venue', 'status', 'client')
     list_filter = ('status', 'event_date')
+    list_select_related = ('client',)
     search_fields = ('name', 'venue')
     autocomplete_fields = ('client',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class OverdueFilter(admin.SimpleListFilter):
+    title = 'overdue'
+    parameter_name = 'overdue'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Yes'), ('no', 'No'))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(due_date__lt=localdate())
+        if self.value() == 'no':
+            return queryset.filter(due_date__gte=localdate())
+        return queryset
 
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ('description', 'event', 'due_date', 'is_completed', 'overdue')
-    list_filter = ('is_completed', 'due_date')
+    list_filter = ('is_completed', OverdueFilter, 'due_date')
+    list_select_related = ('event',)
     search_fields = ('description',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Computed by the database so the column can be sorted on and costs nothing per row
+        overdue = ExpressionWrapper(Q(due_date__lt=localdate()), output_field=BooleanField())
+        return super().get_queryset(request).annotate(is_overdue=overdue)
 
+    @admin.display(boolean=True, description='Overdue', ordering='is_overdue')
     def overdue(self, obj):
-        """Check if a task is overdue based on the current date."""
-        return obj.due_date and obj.due_date < now().date()
+        """Whether the task's due date has passed."""
+        return obj.is_overdue
+
 
-    overdue.boolean = True
-    overdue.short_description = 'Overdue'
+@admin.register(TaskReminderRun)
+class TaskReminderRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'started_at', 'finished_at', 'scanned_through', 'tasks_overdue', 'events', 'emails_queued',
+                    'error')
+    ordering = ('-started_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('sender', 'event', 'sent_at', 'preview_content')
     list_filter = ('sent_at',)
+    list_select_related = ('event',)
     search_fields = ('sender', 'content')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def preview_content(self, obj):
         """Display a preview of the message content."""
@@ -61,16 +156,84 @@ class MessageAdmin(admin.ModelAdmin):
     preview_content.short_description = "Content Preview"
 
 
+@admin.register(Lead)
+class LeadAdmin(ImportContactsMixin, admin.ModelAdmin):
+    import_kind = 'leads'
+    list_display = ('first_name', 'last_name', 'email', 'phone_number', 'status', 'inquiry_date', 'client')
+    list_filter = ('status',)
+    list_select_related = ('client',)
+    search_fields = ('first_name', 'last_name', 'email')
+    raw_id_fields = ('client',)
+    actions = ['convert_selected']
+
+    @admin.action(description="Convert selected leads to clients (in the background)")
+    def convert_selected(self, request, queryset):
+        if rollups.update_status(queryset.filter(client__isnull=True), 'converted'):
+            versions.bump(versions.LEADS)
+        queued = tasks.queue_conversions(pending_batches(leads=queryset))
+        self.message_user(request, f"Queued {queued} conversion batch(es), progress is under Lead conversion batches.",
+                          messages.SUCCESS)
+
+
+@admin.register(LeadConversionBatch)
+class LeadConversionBatchAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/crm/conversion_change_list.html'
+    list_display = ('id', 'started_at', 'finished_at', 'leads_converted', 'clients_created', 'clients_linked',
+                    'events_created', 'leads_failed', 'error')
+    list_filter = ('finished_at',)
+    ordering = ('-started_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        totals = LeadConversionBatch.objects.aggregate(
+            converted=Sum('leads_converted'), clients=Sum('clients_created'),
+            events=Sum('events_created'), failed=Sum('leads_failed'),
+        )
+        totals['pending'] = pending_leads().count()
+        extra_context = {**(extra_context or {}), 'conversion_totals': totals}
+        return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(LeadMergeSuggestion)
+class LeadMergeSuggestionAdmin(admin.ModelAdmin):
+    list_display = ('lead', 'duplicate_label', 'score', 'reasons', 'status', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('lead',)
+    ordering = ('status', '-score')
+    raw_id_fields = ('lead', 'duplicate')
+    actions = ['merge_selected', 'dismiss_selected']
+
+    @admin.action(description="Merge selected duplicates into their lead")
+    def merge_selected(self, request, queryset):
+        merged = sum(apply_suggestion(suggestion) for suggestion in queryset.filter(status='pending'))
+        self.message_user(request, f"Merged {merged} duplicate lead(s).", messages.SUCCESS)
+
+    @admin.action(description="Dismiss selected suggestions")
+    def dismiss_selected(self, request, queryset):
+        dismissed = queryset.filter(status='pending').update(status='dismissed')
+        self.message_user(request, f"Dismissed {dismissed} suggestion(s).", messages.SUCCESS)
+
+
 @admin.register(Vendor)
 class VendorAdmin(admin.ModelAdmin):
-    list_display = ('name', 'contact_email', 'phone_number', 'address', 'website')
+    list_display = ('name', 'contact_email', 'phone_number', 'address', 'website', 'calendar_feed')
     search_fields = ('name',)
 
+    @admin.display(description="Calendar")
+    def calendar_feed(self, obj):
+        """Subscription link for the vendor's events (crm/ics.py)."""
+        return format_html('<a href="{}">.ics</a>', ics.feed_url(ics.VENDOR, obj.pk))
+
 
 @admin.register(Calendar)
 class CalendarAdmin(admin.ModelAdmin):
     list_display = ['day', 'start_time', 'end_time', 'notes']
-    change_list_template = 'admin/events/change_list.html'
+    change_list_template = 'admin/crm/calendar_change_list.html'
 
     def changelist_view(self, request, extra_context=None):
         """Customize the changelist view to include a calendar."""
@@ -81,6 +244,7 @@ class CalendarAdmin(admin.ModelAdmin):
             'previous_month': self._get_month_url(selected_date, delta=-1),
             'next_month': self._get_month_url(selected_date, delta=1),
             'calendar': self._generate_calendar(selected_date),
+            'schedule_feed_url': ics.feed_url(ics.SCHEDULE),
         })
 
         return super().changelist_view(request, extra_context)
@@ -98,14 +262,81 @@ class CalendarAdmin(admin.ModelAdmin):
 
     def _get_month_url(self, date, delta):
         """Generate the URL for the previous or next month."""
-        target_month = date.replace(day=1) + datetime.timedelta(days=delta * 30)
-        target_month = target_month.replace(day=1)
-        return f"{reverse('admin:events_event_changelist')}?day__gte={target_month}"
+        return f"{reverse('admin:crm_calendar_changelist')}?day__gte={admin_calendar.shift_month(date, delta)}"
 
     def _generate_calendar(self, date):
-        """Generate an HTML calendar for the given date."""
-        cal = HTMLCalendar()
-        html_calendar = cal.formatmonth(date.year, date.month, withyear=True)
-        return mark_safe(html_calendar.replace(
-            '<td ', f'<td width="{CALENDAR_CELL_WIDTH}" height="{CALENDAR_CELL_HEIGHT}" '
+        """The month with its schedule entries and events, rendered once and cached until one of them changes."""
+        return mark_safe(admin_calendar.render_month(date.year, date.month))
+
+
+class RecurrenceAdminMixin:
+    """Rule fields grouped together; occurrences are not stored, so there is nothing else to edit."""
+    rule_fieldsets = (
+        ("Repeats", {'fields': ('frequency', 'interval', 'weekdays', 'starts_on', 'until', 'count')}),
+    )
+
+    @admin.display(description="Rule")
+    def rrule(self, obj):
+        return obj.rrule
+
+
+@admin.register(RecurringSchedule)
+class RecurringScheduleAdmin(RecurrenceAdminMixin, admin.ModelAdmin):
+    list_display = ['rrule', 'start_time', 'end_time', 'starts_on', 'until', 'notes']
+    list_filter = ['frequency']
+
+    def get_fieldsets(self, request, obj=None):
+        return ((None, {'fields': ('start_time', 'end_time', 'notes')}),) + self.rule_fieldsets
+
+
+@admin.register(RecurringEvent)
+class RecurringEventAdmin(RecurrenceAdminMixin, admin.ModelAdmin):
+    list_display = ['name', 'client', 'venue', 'rrule', 'start_time', 'end_time', 'starts_on', 'until', 'status']
+    list_filter = ['frequency', 'status']
+    list_select_related = ['client']
+    search_fields = ['name', 'venue']
+    raw_id_fields = ['client']
+
+    def get_fieldsets(self, request, obj=None):
+        fields = ('name', 'client', 'venue', 'start_time', 'end_time', 'status', 'description')
+        return ((None, {'fields': fields}),) + self.rule_fieldsets
+
+
+@admin.register(Email)
+class EmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'sender', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipient')
+    readonly_fields = ('attempts', 'next_attempt_at', 'claim', 'claimed_at', 'last_error')
+    actions = ['queue_selected']
+
+    @admin.action(description="Send selected emails (queued for delivery)")
+    def queue_selected(self, request, queryset):
+        queued = tasks.queue_emails(queryset)
+        self.message_user(request, f"Queued {queued} email(s); drafts and failed emails only.", messages.SUCCESS)
+
+
+@admin.register(EmailDeliveryBatch)
+class EmailDeliveryBatchAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/crm/delivery_change_list.html'
+    list_display = ('id', 'started_at', 'claimed', 'sent', 'retried', 'failed', 'duration_ms', 'per_second', 'error')
+    ordering = ('-started_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        totals = EmailDeliveryBatch.objects.aggregate(
+            sent=Sum('sent'), retried=Sum('retried'), failed=Sum('failed'), duration_ms=Sum('duration_ms'),
+        )
+        totals['per_second'] = (
+            round(totals['sent'] * 1000 / totals['duration_ms'], 1) if totals['duration_ms'] else None
+        )
+        totals.update(Email.objects.aggregate(
+            queued=Count('pk', filter=Q(status='queued')), sending=Count('pk', filter=Q(status='sending')),
         ))
+        extra_context = {**(extra_context or {}), 'delivery_totals': totals}
+        return super().changelist_view(request, extra_context=extra_context)
@@ -0,0 +1,152 @@
+"""
+The populated month table on the schedules admin changelist, cached per month. As in
+crm/month_grid.py, each month has a generation that ``invalidate_dates`` replaces after a write
+commits, and a table is only stored while the generation it was built under is still current.
+"""
+import calendar
+import uuid
+from datetime import date
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+
+from . import versions
+from .models import Calendar, Event
+from .recurrence import event_occurrences, schedule_occurrences
+
+CACHE_KEY_PREFIX = 'crm:admin-calendar:'
+CACHE_TIMEOUT = 60 * 60 * 24  # Entries are invalidated on save/delete, the timeout only bounds drift from bulk writes
+MAX_ENTRIES_PER_DAY = 6  # The rest of a busy day is behind "+N more" links to the filtered changelists
+CELL_WIDTH = 150
+CELL_HEIGHT = 150
+
+
+RULE_COLLECTIONS = (versions.RECURRING_SCHEDULES, versions.RECURRING_EVENTS)
+
+
+def _generation_key(year, month):
+    return f"{CACHE_KEY_PREFIX}{year}-{month:02d}"
+
+
+def _cache_key(year, month, generation):
+    # Recurring rules span many months, so changing one moves every key instead of a generation
+    rule_versions = versions.get_versions(RULE_COLLECTIONS)
+    suffix = '.'.join(str(rule_versions[collection][0]) for collection in RULE_COLLECTIONS)
+    return f"{_generation_key(year, month)}:{generation}:{suffix}"
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def generation(year, month):
+    """The month's current generation, starting a new one when the cache has none."""
+    key = _generation_key(year, month)
+    current = cache.get(key)
+    if current is None:
+        cache.add(key, _new_generation(), CACHE_TIMEOUT)
+        current = cache.get(key)  # Whoever added first wins
+    return current
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def shift_month(day, delta):
+    """First day of the month ``delta`` months away from ``day``'s month."""
+    index = day.year * 12 + (day.month - 1) + delta
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def load_entries(year, month):
+    """
+    Schedule entries and events of one month, one indexed range query each, bucketed by day, with
+    the occurrences of recurring schedules and events expanded for this month only. Every entry
+    is a (change page URL, label) pair; occurrences link to their rule.
+    """
+    first_day, last_day = month_bounds(year, month)
+    by_day = {}
+
+    def add(day, bucket, url, label):
+        by_day.setdefault(day, {'schedules': [], 'events': []})[bucket].append((url, label))
+
+    schedules = (
+        Calendar.objects.filter(day__range=(first_day, last_day)).order_by('day', 'start_time')
+        .values_list('id', 'day', 'start_time', 'end_time', 'notes')
+    )
+    for pk, day, start_time, end_time, notes in schedules:
+        add(day, 'schedules', reverse('admin:crm_calendar_change', args=[pk]),
+            f"{start_time:%H:%M}-{end_time:%H:%M} {notes or ''}".strip())
+    for row in schedule_occurrences(first_day, last_day):
+        add(row['day'], 'schedules', reverse('admin:crm_recurringschedule_change', args=[row['recurring_schedule']]),
+            f"{row['start_time']:%H:%M}-{row['end_time']:%H:%M} {row['notes'] or ''} (recurring)".strip())
+
+    events = (
+        Event.objects.filter(event_date__range=(first_day, last_day)).order_by('event_date', 'start')
+        .values_list('id', 'event_date', 'start', 'name')
+    )
+    for pk, day, start, name in events:
+        add(day, 'events', reverse('admin:crm_event_change', args=[pk]), f"{start:%H:%M} {name}")
+    for row in event_occurrences(first_day, last_day):
+        add(row['event_date'], 'events', reverse('admin:crm_recurringevent_change', args=[row['recurring_event']]),
+            f"{row['start']:%H:%M} {row['name']} (recurring)")
+    return by_day
+
+
+class EntryCalendar(calendar.HTMLCalendar):
+    """HTMLCalendar whose day cells list that day's schedule entries and events, linked to the admin."""
+
+    def __init__(self, year, month, entries):
+        super().__init__()
+        self.year, self.month = year, month
+        self.entries = entries
+
+    def _links(self, items, css_class):
+        return format_html_join(
+            '', '<li class="{}"><a href="{}">{}</a></li>', ((css_class, url, label) for url, label in items),
+        )
+
+    def formatday(self, day, weekday):
+        if day == 0:
+            return super().formatday(day, weekday)
+        current = date(self.year, self.month, day)
+        entries = self.entries.get(current, {'schedules': [], 'events': []})
+        schedules, events = entries['schedules'], entries['events']
+        shown_schedules = schedules[:MAX_ENTRIES_PER_DAY]
+        shown_events = events[:max(MAX_ENTRIES_PER_DAY - len(shown_schedules), 0)]
+        # The rest of each kind is behind a link to that kind's changelist, filtered to the day
+        more = format_html_join('', '<li><a href="{}?{}={}">+{} more {}</a></li>', (
+            (reverse(changelist), day_field, current, hidden, label)
+            for changelist, day_field, hidden, label in (
+                ('admin:crm_calendar_changelist', 'day', len(schedules) - len(shown_schedules), 'schedules'),
+                ('admin:crm_event_changelist', 'event_date', len(events) - len(shown_events), 'events'),
+            )
+            if hidden
+        ))
+        return format_html(
+            '<td class="{}" width="{}" height="{}" valign="top"><strong>{}</strong><ul class="calendar-entries">{}{}{}</ul></td>',
+            self.cssclasses[weekday], CELL_WIDTH, CELL_HEIGHT, day,
+            self._links(shown_schedules, 'schedule'),
+            self._links(shown_events, 'event'),
+            more,
+        )
+
+
+def render_month(year, month):
+    """The month as an HTML table, served from the cache when nothing in it changed."""
+    current = generation(year, month)
+    key = _cache_key(year, month, current)
+    html = cache.get(key)
+    if html is None:
+        html = EntryCalendar(year, month, load_entries(year, month)).formatmonth(year, month, withyear=True)
+        if generation(year, month) == current:  # Otherwise a write committed while the rows were read
+            cache.set(key, html, CACHE_TIMEOUT)
+    return html
+
+
+def invalidate_dates(*days):
+    """Start new generations for the months of ``days``; call it once the write has committed."""
+    keys = {_generation_key(day.year, day.month) for day in days if day}
+    cache.set_many({key: _new_generation() for key in keys}, CACHE_TIMEOUT)
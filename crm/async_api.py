@@ -0,0 +1,193 @@
+"""
+Async versions of the read-only JSON endpoints, plus the live Message streams. Under ASGI (``DjangoProject.asgi``) these run on
+the event loop instead of holding a worker thread per request; under WSGI Django still serves them,
+wrapping each one in its own event loop. Independent queries are awaited together with
+``asyncio.gather``.
+"""
+import asyncio
+import heapq
+import json
+from datetime import date
+from operator import itemgetter
+
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from . import counters
+from .broker import MESSAGE_FIELDS, get_broker
+from .exports import aiter_values, streaming_export, EXPORT_FORMATS, JSON
+from .models import Calendar, Client, Event, Message, RecurringEvent, RecurringSchedule
+from .month_grid import grid_bounds
+from .pagination import EVENT_LIST_ORDERING
+from .recurrence import active_between, event_occurrences, schedule_occurrences
+from .views import EVENT_FEED_FIELDS, event_feed_row, feed_window
+
+CLIENT_LOOKUP_LIMIT = 20
+CLIENT_FIELDS = ('id', 'first_name', 'last_name', 'email', 'phone_number')
+STREAM_HEARTBEAT = 15      # Seconds between keep-alive comments on an idle stream
+STREAM_RETRY_MS = 3000     # Reconnect delay the browser's EventSource should use
+
+
+async def _feed_rows(start_date, end_date, windowed):
+    """Stored events from an async cursor, with the window's recurring occurrences merged in by date."""
+    events = Event.objects.all()
+    if windowed:
+        events = events.filter(event_date__range=(start_date, end_date))
+    rules = await _values(active_between(RecurringEvent.objects.all(), start_date, end_date))
+    occurrences = event_occurrences(start_date, end_date, rules=rules)
+    pending = next(occurrences, None)
+    async for row in aiter_values(events, EVENT_FEED_FIELDS, ordering=EVENT_LIST_ORDERING):
+        while pending is not None and pending['event_date'] < row['event_date']:
+            yield event_feed_row(pending)
+            pending = next(occurrences, None)
+        yield event_feed_row(row)
+    while pending is not None:
+        yield event_feed_row(pending)
+        pending = next(occurrences, None)
+
+
+async def _values(queryset):
+    return [row async for row in queryset]
+
+
+async def event_feed(request):
+    """Same feed as ``event_list_json``, streamed from an async cursor."""
+    export_format = request.GET.get('export', JSON)
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"Unknown export format '{export_format}'."}, status=400)
+    try:
+        window = feed_window(request.GET)
+    except ValueError:
+        return JsonResponse({'error': "Pass start and end as ISO dates."}, status=400)
+    return streaming_export(_feed_rows(*window), export_format)
+
+
+async def calendar_data(request):
+    """Events and schedule entries on the visible grid of ?year=&month=, loaded concurrently."""
+    today = date.today()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+        start_date, end_date = grid_bounds(year, month)
+    except ValueError:
+        return JsonResponse({'error': "Pass year and month as numbers, month between 1 and 12."}, status=400)
+
+    events, schedules, event_rules, schedule_rules = await asyncio.gather(
+        _values(
+            Event.objects.filter(event_date__range=(start_date, end_date)).order_by('event_date', 'start')
+            .values('id', 'name', 'event_date', 'start', 'end', 'venue', 'status')
+        ),
+        _values(
+            Calendar.objects.filter(day__range=(start_date, end_date)).order_by('day', 'start_time')
+            .values('id', 'day', 'start_time', 'end_time', 'notes')
+        ),
+        _values(active_between(RecurringEvent.objects.all(), start_date, end_date)),
+        _values(active_between(RecurringSchedule.objects.all(), start_date, end_date)),
+    )
+    # Occurrences carry the id of their rule in recurring_event / recurring_schedule
+    events = list(heapq.merge(
+        events, event_occurrences(start_date, end_date, rules=event_rules), key=itemgetter('event_date', 'start'),
+    ))
+    schedules = list(heapq.merge(
+        schedules, schedule_occurrences(start_date, end_date, rules=schedule_rules), key=itemgetter('day', 'start_time'),
+    ))
+    return JsonResponse({'start': start_date, 'end': end_date, 'events': events, 'schedules': schedules})
+
+
+@login_required
+async def dashboard_counts(request):
+    return JsonResponse(await counters.aget_counts())
+
+
+@login_required
+async def client_lookup(request):
+    """
+    ?email= or ?id= for one client with its event count and next event, ?q= for up to
+    ``CLIENT_LOOKUP_LIMIT`` clients whose last name or email starts with the text.
+    """
+    if request.GET.get('q'):
+        text = request.GET['q'].strip()
+        matches = Client.objects.filter(last_name__istartswith=text) | Client.objects.filter(email__istartswith=text)
+        clients = await _values(matches.order_by('last_name', 'first_name', 'id').values(*CLIENT_FIELDS)[:CLIENT_LOOKUP_LIMIT])
+        return JsonResponse({'clients': clients})
+
+    if request.GET.get('email'):
+        lookup = {'email__iexact': request.GET['email'].strip()}
+    elif request.GET.get('id', '').isdigit():
+        lookup = {'pk': int(request.GET['id'])}
+    else:
+        return JsonResponse({'error': "Pass email, id or q."}, status=400)
+    try:
+        client = await Client.objects.values(*CLIENT_FIELDS).aget(**lookup)
+    except Client.DoesNotExist:
+        return JsonResponse({'error': "No such client."}, status=404)
+
+    events = Event.objects.filter(client_id=client['id'])
+    event_count, next_event = await asyncio.gather(
+        events.acount(),
+        events.filter(start__gte=timezone.now()).order_by('start').values('id', 'name', 'start', 'venue').afirst(),
+    )
+    return JsonResponse({'client': client, 'event_count': event_count, 'next_event': next_event})
+
+
+def _server_sent_event(message):
+    data = json.dumps(message, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"id: {message['id']}\nevent: message\ndata: {data}\n\n"
+
+
+async def _message_events(event_id, last_id, live):
+    """
+    Messages after ``last_id`` from the database, then new ones as the broker publishes them.
+    Message ids grow with ``sent_at``, so the id doubles as the resume position.
+    """
+    broker = get_broker()
+    # Subscribe before the catch-up query, so a message saved in between is not lost
+    subscription = broker.subscribe(event_id) if live else None
+    try:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        delta = Message.objects.filter(event_id=event_id, pk__gt=last_id).order_by('pk').values(*MESSAGE_FIELDS)
+        async for message in delta:
+            yield _server_sent_event(message)
+            last_id = message['id']
+        if not live:
+            return
+
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                return  # Fell too far behind: the browser reconnects and resumes from the database
+            if message['id'] <= last_id:
+                continue
+            last_id = message['id']
+            yield _server_sent_event(message)
+    finally:
+        if subscription is not None:
+            broker.unsubscribe(subscription)
+
+
+async def message_stream(request, pk):
+    """
+    Server-sent events with the Messages of one Event. Reconnecting browsers send ``Last-Event-ID``
+    (or pass ?last_event_id=) and get only what they missed; without either the stream starts from
+    the thread's first message, so the catch-up query always runs. An idle stream costs one
+    coroutine and one queue under ASGI; under WSGI a stream would pin a thread, so there it sends
+    the catch-up and closes, and the browser polls by reconnecting every ``STREAM_RETRY_MS``.
+    """
+    if not await Event.objects.filter(pk=pk).aexists():
+        return JsonResponse({'error': "No such event."}, status=404)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    last_id = int(last_id) if last_id and last_id.isdigit() else 0
+
+    response = StreamingHttpResponse(
+        _message_events(pk, last_id, live=isinstance(request, ASGIRequest)), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
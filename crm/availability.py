@@ -0,0 +1,137 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+from typing import Any, NamedTuple
+
+from django.utils import timezone
+
+from .models import Calendar, Event, RecurringEvent
+from .recurrence import active_between, event_occurrences, schedule_occurrences
+
+MAX_RANGE_DAYS = 366
+MAX_MIN_HOURS = 24  # A slot never spans more than a day
+
+
+class Interval(NamedTuple):
+    start: datetime
+    end: datetime
+    source: Any = None  # ('event', pk), ('schedule', pk) or ('recurring_event' / 'recurring_schedule', rule pk)
+
+
+def merge(intervals):
+    """Sweep intervals sorted by start and fold overlapping or touching ones into busy blocks."""
+    merged = []
+    for interval in sorted(intervals, key=lambda item: item.start):
+        if merged and interval.start <= merged[-1][1]:
+            if interval.end > merged[-1][1]:
+                merged[-1][1] = interval.end
+        else:
+            merged.append([interval.start, interval.end])
+    return [Interval(start, end) for start, end in merged]
+
+
+class IntervalIndex:
+    """
+    Static interval index: items sorted by start with a running maximum of their ends,
+    plus the merged busy blocks. Overlap and free/busy lookups are a bisect away.
+    """
+
+    def __init__(self, intervals):
+        self.items = sorted(intervals, key=lambda item: item.start)
+        self.starts = [item.start for item in self.items]
+        self.max_ends = list(accumulate((item.end for item in self.items), max))
+        self.busy = merge(self.items)
+        self.busy_starts = [block.start for block in self.busy]
+
+    def __len__(self):
+        return len(self.items)
+
+    def overlapping(self, start, end):
+        """Every stored interval that overlaps [start, end)."""
+        found = []
+        for index in range(bisect_left(self.starts, end) - 1, -1, -1):
+            if self.max_ends[index] <= start:
+                break  # Nothing at or before this index reaches past ``start``
+            if self.items[index].end > start:
+                found.append(self.items[index])
+        found.reverse()
+        return found
+
+    def is_free(self, start, end):
+        index = bisect_right(self.busy_starts, start)
+        if index and self.busy[index - 1].end > start:
+            return False
+        return index == len(self.busy) or self.busy[index].start >= end
+
+    def free_slots(self, start, end, min_duration=timedelta(0)):
+        """Gaps between busy blocks inside [start, end) lasting at least ``min_duration``."""
+        slots = []
+        cursor = start
+        index = max(bisect_right(self.busy_starts, start) - 1, 0)
+        for block in self.busy[index:]:
+            if block.start >= end:
+                break
+            if block.end <= cursor:
+                continue
+            if block.start - cursor >= min_duration and block.start > cursor:
+                slots.append(Interval(cursor, block.start))
+            cursor = max(cursor, block.end)
+        if end - cursor >= min_duration and end > cursor:
+            slots.append(Interval(cursor, end))
+        return slots
+
+
+def _aware(day, moment):
+    return timezone.make_aware(datetime.combine(day, moment), timezone.get_current_timezone())
+
+
+def load_busy(start_date, end_date, venue=None):
+    """
+    Build an IntervalIndex of everything booked between two dates (inclusive): one query for
+    Events and one for Calendar schedules, plus one per kind of recurring rule, whose
+    occurrences are expanded for the window only. ``venue`` narrows the events; schedules always count.
+    """
+    window_start = _aware(start_date, time.min)
+    window_end = _aware(end_date + timedelta(days=1), time.min)
+
+    events = Event.objects.filter(
+        event_date__range=(start_date - timedelta(days=1), end_date),  # Include events running past midnight
+        start__lt=window_end,
+        end__gt=window_start,
+    )
+    if venue:
+        events = events.filter(venue=venue)
+    intervals = [Interval(start, end, ('event', pk)) for pk, start, end in events.values_list('id', 'start', 'end')]
+
+    rules = RecurringEvent.objects.filter(venue=venue) if venue else RecurringEvent.objects.all()
+    rules = active_between(rules, start_date - timedelta(days=1), end_date)
+    intervals.extend(
+        Interval(row['start'], row['end'], ('recurring_event', row['recurring_event']))
+        for row in event_occurrences(start_date - timedelta(days=1), end_date, rules=rules)
+        if row['start'] < window_end and row['end'] > window_start
+    )
+
+    schedules = Calendar.objects.filter(day__range=(start_date, end_date))
+    intervals.extend(
+        Interval(_aware(day, start_time), _aware(day, end_time), ('schedule', pk))
+        for pk, day, start_time, end_time in schedules.values_list('id', 'day', 'start_time', 'end_time')
+    )
+    intervals.extend(
+        Interval(_aware(row['day'], row['start_time']), _aware(row['day'], row['end_time']),
+                 ('recurring_schedule', row['recurring_schedule']))
+        for row in schedule_occurrences(start_date, end_date)
+    )
+    return IntervalIndex(intervals)
+
+
+def free_slots_by_day(start_date, end_date, min_duration=timedelta(0), opens=time.min, closes=None, venue=None):
+    """Return ``[(date, [Interval, ...]), ...]`` of free time within opening hours for each day."""
+    index = load_busy(start_date, end_date, venue=venue)
+    days = []
+    day = start_date
+    while day <= end_date:
+        day_start = _aware(day, opens)
+        day_end = _aware(day, closes) if closes else _aware(day + timedelta(days=1), time.min)
+        days.append((day, index.free_slots(day_start, day_end, min_duration)))
+        day += timedelta(days=1)
+    return days
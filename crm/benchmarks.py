@@ -0,0 +1,256 @@
+import asyncio
+import json
+import statistics
+import threading
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from time import perf_counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import AsyncClient, Client as TestClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Client, Event
+
+BENCHMARK_USERNAME = 'crm-benchmark'
+DEFAULT_ITERATIONS = 5
+DEFAULT_TOLERANCE = 0.25  # Allowed slowdown of the median before a case counts as a regression
+NOISE_FLOOR_MS = 2.0      # Ignore slowdowns smaller than this, they are timer noise
+DEFAULT_CONCURRENCY = 20
+DEFAULT_REQUESTS = 200
+
+
+class Result(NamedTuple):
+    name: str
+    url: str
+    median_ms: float
+    p95_ms: float
+    queries: int
+
+
+class ThroughputResult(NamedTuple):
+    name: str
+    sync_url: str
+    async_url: str
+    sync_rps: float
+    async_rps: float
+
+
+def _cases():
+    """(name, url) pairs that drive the real views against whatever data is in the database."""
+    cases = [
+        ('dashboard', reverse('dashboard')),
+        ('event_list', reverse('event_list')),
+        ('lead_list', reverse('lead_list')),
+        ('client_list', reverse('client_list')),
+        ('email_list', reverse('email')),
+        ('event_feed_json', reverse('event-list-json')),
+        ('event_feed_ndjson', reverse('event-list-json') + '?export=ndjson'),
+        ('api_events', reverse('api_events')),
+        ('api_events_export', reverse('api_events') + '?export=json'),
+        ('admin_event_changelist', reverse('admin:crm_event_changelist')),
+        ('admin_task_changelist', reverse('admin:crm_task_changelist')),
+        ('admin_message_changelist', reverse('admin:crm_message_changelist')),
+        ('admin_client_changelist', reverse('admin:crm_client_changelist')),
+    ]
+    latest = Event.objects.order_by('-event_date', '-id').only('id', 'event_date').first()
+    if latest:
+        day = latest.event_date
+        cases += [
+            ('calendar', f"{reverse('calendar')}?month={day.month}&year={day.year}"),
+            ('event_detail', reverse('event_detail', args=[latest.pk])),
+            ('availability_month', f"{reverse('api_availability')}?start={day.replace(day=1)}&end={day}&min_hours=2"),
+        ]
+    return cases
+
+
+def _host():
+    return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+
+
+class Login(NamedTuple):
+    user: object
+    sessions: list
+
+    def browser(self):
+        browser = TestClient(HTTP_HOST=_host())
+        browser.force_login(self.user)
+        self.sessions.append(browser.cookies[settings.SESSION_COOKIE_NAME].value)
+        return browser
+
+    async def abrowser(self):
+        browser = AsyncClient(HTTP_HOST=_host())
+        await browser.aforce_login(self.user)
+        self.sessions.append(browser.cookies[settings.SESSION_COOKIE_NAME].value)
+        return browser
+
+
+@contextmanager
+def _benchmark_login():
+    """
+    A temporary superuser with an unusable password to log the benchmark clients in as. The views
+    load the user from the session, so it has to be saved; it and its sessions are deleted on the way out.
+    """
+    user = get_user_model().objects.create_superuser(f'{BENCHMARK_USERNAME}-{uuid.uuid4().hex[:8]}', password=None)
+    login = Login(user, [])
+    try:
+        yield login
+    finally:
+        Session.objects.filter(session_key__in=login.sessions).delete()
+        user.delete()
+
+
+def _fetch(browser, url):
+    response = browser.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+    if response.streaming:
+        b''.join(response.streaming_content)  # Streaming bodies do their work while being consumed
+    return response
+
+
+def run(iterations=DEFAULT_ITERATIONS, only=None):
+    with _benchmark_login() as login:
+        return _run(login.browser(), iterations, only)
+
+
+def _run(browser, iterations, only):
+    results = []
+    for name, url in _cases():
+        if only and name not in only:
+            continue
+        _fetch(browser, url)  # Warm-up: connection, caches, template loading
+        timings = []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                started = perf_counter()
+                _fetch(browser, url)
+                timings.append((perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[max(0, -(-len(timings) * 95 // 100) - 1)]
+        results.append(Result(name, url, round(statistics.median(timings), 2), round(p95, 2), len(queries)))
+    return results
+
+
+def load_baseline(path):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as baseline_file:
+        json.dump({result.name: {'median_ms': result.median_ms, 'queries': result.queries} for result in results},
+                  baseline_file, indent=2, sort_keys=True)
+
+
+def regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Human readable descriptions of every case that got slower or needs more queries than the baseline."""
+    found = []
+    for result in results:
+        expected = baseline.get(result.name)
+        if not expected:
+            continue
+        allowed_ms = expected['median_ms'] * (1 + tolerance)
+        if result.median_ms > allowed_ms and result.median_ms - expected['median_ms'] > NOISE_FLOOR_MS:
+            found.append(f"{result.name}: median {result.median_ms}ms, baseline {expected['median_ms']}ms")
+        if result.queries > expected['queries']:
+            found.append(f"{result.name}: {result.queries} queries, baseline {expected['queries']}")
+    return found
+
+
+def _async_cases():
+    """(name, sync url, async url) pairs serving the same data from crm.views and crm.async_api."""
+    today = Event.objects.order_by('-event_date', '-id').values_list('event_date', flat=True).first()
+    month = f"?month={today.month}&year={today.year}" if today else ''
+    cases = [
+        ('event_feed', reverse('event-list-json'), reverse('async_event_feed')),
+        ('calendar', reverse('calendar') + month, reverse('async_calendar') + month),
+        ('dashboard', reverse('dashboard'), reverse('async_dashboard')),
+    ]
+    client_id = Client.objects.order_by('pk').values_list('pk', flat=True).first()
+    if client_id:
+        cases.append(
+            ('client', reverse('client_detail', args=[client_id]), f"{reverse('async_clients')}?id={client_id}")
+        )
+    return cases
+
+
+def _sync_throughput(login, urls, concurrency):
+    """Requests per second through the WSGI handler, ``concurrency`` threads each with their own client."""
+    local = threading.local()
+
+    def fetch(url):
+        if not hasattr(local, 'browser'):
+            local.browser = login.browser()
+        _fetch(local.browser, url)
+
+    started = perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(fetch, urls))
+    return len(urls) / (perf_counter() - started)
+
+
+async def _async_throughput(login, urls, concurrency):
+    """Requests per second through the ASGI handler, at most ``concurrency`` in flight on one event loop."""
+    browser = await login.abrowser()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def fetch(url):
+        async with slots:
+            response = await browser.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}")
+            if response.streaming:
+                [chunk async for chunk in response.streaming_content]
+
+    started = perf_counter()
+    await asyncio.gather(*(fetch(url) for url in urls))
+    return len(urls) / (perf_counter() - started)
+
+
+def _live_throughput(base_url, urls, concurrency, session_id):
+    """Requests per second against a running server, e.g. ``uvicorn DjangoProject.asgi:application``."""
+    cookie = f'{settings.SESSION_COOKIE_NAME}={session_id}'
+
+    def fetch(url):
+        request = urllib.request.Request(base_url.rstrip('/') + url, headers={'Cookie': cookie})
+        with urllib.request.urlopen(request) as response:
+            response.read()
+
+    started = perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(fetch, urls))
+    return len(urls) / (perf_counter() - started)
+
+
+def compare_async(concurrency=DEFAULT_CONCURRENCY, requests=DEFAULT_REQUESTS, base_url=None, only=None):
+    """
+    Throughput of each sync view against its async counterpart under ``concurrency`` parallel requests.
+    In process by default (WSGI handler with threads vs ASGI handler on an event loop); pass ``base_url``
+    to measure a real server instead, e.g. gunicorn for the sync side and uvicorn/daphne for the async one.
+    """
+    with _benchmark_login() as login:
+        return _compare_async(login, concurrency, requests, base_url, only)
+
+
+def _compare_async(login, concurrency, requests, base_url, only):
+    session_id = login.browser().cookies[settings.SESSION_COOKIE_NAME].value if base_url else None
+    results = []
+    for name, sync_url, async_url in _async_cases():
+        if only and name not in only:
+            continue
+        if base_url:
+            sync_rps = _live_throughput(base_url, [sync_url] * requests, concurrency, session_id)
+            async_rps = _live_throughput(base_url, [async_url] * requests, concurrency, session_id)
+        else:
+            sync_rps = _sync_throughput(login, [sync_url] * requests, concurrency)
+            async_rps = asyncio.run(_async_throughput(login, [async_url] * requests, concurrency))
+        results.append(ThroughputResult(name, sync_url, async_url, round(sync_rps, 1), round(async_rps, 1)))
+    return results
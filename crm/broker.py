@@ -0,0 +1,99 @@
+"""
+Fan-out of new Messages to the open server-sent event streams of their Event (see
+``crm.async_api.message_stream``). The default broker lives in the process: it reaches every
+stream served by the same ASGI worker. Deployments with several workers point
+``CRM_MESSAGE_BROKER`` at a class with the same ``publish``/``subscribe`` interface backed by
+something shared (Redis pub/sub, Postgres LISTEN/NOTIFY). Streams also resume from the
+database, so a missed publish only delays a message until the client reconnects.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = 'crm.broker.InProcessBroker'
+MESSAGE_FIELDS = ('id', 'sender', 'recipient', 'content', 'sent_at')
+SUBSCRIBER_QUEUE_SIZE = 1000  # A stream this far behind is closed; the client reconnects and resumes
+
+
+class Subscription:
+    """One open stream: an asyncio queue bound to the event loop that reads it."""
+
+    def __init__(self, key):
+        self.key = key
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, payload):
+        """Called on the subscriber's loop. A full queue means a stuck reader, which is then dropped."""
+        if self.queue.full():
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(payload)
+
+    async def get(self):
+        payload = await self.queue.get()
+        return None if self.overflowed else payload
+
+
+class InProcessBroker:
+    """
+    Subscribers keyed by event id. ``publish`` may be called from any thread (request threads,
+    django_q workers run inline); delivery is handed to each subscriber's event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, key):
+        subscription = Subscription(str(key))
+        with self._lock:
+            self._subscriptions[subscription.key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.key]
+
+    def publish(self, key, payload):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(str(key), ()))
+        for subscription in subscribers:
+            if not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.deliver, payload)
+        return len(subscribers)
+
+    def subscriber_count(self, key=None):
+        with self._lock:
+            if key is not None:
+                return len(self._subscriptions.get(str(key), ()))
+            return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'CRM_MESSAGE_BROKER', DEFAULT_BROKER))()
+    return _broker
+
+
+def message_payload(message):
+    return {field: getattr(message, field) for field in MESSAGE_FIELDS}
+
+
+def publish_message(message):
+    return get_broker().publish(message.event_id, message_payload(message))
@@ -0,0 +1,139 @@
+import heapq
+from collections import defaultdict
+from typing import Any, NamedTuple, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import Event, RecurringEvent
+from .recurrence import active_between, between, occurrence_span
+
+# Venues per range query, keeps the OR'ed WHERE clause well below SQLite's expression limits
+VENUES_PER_QUERY = 200
+
+
+class Booking(NamedTuple):
+    """A venue slot, either proposed by a caller or already stored as an Event."""
+    venue: str
+    event_date: Any
+    start: Any
+    end: Any
+    id: Any = None   # Primary key of the Event being rescheduled, if any
+    ref: Any = None  # Caller's handle for the proposal (row number, form prefix, ...) or the stored event's name
+    rule: Any = None  # Primary key of the RecurringEvent this is an occurrence of, if any
+
+    @classmethod
+    def from_event(cls, event, ref=None):
+        return cls(event.venue, event.event_date, event.start, event.end, event.pk, ref)
+
+
+class Conflict(NamedTuple):
+    booking: Booking   # Always one of the proposed bookings
+    other: Booking     # The stored event or other proposal it overlaps
+    existing: bool     # True when ``other`` is already in the database
+
+    def __str__(self):
+        what = f"event '{self.other.ref}'" if self.existing else f"proposed booking {self.other.ref}"
+        return f"{self.booking.venue} on {self.booking.event_date} overlaps {what}."
+
+
+def overlaps(a, b):
+    return a.venue == b.venue and a.event_date == b.event_date and a.start < b.end and a.end > b.start
+
+
+def rule_bookings(rule, start_date, end_date):
+    """Occurrences of a RecurringEvent between two dates, as bookings."""
+    for day in between(rule, start_date, end_date):
+        yield Booking(rule.venue, day, *occurrence_span(rule, day), ref=rule.name, rule=rule.pk)
+
+
+def existing_bookings(bookings):
+    """
+    Load every stored event that could overlap ``bookings`` with one indexed range query
+    per ``VENUES_PER_QUERY`` venues, plus the occurrences of recurring events at those venues
+    within the same windows. Events and rules being rescheduled are left out.
+    """
+    windows = {}
+    for booking in bookings:
+        low_date, high_date, low_start, high_end = windows.get(
+            booking.venue, (booking.event_date, booking.event_date, booking.start, booking.end)
+        )
+        windows[booking.venue] = (
+            min(low_date, booking.event_date), max(high_date, booking.event_date),
+            min(low_start, booking.start), max(high_end, booking.end),
+        )
+    moving = [booking.id for booking in bookings if booking.id is not None]
+    moving_rules = [booking.rule for booking in bookings if booking.rule is not None]
+
+    venues = list(windows)
+    found = []
+    for offset in range(0, len(venues), VENUES_PER_QUERY):
+        chunk = venues[offset:offset + VENUES_PER_QUERY]
+        condition = Q()
+        for venue in chunk:
+            low_date, high_date, low_start, high_end = windows[venue]
+            condition |= Q(venue=venue, event_date__range=(low_date, high_date),
+                           start__lt=high_end, end__gt=low_start)
+        rows = Event.objects.filter(condition).exclude(id__in=moving).values_list(
+            'venue', 'event_date', 'start', 'end', 'id', 'name'
+        )
+        found.extend(Booking(*row) for row in rows)
+
+        low = min(windows[venue][0] for venue in chunk)
+        high = max(windows[venue][1] for venue in chunk)
+        rules = active_between(RecurringEvent.objects.filter(venue__in=chunk), low, high).exclude(pk__in=moving_rules)
+        for rule in rules:
+            low_date, high_date, low_start, high_end = windows[rule.venue]
+            found.extend(
+                booking for booking in rule_bookings(rule, low_date, high_date)
+                if booking.start < high_end and booking.end > low_start
+            )
+    return found
+
+
+def _sweep(entries):
+    """Sort one venue/day by start time and report every overlapping pair involving a proposal."""
+    entries.sort(key=lambda entry: entry[0].start)
+    active = []  # Heap of (end, sequence, booking, proposed) still open at the current start
+    conflicts = []
+    for sequence, (booking, proposed) in enumerate(entries):
+        while active and active[0][0] <= booking.start:
+            heapq.heappop(active)
+        for _, _, other, other_proposed in active:
+            if not (proposed or other_proposed) or not overlaps(booking, other):
+                continue
+            if proposed:
+                conflicts.append(Conflict(booking, other, existing=not other_proposed))
+            else:
+                conflicts.append(Conflict(other, booking, existing=True))
+        heapq.heappush(active, (booking.end, sequence, booking, proposed))
+    return conflicts
+
+
+def find_conflicts(bookings):
+    """
+    Check a batch of proposed bookings against the database and against each other.
+    Costs a handful of range queries however many bookings are passed in.
+    """
+    bookings = [booking for booking in bookings if None not in booking[:4]]
+    if not bookings:
+        return []
+
+    by_slot = defaultdict(list)
+    for booking in bookings:
+        by_slot[(booking.venue, booking.event_date)].append((booking, True))
+    for booking in existing_bookings(bookings):
+        if (booking.venue, booking.event_date) in by_slot:
+            by_slot[(booking.venue, booking.event_date)].append((booking, False))
+
+    conflicts = []
+    for entries in by_slot.values():
+        conflicts.extend(_sweep(entries))
+    return conflicts
+
+
+def validate_bookings(bookings):
+    """Raise a single ValidationError listing every conflict in the batch."""
+    conflicts = find_conflicts(bookings)
+    if conflicts:
+        raise ValidationError([str(conflict) for conflict in conflicts])
@@ -1,10 +1,6 @@
-from .models import Lead, Event, Email
+from . import counters
 
 def global_counts(request):
     if request.user.is_authenticated:
-        return {
-            'leads_count': Lead.objects.count(),
-            'events_count': Event.objects.count(),
-            'email_count': Email.objects.filter(is_read=False).count(),
-        }
+        return counters.get_counts()  # Served from the cache/Counter table, no table scans
     return {}  # Return an empty dictionary if the user is not logged in
@@ -0,0 +1,152 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import admin_calendar, counters, ics, month_grid, rollups, search, versions
+from .models import Client, Event, Lead, LeadConversionBatch
+
+DEFAULT_BATCH_SIZE = 500
+CLAIM_TIMEOUT = timedelta(minutes=10)  # A claim older than this belongs to a worker that died
+
+# The first Event of a converted lead is a placeholder for the planner to fill in
+FIRST_EVENT_STATUS = 'planned'
+FIRST_EVENT_VENUE = 'TBD'
+FIRST_EVENT_DAYS_OUT = 180
+FIRST_EVENT_START = time(17)
+FIRST_EVENT_HOURS = 5
+
+
+def pending_leads():
+    """Converted leads that have not been turned into a Client yet."""
+    return Lead.objects.filter(status='converted', client__isnull=True)
+
+
+def dispatch_limit():
+    """How many batch tasks to queue at once: what the cluster pulls in one round, capped by its queue limit."""
+    cluster = getattr(settings, 'Q_CLUSTER', {})
+    limit = cluster.get('workers', 1) * cluster.get('bulk', 1)
+    return min(limit, cluster['queue_limit']) if cluster.get('queue_limit') else limit
+
+
+def pending_batches(batch_size=DEFAULT_BATCH_SIZE, limit=None, leads=None):
+    """Lists of pending lead ids (out of ``leads`` if given), ``batch_size`` each, oldest first."""
+    ids = pending_leads()
+    if leads is not None:
+        ids = ids.filter(pk__in=leads.values('pk'))
+    ids = ids.order_by('pk').values_list('pk', flat=True)
+    if limit:
+        ids = ids[:batch_size * limit]
+    ids = list(ids)
+    return [ids[offset:offset + batch_size] for offset in range(0, len(ids), batch_size)]
+
+
+def _claimable(now):
+    return Q(converted_at__isnull=True) | Q(converted_at__lt=now - CLAIM_TIMEOUT)
+
+
+def claim(lead_ids, batch_size, now):
+    """
+    Stamp up to ``batch_size`` pending leads (out of ``lead_ids`` if given) with ``converted_at=now``
+    and return their ids. As in the outbox, the UPDATE repeats the pending condition, so a lead another
+    worker claimed in between no longer matches; this works the same on SQLite as on a server database.
+    """
+    leads = pending_leads().filter(_claimable(now))
+    if lead_ids is not None:
+        leads = leads.filter(pk__in=lead_ids)
+    candidates = list(leads.order_by('pk').values_list('pk', flat=True)[:batch_size])
+    if not candidates:
+        return []
+    pending_leads().filter(_claimable(now), pk__in=candidates).update(converted_at=now)
+    return list(pending_leads().filter(pk__in=candidates, converted_at=now).order_by('pk').values_list('pk', flat=True))
+
+
+def release(lead_ids, now):
+    """Hand claimed leads back after a failed batch."""
+    pending_leads().filter(pk__in=lead_ids, converted_at=now).update(converted_at=None)
+
+
+def first_event(lead, client):
+    day = (lead.inquiry_date or timezone.localdate()) + timedelta(days=FIRST_EVENT_DAYS_OUT)
+    start = timezone.make_aware(datetime.combine(day, FIRST_EVENT_START))
+    return Event(
+        client=client, name=f"{client.first_name} {client.last_name} event", event_date=day,
+        start=start, end=start + timedelta(hours=FIRST_EVENT_HOURS),
+        venue=FIRST_EVENT_VENUE, status=FIRST_EVENT_STATUS, description=lead.notes,
+    )
+
+
+def _convert(lead_ids, now, batch):
+    leads = list(pending_leads().filter(pk__in=lead_ids, converted_at=now).order_by('pk'))
+
+    existing = {client.email: client for client in Client.objects.filter(email__in=[lead.email for lead in leads])}
+    new_clients = [
+        Client(first_name=lead.first_name, last_name=lead.last_name, email=lead.email,
+               phone_number=lead.phone_number)
+        for lead in leads if lead.email not in existing
+    ]
+    Client.objects.bulk_create(new_clients)
+    clients = {**existing, **{client.email: client for client in new_clients}}
+
+    # Clients that were already on file keep their events, only brand new ones get a placeholder
+    has_events = set(
+        Event.objects.filter(client__in=existing.values()).values_list('client_id', flat=True).distinct()
+    )
+    events = [
+        first_event(lead, clients[lead.email])
+        for lead in leads if clients[lead.email].pk not in has_events
+    ]
+    Event.objects.bulk_create(events)
+
+    for lead in leads:
+        lead.client = clients[lead.email]
+    Lead.objects.bulk_update(leads, ['client'])  # converted_at is the claim stamp
+
+    # bulk_create skips signals: keep the denormalized data in line by hand
+    counters.increment(counters.EVENTS_COUNT, len(events))
+    rollups.add_objects(events)
+    versions.bump(versions.CLIENTS, versions.EVENTS, versions.LEADS)
+    search.index_objects(new_clients + events)
+    event_dates = {event.event_date for event in events}
+    event_clients = {event.client_id for event in events}
+
+    def invalidate_calendars():
+        month_grid.invalidate_dates(*event_dates)
+        admin_calendar.invalidate_dates(*event_dates)
+        ics.invalidate(ics.CLIENT, *event_clients)
+        ics.invalidate(ics.VENUE, FIRST_EVENT_VENUE)
+    transaction.on_commit(invalidate_calendars)
+
+    batch.leads_converted = len(leads)
+    batch.clients_created = len(new_clients)
+    batch.clients_linked = len(leads) - len(new_clients)
+    batch.events_created = len(events)
+
+
+def convert_batch(lead_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Turn up to ``batch_size`` pending leads (optionally only those in ``lead_ids``) into Clients
+    and first Events in one transaction. Leads are claimed first and marked done by pointing them
+    at their Client, so concurrent workers and a rerun of the same batch convert nothing twice.
+    The outcome is recorded as a LeadConversionBatch, or None is returned when nothing was claimed;
+    on failure the leads are released, nothing is written but that record, and the error is re-raised.
+    """
+    now = timezone.now()
+    claimed = claim(lead_ids, batch_size, now)
+    if not claimed:
+        return None
+    batch = LeadConversionBatch.objects.create()
+    try:
+        with transaction.atomic():
+            _convert(claimed, now, batch)
+    except Exception as error:
+        release(claimed, now)
+        batch.leads_failed = len(claimed)
+        batch.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        batch.finished_at = timezone.now()
+        batch.save()
+    return batch
@@ -0,0 +1,113 @@
+import asyncio
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Counter, Lead, Event, Email
+
+# Counter names double as the template variables used by the sidebar and dashboard
+LEADS_COUNT = 'leads_count'
+EVENTS_COUNT = 'events_count'
+EMAIL_COUNT = 'email_count'
+
+CACHE_KEY_PREFIX = 'crm:counter:'
+# Refreshed after every change; the timeout bounds how long a count missed by a lost refresh lingers
+CACHE_TIMEOUT = 60 * 5
+
+# How each counter is computed from scratch (used for seeding and reconciling)
+COUNTER_QUERIES = {
+    LEADS_COUNT: lambda: Lead.objects.all(),
+    EVENTS_COUNT: lambda: Event.objects.all(),
+    EMAIL_COUNT: lambda: Email.objects.filter(is_read=False),
+}
+
+
+def _cache_key(name):
+    return f"{CACHE_KEY_PREFIX}{name}"
+
+
+def compute(name):
+    """Count the rows behind a counter. This is a table scan, keep it off the request path."""
+    return COUNTER_QUERIES[name]().count()
+
+
+def get_counts():
+    """Return every counter as a dict, reading the cache first and the Counter table second."""
+    keys = {_cache_key(name): name for name in COUNTER_QUERIES}
+    cached = cache.get_many(keys.keys())
+    counts = {keys[key]: value for key, value in cached.items()}
+
+    missing = [name for name in COUNTER_QUERIES if name not in counts]
+    if missing:
+        stored = dict(Counter.objects.filter(name__in=missing).values_list('name', 'value'))
+        for name in missing:
+            if name not in stored:
+                # Fresh database without a seeded row: compute it once and keep it
+                stored[name] = Counter.objects.get_or_create(name=name, defaults={'value': compute(name)})[0].value
+        for name in missing:
+            # ``add``: a count stored by a writer that committed meanwhile wins over this read
+            cache.add(_cache_key(name), stored[name], CACHE_TIMEOUT)
+        counts.update(stored)
+    return counts
+
+
+async def aget_counts():
+    """``get_counts`` for async views; unseeded counters are counted concurrently."""
+    keys = {_cache_key(name): name for name in COUNTER_QUERIES}
+    cached = await cache.aget_many(keys.keys())
+    counts = {keys[key]: value for key, value in cached.items()}
+
+    missing = [name for name in COUNTER_QUERIES if name not in counts]
+    if missing:
+        stored = {name: value async for name, value in Counter.objects.filter(name__in=missing).values_list('name', 'value')}
+        unseeded = [name for name in missing if name not in stored]
+        computed = await asyncio.gather(*(COUNTER_QUERIES[name]().acount() for name in unseeded))
+        for name, value in zip(unseeded, computed):
+            stored[name] = (await Counter.objects.aget_or_create(name=name, defaults={'value': value}))[0].value
+        for name in missing:
+            await cache.aadd(_cache_key(name), stored[name], CACHE_TIMEOUT)
+        counts.update(stored)
+    return counts
+
+
+def invalidate(*names):
+    cache.delete_many([_cache_key(name) for name in (names or COUNTER_QUERIES)])
+
+
+def refresh(*names):
+    """
+    Store the committed values of counters (all by default) in the shared cache, so processes
+    other than the writer (the web workers, when the writer is a task or a command) see them.
+    """
+    names = names or tuple(COUNTER_QUERIES)
+    stored = dict(Counter.objects.filter(name__in=names).values_list('name', 'value'))
+    cache.set_many({_cache_key(name): value for name, value in stored.items()}, CACHE_TIMEOUT)
+    unseeded = [name for name in names if name not in stored]
+    if unseeded:
+        invalidate(*unseeded)
+
+
+def increment(name, delta=1):
+    """Adjust a counter inside the current transaction and store its new value in the cache once committed."""
+    if not delta:
+        return
+    updated = Counter.objects.filter(name=name).update(value=F('value') + delta)
+    if not updated:
+        # Computing from scratch already includes the row that triggered this change
+        Counter.objects.get_or_create(name=name, defaults={'value': compute(name)})
+    transaction.on_commit(lambda: refresh(name))
+
+
+def reconcile():
+    """Recompute every counter from its table and return {name: (stored, actual)} for the ones that drifted."""
+    drift = {}
+    with transaction.atomic():
+        stored = dict(Counter.objects.select_for_update().values_list('name', 'value'))
+        for name in COUNTER_QUERIES:
+            actual = compute(name)
+            if stored.get(name) != actual:
+                drift[name] = (stored.get(name), actual)
+                Counter.objects.update_or_create(name=name, defaults={'value': actual})
+    refresh()
+    return drift
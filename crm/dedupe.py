@@ -0,0 +1,242 @@
+import re
+from collections import defaultdict
+from itertools import combinations
+
+from django.db import transaction
+
+from .models import Lead, LeadMergeSuggestion
+
+DEFAULT_THRESHOLD = 0.6
+MAX_BLOCK_SIZE = 50  # Blocks bigger than this (very common names) are split further rather than compared pairwise
+LOAD_CHUNK_SIZE = 5000
+PLUS_TAG_DOMAINS = {'gmail.com', 'googlemail.com'}  # Providers that ignore dots and +tags in the local part
+
+# How far along the funnel each status is, a merge keeps the furthest one
+STATUS_RANK = {'new': 0, 'contacted': 1, 'closed': 2, 'converted': 3}
+
+_SOUNDEX_CODES = {
+    letter: digit
+    for digit, letters in {'1': 'BFPV', '2': 'CGJKQSXZ', '3': 'DT', '4': 'L', '5': 'MN', '6': 'R'}.items()
+    for letter in letters
+}
+_NON_DIGITS = re.compile(r'\D')
+
+
+def soundex(name):
+    """American Soundex, e.g. Robert and Rupert both give R163."""
+    letters = [letter for letter in (name or '').upper() if 'A' <= letter <= 'Z']
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def normalize_email(email):
+    local, _, domain = (email or '').strip().lower().partition('@')
+    if domain in PLUS_TAG_DOMAINS:
+        local = local.split('+', 1)[0].replace('.', '')
+    return f"{local}@{domain}" if domain else local
+
+
+def normalize_phone(phone):
+    """Digits only, without a leading North American country code; too short to be useful gives ''."""
+    digits = _NON_DIGITS.sub('', phone or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits if len(digits) >= 7 else ''
+
+
+class Profile:
+    """Normalized view of one lead, built once and reused for every pair it appears in."""
+    __slots__ = ('id', 'first', 'last', 'email', 'domain', 'phone', 'sound')
+
+    def __init__(self, pk, first_name, last_name, email, phone_number):
+        self.id = pk
+        self.first = (first_name or '').strip().lower()
+        self.last = (last_name or '').strip().lower()
+        self.email = normalize_email(email)
+        self.domain = self.email.partition('@')[2]
+        self.phone = normalize_phone(phone_number)
+        self.sound = soundex(self.last)
+
+    def blocking_keys(self):
+        if self.email:
+            yield 'email', self.email
+        if self.phone:
+            yield 'phone', self.phone
+        if self.sound:
+            yield 'name', self.sound, self.first[:1]
+            if self.domain:
+                yield 'domain', self.domain, self.sound
+
+
+def score(a, b):
+    """Similarity between 0 and 1 plus the reasons behind it."""
+    total, reasons = 0.0, []
+    if a.email and a.email == b.email:
+        total += 0.5
+        reasons.append('email')
+    if a.phone and a.phone == b.phone:
+        total += 0.35
+        reasons.append('phone')
+    if a.last and a.last == b.last:
+        total += 0.15
+        reasons.append('last name')
+    elif a.sound and a.sound == b.sound:
+        total += 0.1
+        reasons.append('sounds-like last name')
+    if a.first and a.first == b.first:
+        total += 0.15
+        reasons.append('first name')
+    elif a.first[:1] and a.first[:1] == b.first[:1]:
+        total += 0.05
+    if a.domain and a.domain == b.domain and 'email' not in reasons:
+        total += 0.05
+    return min(total, 1.0), reasons
+
+
+def load_profiles(queryset=None):
+    queryset = Lead.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list('id', 'first_name', 'last_name', 'email', 'phone_number')
+    return {row[0]: Profile(*row) for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE)}
+
+
+# Tried in order on a block that is over the size limit; leads without the key cannot be placed in a sub-block
+SUB_BLOCK_KEYS = (
+    lambda profile: profile.first,
+    lambda profile: profile.phone[-4:],
+)
+
+
+def _block_pairs(ids, profiles, max_block_size, sub_block_keys=SUB_BLOCK_KEYS):
+    """Pairs within one block and whether every member could be compared, splitting it while it is too big."""
+    if len(ids) <= max_block_size:
+        return set(combinations(sorted(ids), 2)), True
+    if not sub_block_keys:
+        return set(), False
+    sub_blocks = defaultdict(list)
+    for pk in ids:
+        sub_blocks[sub_block_keys[0](profiles[pk])].append(pk)
+    complete = '' not in sub_blocks
+    sub_blocks.pop('', None)
+    pairs = set()
+    for sub_ids in sub_blocks.values():
+        sub_pairs, sub_complete = _block_pairs(sub_ids, profiles, max_block_size, sub_block_keys[1:])
+        pairs |= sub_pairs
+        complete = complete and sub_complete
+    return pairs, complete
+
+
+def candidate_pairs(profiles, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Pairs of ids that share at least one blocking key, lower id first; never the full cross product.
+    Returns ``(pairs, skipped)`` where ``skipped`` counts blocks that were too big to compare in full
+    even after splitting them by ``SUB_BLOCK_KEYS``, so duplicates among their members may be missed.
+    """
+    blocks = defaultdict(list)
+    for profile in profiles.values():
+        for key in profile.blocking_keys():
+            blocks[key].append(profile.id)
+    pairs, skipped = set(), 0
+    for ids in blocks.values():
+        if len(ids) > 1:
+            block_pairs, complete = _block_pairs(ids, profiles, max_block_size)
+            pairs |= block_pairs
+            skipped += not complete
+    return pairs, skipped
+
+
+def find_duplicates(threshold=DEFAULT_THRESHOLD, max_block_size=MAX_BLOCK_SIZE, queryset=None):
+    """
+    Score every candidate pair and return ``([(older_id, newer_id, score, reasons), ...], skipped)`` for
+    the pairs above the threshold, ``skipped`` being the number of blocks that could not be compared in full.
+    """
+    profiles = load_profiles(queryset)
+    pairs, skipped = candidate_pairs(profiles, max_block_size)
+    matches = []
+    for first_id, second_id in pairs:
+        pair_score, reasons = score(profiles[first_id], profiles[second_id])
+        if pair_score >= threshold:
+            matches.append((first_id, second_id, pair_score, reasons))
+    return matches, skipped
+
+
+def suggest_merges(threshold=DEFAULT_THRESHOLD, max_block_size=MAX_BLOCK_SIZE, batch_size=1000):
+    """
+    Store new suggestions; pairs that were already suggested (or dismissed) are left alone.
+    Returns the number of pairs found and the number of blocks that were too big to compare in full.
+    """
+    matches, skipped = find_duplicates(threshold, max_block_size)
+    newer_ids = sorted({newer for _, newer, _, _ in matches})
+    labels = {}
+    for offset in range(0, len(newer_ids), batch_size):
+        rows = Lead.objects.filter(pk__in=newer_ids[offset:offset + batch_size])
+        labels.update(
+            (pk, f"{first} {last} <{email}>")
+            for pk, first, last, email in rows.values_list('id', 'first_name', 'last_name', 'email')
+        )
+    suggestions = [
+        LeadMergeSuggestion(
+            lead_id=older, duplicate_id=newer, score=round(pair_score, 3), reasons=', '.join(reasons),
+            duplicate_label=labels.get(newer, f"Lead #{newer}")[:255],
+        )
+        for older, newer, pair_score, reasons in matches
+    ]
+    LeadMergeSuggestion.objects.bulk_create(suggestions, batch_size=batch_size, ignore_conflicts=True)
+    return len(suggestions), skipped
+
+
+def merge_leads(primary, duplicate):
+    """
+    Fold ``duplicate`` into ``primary``: fill in blanks, keep the furthest status, append notes,
+    point every foreign key at ``primary`` and delete ``duplicate``. A duplicate that was already
+    converted hands its Client over, so conversion does not create a second one for the same person.
+    """
+    with transaction.atomic():
+        if not primary.phone_number:
+            primary.phone_number = duplicate.phone_number
+        if STATUS_RANK.get(duplicate.status, 0) > STATUS_RANK.get(primary.status, 0):
+            primary.status = duplicate.status
+        if primary.client_id is None and duplicate.client_id is not None:
+            primary.client_id = duplicate.client_id
+            primary.converted_at = duplicate.converted_at
+            primary.status = 'converted'
+        merged_note = f"Merged duplicate lead {duplicate.email}."
+        primary.notes = '\n'.join(part for part in (primary.notes, duplicate.notes, merged_note) if part)
+        primary.save()
+
+        for relation in Lead._meta.related_objects:
+            if relation.related_model is LeadMergeSuggestion:
+                continue
+            if relation.one_to_many or relation.one_to_one:
+                relation.related_model._base_manager.filter(**{relation.field.name: duplicate}).update(
+                    **{relation.field.name: primary}
+                )
+
+        # Other open suggestions about the duplicate are moot; the next run re-pairs ``primary`` if needed
+        LeadMergeSuggestion.objects.filter(status='pending', lead=duplicate).delete()
+        LeadMergeSuggestion.objects.filter(status='pending', duplicate=duplicate).exclude(lead=primary).delete()
+        LeadMergeSuggestion.objects.filter(lead=primary, duplicate=duplicate).update(status='merged')
+        duplicate.delete()
+    return primary
+
+
+def apply_suggestion(suggestion):
+    """Merge one pending suggestion; returns False if either lead is already gone."""
+    if suggestion.status != 'pending' or suggestion.duplicate_id is None:
+        return False
+    with transaction.atomic():
+        leads = Lead.objects.select_for_update().in_bulk([suggestion.lead_id, suggestion.duplicate_id])
+        if len(leads) != 2:
+            return False
+        merge_leads(leads[suggestion.lead_id], leads[suggestion.duplicate_id])
+    return True
@@ -0,0 +1,83 @@
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per database round trip and written per response chunk
+
+NDJSON = 'ndjson'
+JSON = 'json'
+EXPORT_FORMATS = (NDJSON, JSON)
+
+CONTENT_TYPES = {
+    NDJSON: 'application/x-ndjson',
+    JSON: 'application/json',
+}
+
+
+def iter_values(queryset, fields, ordering=('pk',)):
+    """Yield row dicts straight from the database cursor, without building model instances."""
+    rows = queryset.order_by(*ordering).values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        yield dict(zip(fields, row))
+
+
+async def aiter_values(queryset, fields, ordering=('pk',)):
+    """
+    Async counterpart of ``iter_values`` for async views. Uses ``values()``: on Django 5.1
+    ``values_list().aiterator()`` opens its cursor on the event loop and raises SynchronousOnlyOperation.
+    """
+    async for row in queryset.order_by(*ordering).values(*fields).aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row
+
+
+def _encode_chunk(encoder, rows, ndjson, first):
+    if ndjson:
+        return ''.join(encoder.encode(row) + '\n' for row in rows)
+    return ('' if first else ',') + ','.join(encoder.encode(row) for row in rows)
+
+
+def encode_rows(rows, export_format=JSON):
+    """
+    Encode an iterable of dicts either as NDJSON or as one JSON array written piece by piece.
+    Output is buffered into chunks of ``EXPORT_CHUNK_SIZE`` rows to keep the number of writes low.
+    """
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    ndjson = export_format == NDJSON
+    if not ndjson:
+        yield '['
+    rows = iter(rows)
+    first = True
+    while chunk := list(islice(rows, EXPORT_CHUNK_SIZE)):
+        yield _encode_chunk(encoder, chunk, ndjson, first)
+        first = False
+    if not ndjson:
+        yield ']'
+
+
+async def aencode_rows(rows, export_format=JSON):
+    """``encode_rows`` for an async iterable of dicts."""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    ndjson = export_format == NDJSON
+    if not ndjson:
+        yield '['
+    chunk, first = [], True
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield _encode_chunk(encoder, chunk, ndjson, first)
+            chunk, first = [], False
+    if chunk:
+        yield _encode_chunk(encoder, chunk, ndjson, first)
+    if not ndjson:
+        yield ']'
+
+
+def streaming_export(rows, export_format=JSON, filename=None):
+    """Stream ``rows`` (an iterable, or an async iterable from an async view) as a JSON or NDJSON response."""
+    encode = aencode_rows if hasattr(rows, '__aiter__') else encode_rows
+    response = StreamingHttpResponse(encode(rows, export_format), content_type=CONTENT_TYPES[export_format])
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
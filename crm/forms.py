@@ -1,5 +1,6 @@
 from django import forms
 from .models import Client, Event, Vendor  # Import your models here
+from .importers import FILE_FORMATS
 
 
 
@@ -10,7 +11,7 @@ class ClientForm(forms.ModelForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if Client.objects.filter(email=email).exists():
+        if Client.objects.filter(email=email).exclude(pk=self.instance.pk).exists():
             raise forms.ValidationError("A client with this email already exists.")
         return email
 
@@ -29,4 +30,13 @@ class AddVendorToEventForm(forms.ModelForm):
 
     class Meta:
         model = Event
-        fields = ['vendors']
\ No newline at end of file
+        fields = ['vendors']
+
+
+class ContactImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, a JSON array or NDJSON.")
+    file_format = forms.ChoiceField(
+        choices=[('', 'From file extension')] + [(name, name.upper()) for name in FILE_FORMATS],
+        required=False,
+    )
+    dry_run = forms.BooleanField(required=False, help_text="Validate the file without saving anything.")
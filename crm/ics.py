@@ -0,0 +1,264 @@
+"""
+iCalendar (RFC 5545) subscription feeds: one per client, vendor and venue, and one for the
+schedule. Calendar apps poll every few minutes, so a feed is rendered once and kept in the cache
+until something in it changes (see the receivers in crm/signals.py). A cold feed is streamed from
+a database cursor while the copy for the cache is assembled. Subscriptions cannot log in, so feed
+URLs carry a signed token.
+
+Each feed has a generation, a random token in the shared cache that changes once a transaction
+touching the feed commits. It is the feed's ETag, so a poll from an app that is up to date is one
+cache read answered ``304 Not Modified``, whichever worker serves it. Cached bodies are stored
+under their generation, and only while it is still current, so a build that raced with a write
+is never served once the write's generation is in place.
+"""
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import chain, islice
+
+from django.core.cache import cache
+from django.core.signing import Signer
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags
+
+from .models import Calendar, Client, Event, RecurringEvent, RecurringSchedule, Vendor
+from .recurrence import active_between, occurrence_span, rule_dates, to_rrule
+
+CLIENT = 'client'
+VENDOR = 'vendor'
+VENUE = 'venue'
+SCHEDULE = 'schedule'
+SCHEDULE_KEY = 'all'  # The schedule has a single feed
+
+CACHE_KEY_PREFIX = 'crm:ics:'
+CACHE_TIMEOUT = 60 * 60 * 24  # Feeds are invalidated on save/delete, the timeout only bounds drift from bulk writes
+HISTORY = timedelta(days=180)  # Past entries kept in a feed
+COMPONENTS_PER_CHUNK = 200
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+PRODID = '-//DjangORM CRM//Event feeds//EN'
+
+# Event.status -> VEVENT STATUS
+EVENT_STATUS = {'planned': 'TENTATIVE', 'booked': 'CONFIRMED', 'completed': 'CONFIRMED', 'canceled': 'CANCELLED'}
+
+_signer = Signer(salt='crm.ics')
+
+
+def _cache_key(kind, key, generation=None):
+    """The feed's generation key, or with ``generation`` the key its body is cached under."""
+    # Venue names can hold spaces and other characters some cache backends reject in keys
+    digest = hashlib.md5(str(key).encode(), usedforsecurity=False).hexdigest()
+    if generation is None:
+        return f"{CACHE_KEY_PREFIX}{kind}:{digest}"
+    return f"{CACHE_KEY_PREFIX}{kind}:{digest}:{generation}"
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def generation(kind, key):
+    """The feed's current generation, starting a new one when the cache has none."""
+    cache_key = _cache_key(kind, key)
+    current = cache.get(cache_key)
+    if current is None:
+        cache.add(cache_key, _new_generation(), CACHE_TIMEOUT)
+        current = cache.get(cache_key)  # Whoever added first wins
+    return current
+
+
+def feed_token(kind, key):
+    return _signer.signature(f"{kind}:{key}")
+
+
+def check_token(kind, key, token):
+    return constant_time_compare(feed_token(kind, key), token or '')
+
+
+def feed_url(kind, key=SCHEDULE_KEY):
+    """Subscription URL (path and token) to hand to a calendar app."""
+    args = [] if kind == SCHEDULE else [key]
+    return f"{reverse(f'ics_{kind}', args=args)}?token={feed_token(kind, key)}"
+
+
+def invalidate(kind, *keys):
+    """Start new generations for the feeds once the current transaction commits."""
+    cache_keys = [_cache_key(kind, key) for key in set(keys) if key is not None]
+    if cache_keys:
+        transaction.on_commit(
+            lambda: cache.set_many({cache_key: _new_generation() for cache_key in cache_keys}, CACHE_TIMEOUT)
+        )
+
+
+# Formatting
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Content line with CRLF, folded to 75 octets as RFC 5545 requires (never inside a UTF-8 sequence)."""
+    if len(line.encode()) <= 75:
+        return line + '\r\n'
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def _utc(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _aware(day, moment):
+    return timezone.make_aware(datetime.combine(day, moment), timezone.get_current_timezone())
+
+
+def vevent(uid, start, end, summary, stamp, location=None, description=None, status=None, rrule=None):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{_utc(stamp)}',
+        f'DTSTART:{_utc(start)}',
+        f'DTEND:{_utc(end)}',
+        f'SUMMARY:{_escape(summary)}',
+    ]
+    if rrule:
+        lines.append(f'RRULE:{rrule}')
+    if location:
+        lines.append(f'LOCATION:{_escape(location)}')
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    if status:
+        lines.append(f'STATUS:{status}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+# Components
+
+EVENT_FIELDS = ('id', 'name', 'start', 'end', 'venue', 'description', 'status', 'updated_at')
+
+
+def _events(events):
+    rows = events.order_by('start', 'id').values_list(*EVENT_FIELDS).iterator(chunk_size=COMPONENTS_PER_CHUNK)
+    for pk, name, start, end, venue, description, status, updated_at in rows:
+        yield vevent(f"event-{pk}@crm", start, end, name, updated_at, venue, description, EVENT_STATUS.get(status))
+
+
+def _recurring_events(rules):
+    """One VEVENT with an RRULE per rule: the calendar app expands the series, not us."""
+    for rule in rules.iterator():
+        first = next(rule_dates(rule), None)
+        if first is None:
+            continue
+        start, end = occurrence_span(rule, first)
+        until = _utc(occurrence_span(rule, rule.until)[0]) if rule.until else None
+        yield vevent(
+            f"recurring-event-{rule.pk}@crm", start, end, rule.name, rule.updated_at, rule.venue, rule.description,
+            EVENT_STATUS.get(rule.status), to_rrule(rule, until=until),
+        )
+
+
+def _schedules(entries, stamp):
+    rows = entries.order_by('day', 'start_time').values_list('id', 'day', 'start_time', 'end_time', 'notes')
+    for pk, day, start_time, end_time, notes in rows.iterator(chunk_size=COMPONENTS_PER_CHUNK):
+        yield vevent(f"schedule-{pk}@crm", _aware(day, start_time), _aware(day, end_time), notes or "Schedule", stamp)
+
+
+def _recurring_schedules(rules, stamp):
+    for rule in rules.iterator():
+        first = next(rule_dates(rule), None)
+        if first is None:
+            continue
+        until = _utc(_aware(rule.until, rule.start_time)) if rule.until else None
+        yield vevent(
+            f"recurring-schedule-{rule.pk}@crm", _aware(first, rule.start_time), _aware(first, rule.end_time),
+            rule.notes or "Schedule", stamp, rrule=to_rrule(rule, until=until),
+        )
+
+
+def feed_components(kind, key):
+    """(calendar name, iterable of VEVENT strings) for a feed, or None when its client or vendor doesn't exist."""
+    since = timezone.now() - HISTORY
+    recent = Event.objects.filter(start__gte=since)
+    rules = active_between(RecurringEvent.objects.all(), since.date(), datetime.max.date())
+    if kind == CLIENT:
+        client = Client.objects.filter(pk=key).first()
+        if client is None:
+            return None
+        return f"{client} events", chain(_events(recent.filter(client_id=key)), _recurring_events(rules.filter(client_id=key)))
+    if kind == VENDOR:
+        vendor = Vendor.objects.filter(pk=key).first()
+        if vendor is None:
+            return None
+        return f"{vendor} events", _events(recent.filter(vendors=key))
+    if kind == VENUE:
+        return f"{key} events", chain(_events(recent.filter(venue=key)), _recurring_events(rules.filter(venue=key)))
+    if kind == SCHEDULE:
+        stamp = timezone.now()
+        entries = Calendar.objects.filter(day__gte=since.date())
+        schedule_rules = active_between(RecurringSchedule.objects.all(), since.date(), datetime.max.date())
+        return "Schedule", chain(_schedules(entries, stamp), _recurring_schedules(schedule_rules, stamp))
+    raise ValueError(f"Unknown feed '{kind}'.")
+
+
+def render(name, components):
+    """The VCALENDAR in chunks of ``COMPONENTS_PER_CHUNK`` events."""
+    yield ''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ))
+    components = iter(components)
+    while chunk := ''.join(islice(components, COMPONENTS_PER_CHUNK)):
+        yield chunk
+    yield _fold('END:VCALENDAR')
+
+
+def _with_headers(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'  # Apps may keep their copy but must revalidate every poll
+    return response
+
+
+def feed_response(request, kind, key):
+    """
+    Serve a feed: ``304`` when the app has the current generation, the cached body when there is
+    one, otherwise streamed from the database while the copy for the cache is assembled. Returns
+    None for an unknown client or vendor.
+    """
+    current = generation(kind, key)
+    etag = f'"{current}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return _with_headers(HttpResponseNotModified(), etag)
+    body_key = _cache_key(kind, key, current)
+    body = cache.get(body_key)
+    if body is not None:
+        return _with_headers(HttpResponse(body, content_type=CONTENT_TYPE), etag)
+
+    feed = feed_components(kind, key)
+    if feed is None:
+        return None
+
+    def stream():
+        parts = []
+        for chunk in render(*feed):
+            parts.append(chunk)
+            yield chunk
+        # A write that committed while this was read has moved the feed on; don't keep this copy
+        if cache.get(_cache_key(kind, key)) == current:
+            cache.set(body_key, ''.join(parts), CACHE_TIMEOUT)
+
+    return _with_headers(StreamingHttpResponse(stream(), content_type=CONTENT_TYPE), etag)
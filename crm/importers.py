@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+from itertools import islice
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from . import counters, rollups, search, versions
+from .models import Client, Lead
+
+DEFAULT_CHUNK_SIZE = 1000
+
+CSV = 'csv'
+JSON = 'json'
+NDJSON = 'ndjson'
+FILE_FORMATS = (CSV, JSON, NDJSON)
+FORMAT_EXTENSIONS = {'.csv': CSV, '.json': JSON, '.ndjson': NDJSON, '.jsonl': NDJSON}
+
+CLIENT_FIELDS = ('first_name', 'last_name', 'email', 'phone_number')
+LEAD_FIELDS = CLIENT_FIELDS + ('status', 'notes')
+
+# kind -> (model, importable columns, counter kept in sync with bulk inserts)
+IMPORTERS = {
+    'clients': (Client, CLIENT_FIELDS, None),
+    'leads': (Lead, LEAD_FIELDS, counters.LEADS_COUNT),
+}
+COLLECTIONS = {Client: versions.CLIENTS, Lead: versions.LEADS}
+
+
+class RowError(NamedTuple):
+    row: int
+    field: str
+    message: str
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0  # Rows written, or rows that would be written on a dry run
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_error(self, row, field, message):
+        self.errors.append(RowError(row, field, message))
+
+
+def guess_format(filename):
+    return FORMAT_EXTENSIONS.get(os.path.splitext(filename)[1].lower(), CSV)
+
+
+class ParseError(NamedTuple):
+    """Stands in for a record that could not be read, so the import reports it and goes on."""
+    message: str
+
+
+def _csv_rows(fileobj):
+    reader = csv.DictReader(fileobj)
+    while True:
+        first_line = reader.line_num + 1  # Where the next record starts
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield ParseError(f"Line {first_line}: {error}.")
+            continue
+        yield row
+
+
+def _ndjson_rows(fileobj):
+    for line_number, line in enumerate(fileobj, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            yield ParseError(f"Line {line_number}: invalid JSON ({error}).")
+
+
+def read_rows(fileobj, file_format=CSV):
+    """
+    Yield one dict per record. CSV and NDJSON are streamed, and a record that cannot be parsed
+    comes out as a ParseError; a JSON array has to be parsed whole, so it fails before any row is written.
+    """
+    if file_format == CSV:
+        yield from _csv_rows(fileobj)
+    elif file_format == NDJSON:
+        yield from _ndjson_rows(fileobj)
+    elif file_format == JSON:
+        yield from json.load(fileobj)
+    else:
+        raise ValueError(f"Unknown import format '{file_format}'.")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _build(model, fields, row):
+    values = {}
+    for name in fields:
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in (None, ''):
+            values[name] = value
+    return model(**values)
+
+
+def import_rows(kind, rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Validate and insert contacts chunk by chunk. Each chunk costs one ``email IN (...)`` query
+    and one ``bulk_create``; duplicates inside the file are caught with an in-memory set.
+    ``bulk_create`` skips signals, so the lead counter, search index and rollups are updated here.
+    """
+    model, fields, counter = IMPORTERS[kind]
+    report = ImportReport(dry_run=dry_run)
+    seen_emails = set()
+    for chunk in _chunks(enumerate(rows, start=1), chunk_size):
+        created = _import_chunk(model, fields, chunk, seen_emails, report)
+        if counter and created:
+            counters.increment(counter, created)
+        if created:
+            versions.bump(COLLECTIONS[model])
+    return report
+
+
+def _import_chunk(model, fields, chunk, seen_emails, report):
+    candidates = []
+    for number, row in chunk:
+        report.rows += 1
+        if isinstance(row, ParseError):
+            report.add_error(number, '', row.message)
+            continue
+        if not isinstance(row, dict):
+            report.add_error(number, '', "Expected an object with column names.")
+            continue
+        instance = _build(model, fields, row)
+        try:
+            instance.full_clean(validate_unique=False, validate_constraints=False)  # No queries per row
+        except ValidationError as error:
+            for field, messages in error.message_dict.items():
+                report.add_error(number, field, ' '.join(messages))
+            continue
+        if instance.email in seen_emails:
+            report.add_error(number, 'email', "Duplicate email earlier in this file.")
+            continue
+        seen_emails.add(instance.email)
+        candidates.append((number, instance))
+
+    existing = set(
+        model.objects.filter(email__in=[instance.email for _, instance in candidates]).values_list('email', flat=True)
+    )
+    valid = []
+    for number, instance in candidates:
+        if instance.email in existing:
+            report.add_error(number, 'email', f"A {model._meta.verbose_name} with email {instance.email} already exists.")
+        else:
+            valid.append((number, instance))
+
+    if report.dry_run:
+        report.created += len(valid)
+        return 0
+    created = _write(model, valid, report)
+    report.created += created
+    return created
+
+
+def _write(model, valid, report):
+    """Insert a chunk in one statement; if a concurrent writer claimed an email meanwhile, fall back to row by row."""
+    try:
+        with transaction.atomic():
+            created = model.objects.bulk_create([instance for _, instance in valid])
+            search.index_objects(created)
+            rollups.add_objects(created)
+        return len(valid)
+    except IntegrityError:
+        pass
+
+    created = 0
+    for number, instance in valid:
+        instance.pk = None
+        try:
+            with transaction.atomic():
+                search.index_objects(model.objects.bulk_create([instance]))
+                rollups.add_objects([instance])
+            created += 1
+        except IntegrityError:
+            report.add_error(number, 'email', f"A {model._meta.verbose_name} with email {instance.email} already exists.")
+    return created
@@ -0,0 +1,34 @@
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+
+from .models import Client, Event, Task, Message, Vendor
+
+# Queries needed to render each detail page, however many related rows there are
+EVENT_DETAIL_QUERIES = 4   # event + client, tasks, messages, vendors
+CLIENT_DETAIL_QUERIES = 2  # client, events
+
+
+def event_detail_queryset():
+    """
+    Events with everything event_detail renders. Prefetched tasks and messages get their
+    ``event`` cache filled in, so their ``__str__`` does not query per row.
+    """
+    return Event.objects.select_related('client').prefetch_related(
+        Prefetch('tasks', queryset=Task.objects.order_by('due_date', 'pk')),
+        Prefetch('messages', queryset=Message.objects.order_by('sent_at', 'pk')),
+        Prefetch('vendors', queryset=Vendor.objects.order_by('name')),
+    )
+
+
+def client_detail_queryset():
+    return Client.objects.prefetch_related(
+        Prefetch('events', queryset=Event.objects.order_by('event_date', 'start')),
+    )
+
+
+def load_event_detail(pk):
+    return get_object_or_404(event_detail_queryset(), pk=pk)
+
+
+def load_client_detail(pk):
+    return get_object_or_404(client_detail_queryset(), pk=pk)
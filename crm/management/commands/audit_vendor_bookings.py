@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from crm import vendor_schedule
+
+
+class Command(BaseCommand):
+    help = "List every vendor booked for two overlapping events, in one pass over the assignments."
+
+    def handle(self, *args, **options):
+        found = 0
+        for clash in vendor_schedule.audit():
+            found += 1
+            self.stdout.write(
+                f"{clash.vendor}: '{clash.event.name}' ({clash.event.event_id}, {clash.event.start:%Y-%m-%d %H:%M}) "
+                f"overlaps '{clash.other.name}' ({clash.other.event_id}, {clash.other.start:%Y-%m-%d %H:%M})"
+            )
+        if not found:
+            self.stdout.write(self.style.SUCCESS("No vendor is double-booked."))
+            return
+        self.stdout.write(self.style.WARNING(f"{found} double booking(s) found."))
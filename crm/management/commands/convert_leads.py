@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from crm import conversion, tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Turn converted leads into Clients and first Events. By default batches are queued on the "
+        "django_q cluster; --inline runs them here instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=conversion.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--inline', action='store_true', help="Convert every pending lead in this process.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if not options['inline']:
+            queued = tasks.dispatch_lead_conversions(batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Queued {queued} conversion batch(es)."))
+            return
+
+        converted = 0
+        while True:
+            batch = conversion.convert_batch(batch_size=batch_size)
+            if batch is None:
+                break
+            converted += batch.leads_converted
+            self.stdout.write(f"  converted {converted}")
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} lead(s)."))
@@ -0,0 +1,26 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from crm import dedupe
+
+
+class Command(BaseCommand):
+    help = "Find likely duplicate leads and store merge suggestions for review in the admin."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=dedupe.DEFAULT_THRESHOLD)
+        parser.add_argument('--max-block-size', type=int, default=dedupe.MAX_BLOCK_SIZE)
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        found, skipped = dedupe.suggest_merges(options['threshold'], options['max_block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {found} likely duplicate pairs in {perf_counter() - started:.1f}s (already known pairs are kept as is)."
+        ))
+        if skipped:
+            self.stderr.write(self.style.WARNING(
+                f"{skipped} blocks had more than {options['max_block_size']} leads even after splitting them by first "
+                f"name and phone number, so some duplicates among them were not looked for. "
+                f"Raise --max-block-size to compare them."
+            ))
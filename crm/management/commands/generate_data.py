@@ -0,0 +1,61 @@
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from crm import counters, rollups, search, versions
+from crm.synthetic import DataGenerator, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with deterministic synthetic CRM data, e.g. "
+        "--events 1000000 --messages-per-event 10 for a production-sized dataset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Same seed, same data. Use a new seed to add more.")
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--vendors', type=int, default=200)
+        parser.add_argument('--events', type=int, default=5000)
+        parser.add_argument('--vendors-per-event', type=float, default=2)
+        parser.add_argument('--tasks-per-event', type=float, default=3)
+        parser.add_argument('--messages-per-event', type=float, default=10)
+        parser.add_argument('--notes-per-event', type=float, default=1)
+        parser.add_argument('--leads', type=int, default=5000)
+        parser.add_argument('--emails', type=int, default=10000)
+        parser.add_argument('--schedules', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--index-search', action='store_true', help="Rebuild the full-text index afterwards.")
+
+    def handle(self, *args, **options):
+        if options['events'] and not options['clients']:
+            raise CommandError("Events need at least one client.")
+        generator = DataGenerator(seed=options['seed'], batch_size=options['batch_size'], stdout=self.stdout)
+        started = perf_counter()
+        try:
+            client_ids = generator.clients(options['clients'])
+            vendor_ids = generator.vendors(options['vendors'])
+            generator.events(
+                options['events'], client_ids, vendor_ids,
+                vendors_per_event=options['vendors_per_event'], tasks_per_event=options['tasks_per_event'],
+                messages_per_event=options['messages_per_event'], notes_per_event=options['notes_per_event'],
+            )
+            generator.leads(options['leads'])
+            generator.emails(options['emails'])
+            generator.schedules(options['schedules'])
+        except IntegrityError as error:
+            raise CommandError(f"{error}. This seed was already generated here, pass a different --seed.")
+
+        # bulk_create skips signals: bring the denormalized data back in line
+        counters.reconcile()
+        rollups.rebuild()
+        versions.bump(*versions.COLLECTIONS)
+        cache.clear()
+        if options['index_search'] and search.is_supported():
+            search.rebuild()
+
+        for model, total in generator.created.items():
+            self.stdout.write(f"{model}: {total}")
+        self.stdout.write(self.style.SUCCESS(f"Generated data in {perf_counter() - started:.1f}s."))
@@ -0,0 +1,41 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.importers import IMPORTERS, FILE_FORMATS, DEFAULT_CHUNK_SIZE, guess_format, read_rows, import_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import clients or leads from a CSV, JSON or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FILE_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, write nothing.")
+        parser.add_argument('--report', help="Write the per-row error report to this CSV file.")
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or guess_format(options['path'])
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as fileobj:
+                report = import_rows(
+                    options['kind'], read_rows(fileobj, file_format),
+                    chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+                )
+        except (OSError, ValueError, csv.Error) as error:
+            raise CommandError(error)
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as report_file:
+                writer = csv.writer(report_file)
+                writer.writerow(['row', 'field', 'message'])
+                writer.writerows(report.errors)
+        else:
+            for error in report.errors:
+                self.stdout.write(f"Row {error.row} [{error.field}]: {error.message}")
+
+        verb = "Would create" if report.dry_run else "Created"
+        summary = f"{verb} {report.created} of {report.rows} {options['kind']}, {len(report.errors)} error(s)."
+        self.stdout.write(self.style.SUCCESS(summary) if report.ok else self.style.WARNING(summary))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django_q.models import Schedule
+
+from crm.tasks import SCHEDULES
+
+
+class Command(BaseCommand):
+    help = "Create or update the recurring django_q schedules the CRM relies on. Safe to run on every deploy."
+
+    def handle(self, *args, **options):
+        for entry in SCHEDULES:
+            values = dict(entry)
+            name = values.pop('name')
+            _, created = Schedule.objects.update_or_create(name=name, defaults=values)
+            self.stdout.write(f"{'Created' if created else 'Updated'} {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(SCHEDULES)} schedule(s) installed."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from crm import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the analytics rollups (leads and events per status, day and month) from the tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--series', choices=list(rollups.SERIES), help="Only rebuild this series.")
+
+    def handle(self, *args, **options):
+        summary = rollups.rebuild(options['series'])
+        for series, (buckets, drifted) in summary.items():
+            self.stdout.write(f"{series}: {buckets} bucket(s), {drifted} had drifted")
+        self.stdout.write(self.style.SUCCESS("Rollups rebuilt."))
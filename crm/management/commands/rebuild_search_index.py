@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from crm import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for clients, leads, events, notes and messages."
+
+    def handle(self, *args, **options):
+        try:
+            totals = search.rebuild()
+        except NotSupportedError as error:
+            raise CommandError(error)
+        for kind, total in totals.items():
+            self.stdout.write(f"{kind}: {total}")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {sum(totals.values())} objects."))
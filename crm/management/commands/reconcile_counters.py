@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from crm import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized dashboard counters and fix any drift."
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("All counters are in sync."))
+            return
+        for name, (stored, actual) in drift.items():
+            self.stdout.write(f"{name}: {stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {len(drift)} counter(s)."))
@@ -0,0 +1,62 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the CRM views and admin changelists against the current database and compare them "
+        "with a stored baseline. Exits non-zero on a regression."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=benchmarks.DEFAULT_ITERATIONS)
+        parser.add_argument('--baseline', default='benchmark_baseline.json')
+        parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline.")
+        parser.add_argument('--tolerance', type=float, default=benchmarks.DEFAULT_TOLERANCE)
+        parser.add_argument('--only', nargs='+', help="Run just these cases.")
+        parser.add_argument('--compare-async', action='store_true',
+                            help="Compare concurrent throughput of the sync views and their async counterparts.")
+        parser.add_argument('--concurrency', type=int, default=benchmarks.DEFAULT_CONCURRENCY)
+        parser.add_argument('--requests', type=int, default=benchmarks.DEFAULT_REQUESTS)
+        parser.add_argument('--base-url', help="With --compare-async: hit this running server instead of "
+                                               "in-process handlers, e.g. http://127.0.0.1:8000 under uvicorn.")
+
+    def handle(self, *args, **options):
+        if options['compare_async']:
+            return self.compare_async(options)
+        try:
+            results = benchmarks.run(options['iterations'], only=options['only'])
+        except RuntimeError as error:
+            raise CommandError(error)
+
+        self.stdout.write(f"{'case':<28}{'median ms':>12}{'p95 ms':>12}{'queries':>10}")
+        for result in results:
+            self.stdout.write(f"{result.name:<28}{result.median_ms:>12}{result.p95_ms:>12}{result.queries:>10}")
+
+        if options['save_baseline']:
+            benchmarks.save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}."))
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING("No baseline yet, run with --save-baseline to store one."))
+            return
+
+        found = benchmarks.regressions(results, benchmarks.load_baseline(options['baseline']), options['tolerance'])
+        if found:
+            raise CommandError("Performance regressions:\n" + "\n".join(found))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def compare_async(self, options):
+        try:
+            results = benchmarks.compare_async(
+                options['concurrency'], options['requests'], base_url=options['base_url'], only=options['only'],
+            )
+        except (RuntimeError, OSError) as error:
+            raise CommandError(error)
+        self.stdout.write(f"{'case':<16}{'sync req/s':>12}{'async req/s':>13}{'speedup':>10}")
+        for result in results:
+            speedup = result.async_rps / result.sync_rps if result.sync_rps else 0
+            self.stdout.write(f"{result.name:<16}{result.sync_rps:>12}{result.async_rps:>13}{speedup:>9.2f}x")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from crm import outbox
+
+
+class Command(BaseCommand):
+    help = "Send every queued email that is due, in batches, without going through the django_q cluster."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batches = outbox.drain(options['batch_size'])
+        for batch in batches:
+            self.stdout.write(
+                f"  batch {batch.pk}: {batch.sent} sent, {batch.retried} to retry, {batch.failed} failed "
+                f"in {batch.duration_ms}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Sent {sum(batch.sent for batch in batches)} email(s)."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from crm import reminders
+
+
+class Command(BaseCommand):
+    help = "Queue the digest of overdue tasks not reported yet, without going through the django_q cluster."
+
+    def handle(self, *args, **options):
+        reminder_run = reminders.run()
+        if reminder_run is None:
+            self.stdout.write("No newly overdue tasks.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{reminder_run.tasks_overdue} task(s) overdue across {reminder_run.events} event(s), due by "
+            f"{reminder_run.scanned_through}; {reminder_run.emails_queued} email(s) queued."
+        ))
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:16
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    Counter = apps.get_model('crm', 'Counter')
+    Lead = apps.get_model('crm', 'Lead')
+    Event = apps.get_model('crm', 'Event')
+    Email = apps.get_model('crm', 'Email')
+    Counter.objects.bulk_create([
+        Counter(name='leads_count', value=Lead.objects.count()),
+        Counter(name='events_count', value=Event.objects.count()),
+        Counter(name='email_count', value=Email.objects.filter(is_read=False).count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='calendar',
+            options={'verbose_name': 'Schedule', 'verbose_name_plural': 'Schedules'},
+        ),
+        migrations.AlterField(
+            model_name='calendar',
+            name='day',
+            field=models.DateField(help_text='Day of the event', verbose_name='Day of the Event'),
+        ),
+        migrations.AlterField(
+            model_name='calendar',
+            name='end_time',
+            field=models.TimeField(help_text='Ending time', verbose_name='Ending Time'),
+        ),
+        migrations.AlterField(
+            model_name='calendar',
+            name='notes',
+            field=models.TextField(blank=True, null=True, verbose_name='Notes'),
+        ),
+        migrations.AlterField(
+            model_name='calendar',
+            name='start_time',
+            field=models.TimeField(help_text='Starting time', verbose_name='Starting Time'),
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
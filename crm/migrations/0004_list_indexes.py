@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='client_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['sent_at', 'id'], name='email_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_date', 'id'], name='event_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['inquiry_date', 'id'], name='lead_list_idx'),
+        ),
+    ]
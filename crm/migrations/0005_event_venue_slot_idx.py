@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['venue', 'event_date', 'start', 'end'], name='event_venue_slot_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_event_venue_slot_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendar',
+            index=models.Index(fields=['day', 'start_time'], name='calendar_day_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return  # Full-text search is only wired up for SQLite's FTS5
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS crm_search USING fts5("
+        "title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS crm_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0006_calendar_day_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.CharField(max_length=36)),
+                ('label', models.CharField(max_length=255)),
+                ('event_id', models.UUIDField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
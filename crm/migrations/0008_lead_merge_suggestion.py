@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadMergeSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('duplicate_label', models.CharField(max_length=255)),
+                ('score', models.FloatField()),
+                ('reasons', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('merged', 'Merged'), ('dismissed', 'Dismissed')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('duplicate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='crm.lead')),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merge_suggestions', to='crm.lead')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', '-score'], name='merge_suggestion_queue_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lead', 'duplicate'), name='unique_lead_merge_suggestion')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0008_lead_merge_suggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadConversionBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('leads_converted', models.PositiveIntegerField(default=0)),
+                ('clients_created', models.PositiveIntegerField(default=0)),
+                ('clients_linked', models.PositiveIntegerField(default=0)),
+                ('events_created', models.PositiveIntegerField(default=0)),
+                ('leads_failed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Lead conversion batches',
+            },
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='client',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leads', to='crm.client'),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='converted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['status', 'client', 'id'], name='lead_conversion_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0010_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'event_date'], name='event_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sent_at'], name='message_sent_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date'], name='task_due_date_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0011_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days, weeks or months')),
+                ('weekdays', models.CharField(blank=True, help_text='Weekly rules only: comma separated MO,TU,WE,TH,FR,SA,SU (defaults to the weekday of the first occurrence)', max_length=20)),
+                ('starts_on', models.DateField(verbose_name='First occurrence')),
+                ('until', models.DateField(blank=True, null=True, verbose_name='Last possible occurrence')),
+                ('count', models.PositiveIntegerField(blank=True, help_text='Stop after this many occurrences', null=True)),
+                ('start_time', models.TimeField(verbose_name='Starting Time')),
+                ('end_time', models.TimeField(verbose_name='Ending Time')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Notes')),
+            ],
+            options={
+                'verbose_name': 'Recurring schedule',
+                'indexes': [models.Index(fields=['starts_on', 'until'], name='recurring_schedule_span_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurringEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days, weeks or months')),
+                ('weekdays', models.CharField(blank=True, help_text='Weekly rules only: comma separated MO,TU,WE,TH,FR,SA,SU (defaults to the weekday of the first occurrence)', max_length=20)),
+                ('starts_on', models.DateField(verbose_name='First occurrence')),
+                ('until', models.DateField(blank=True, null=True, verbose_name='Last possible occurrence')),
+                ('count', models.PositiveIntegerField(blank=True, help_text='Stop after this many occurrences', null=True)),
+                ('name', models.CharField(max_length=255)),
+                ('venue', models.CharField(max_length=255)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField(help_text='Earlier than the start time for occurrences running past midnight')),
+                ('description', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('planned', 'Planned'), ('booked', 'Booked'), ('completed', 'Completed'), ('canceled', 'Canceled')], default='booked', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_events', to='crm.client')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['starts_on', 'until'], name='recurring_event_span_idx'), models.Index(fields=['venue', 'starts_on'], name='recurring_event_venue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0012_recurrence_rules'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['recipient', 'sent_at'], name='email_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['sender', 'sent_at'], name='email_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['client', 'start'], name='event_client_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['event', 'sent_at'], name='message_event_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['event', 'created_at'], name='note_event_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['event', 'due_date'], name='task_event_due_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0013_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskReminderRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('scanned_from', models.DateField()),
+                ('scanned_through', models.DateField()),
+                ('tasks_overdue', models.PositiveIntegerField(default=0)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('emails_queued', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['is_completed', 'due_date'], name='task_overdue_idx'),
+        ),
+    ]
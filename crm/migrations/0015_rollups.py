@@ -0,0 +1,50 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:48
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+
+def seed_rollups(apps, schema_editor):
+    Rollup = apps.get_model('crm', 'Rollup')
+    series = {
+        'lead': (apps.get_model('crm', 'Lead'), 'inquiry_date'),
+        'event': (apps.get_model('crm', 'Event'), 'event_date'),
+    }
+    rollups = []
+    for name, (model, date_field) in series.items():
+        for period, truncate in (('day', F), ('month', TruncMonth)):
+            rows = (
+                model.objects.annotate(bucket=truncate(date_field)).values('bucket', 'status')
+                .annotate(total=Count('pk')).order_by().values_list('bucket', 'status', 'total')
+            )
+            rollups.extend(
+                Rollup(series=name, period=period, period_start=start, status=status, count=total)
+                for start, status, total in rows
+            )
+    Rollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0014_task_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(max_length=20)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('status', models.CharField(max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('series', 'period', 'period_start', 'status'), name='unique_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(seed_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0015_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start', 'end'], name='event_schedule_idx'),
+        ),
+    ]
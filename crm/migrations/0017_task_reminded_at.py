@@ -0,0 +1,48 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:03
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def mark_reported_tasks(apps, schema_editor):
+    """
+    Tasks the high-water mark already covered were reported, or (before the first run) were
+    older than the week the first run would have looked back: don't remind about them again.
+    """
+    Task = apps.get_model('crm', 'Task')
+    TaskReminderRun = apps.get_model('crm', 'TaskReminderRun')
+    mark = TaskReminderRun.objects.filter(finished_at__isnull=False).aggregate(mark=Max('scanned_through'))['mark']
+    if mark is None:
+        mark = timezone.localdate() - timedelta(days=8)
+    Task.objects.filter(is_completed=False, due_date__lte=mark).update(reminded_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0016_event_schedule_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='reminded_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_reported_tasks, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_overdue_idx',
+        ),
+        migrations.RemoveField(
+            model_name='taskreminderrun',
+            name='scanned_from',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False), ('reminded_at__isnull', True)), fields=['due_date'], name='task_unreminded_idx'),
+        ),
+    ]
@@ -21,10 +21,18 @@ LEAD_STATUS_CHOICES = [
 
 EMAIL_STATUS_CHOICES = [
     ('draft', 'Draft'),
+    ('queued', 'Queued'),
+    ('sending', 'Sending'),
     ('sent', 'Sent'),
     ('failed', 'Failed'),
 ]
 
+RECURRENCE_FREQUENCY_CHOICES = [
+    ('daily', 'Daily'),
+    ('weekly', 'Weekly'),
+    ('monthly', 'Monthly'),
+]
+
 
 class Client(models.Model):
     first_name = models.CharField(max_length=100)
@@ -34,6 +42,11 @@ class Client(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='client_list_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -63,15 +76,27 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['event_date', 'id'], name='event_list_idx'),
+            models.Index(fields=['venue', 'event_date', 'start', 'end'], name='event_venue_slot_idx'),
+            models.Index(fields=['status', 'event_date'], name='event_status_idx'),
+            models.Index(fields=['client', 'start'], name='event_client_start_idx'),
+            models.Index(fields=['start', 'end'], name='event_schedule_idx'),
+        ]
+
     def clean(self):
-        overlapping_events = Event.objects.filter(
-            venue=self.venue,
-            event_date=self.event_date,
-            start__lt=self.end,
-            end__gt=self.start
-        ).exclude(id=self.id)
-        if overlapping_events.exists():
+        from .conflicts import Booking, find_conflicts
+        from .vendor_schedule import Assignment, double_bookings
+
+        if find_conflicts([Booking.from_event(self)]):
             raise ValidationError("An event is already booked at this venue on the selected date.")
+        if not self._state.adding:  # ``id`` has a default, so ``pk`` is set even before the first save
+            # A rescheduled event must not overlap other bookings of the vendors already assigned to it
+            assigned = Assignment.objects.filter(event_id=self.pk).values('vendor_id')
+            clashes = double_bookings(self, assigned)
+            if clashes:
+                raise ValidationError([str(clash) for clash in clashes])
 
     def is_upcoming(self):
         return self.event_date > now().date()
@@ -85,6 +110,17 @@ class Task(models.Model):
     description = models.CharField(max_length=255)
     due_date = models.DateField()
     is_completed = models.BooleanField(default=False)
+    # When an overdue reminder reported the task (crm/reminders.py); cleared when it is reopened or rescheduled
+    reminded_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['due_date'], name='task_due_date_idx'),
+            models.Index(fields=['event', 'due_date'], name='task_event_due_idx'),
+            models.Index(
+                fields=['due_date'], condition=models.Q(is_completed=False, reminded_at__isnull=True), name='task_unreminded_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Task: {self.description} for {self.event.name}"
@@ -97,6 +133,12 @@ class Message(models.Model):
     content = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at'], name='message_sent_at_idx'),
+            models.Index(fields=['event', 'sent_at'], name='message_event_sent_idx'),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender} to {self.recipient} for {self.event.name}"
 
@@ -107,6 +149,11 @@ class Note(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'created_at'], name='note_event_created_idx'),
+        ]
+
     def __str__(self):
         return f"Note for {self.event.name}"
 
@@ -119,6 +166,14 @@ class Lead(models.Model):
     inquiry_date = models.DateField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=LEAD_STATUS_CHOICES, default='new')
     notes = models.TextField(blank=True, null=True)
+    client = models.ForeignKey(Client, on_delete=models.SET_NULL, blank=True, null=True, related_name='leads')
+    converted_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inquiry_date', 'id'], name='lead_list_idx'),
+            models.Index(fields=['status', 'client', 'id'], name='lead_conversion_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -132,6 +187,21 @@ class Email(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
     status = models.CharField(max_length=20, choices=EMAIL_STATUS_CHOICES, default='draft')
+    # Delivery bookkeeping for the outbound queue (crm/outbox.py)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    claim = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'id'], name='email_list_idx'),
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_idx'),
+            # Client activity timeline (crm/timeline.py)
+            models.Index(fields=['recipient', 'sent_at'], name='email_recipient_idx'),
+            models.Index(fields=['sender', 'sent_at'], name='email_sender_idx'),
+        ]
 
     def __str__(self):
         return f"Email from {self.sender} to {self.recipient} - {self.subject}"
@@ -146,6 +216,9 @@ class Calendar(models.Model):
     class Meta:
         verbose_name = "Schedule"
         verbose_name_plural = "Schedules"
+        indexes = [
+            models.Index(fields=['day', 'start_time'], name='calendar_day_idx'),
+        ]
 
     def clean(self):
         if self.end_time <= self.start_time:
@@ -160,5 +233,244 @@ class Calendar(models.Model):
         if overlapping_events.exists():
             raise ValidationError("This event overlaps with another scheduled event.")
 
+        from .recurrence import recurring_schedules_overlapping
+
+        if recurring_schedules_overlapping(self.day, self.start_time, self.end_time):
+            raise ValidationError("This event overlaps with a recurring schedule.")
+
     def __str__(self):
         return f"Schedule on {self.day} from {self.start_time} to {self.end_time}"
+
+
+class RecurrenceRule(models.Model):
+    """RRULE-style repetition stored once and expanded lazily, per queried window, by crm/recurrence.py."""
+    frequency = models.CharField(max_length=10, choices=RECURRENCE_FREQUENCY_CHOICES, default='weekly')
+    interval = models.PositiveSmallIntegerField(default=1, help_text="Repeat every N days, weeks or months")
+    weekdays = models.CharField(
+        max_length=20, blank=True, help_text="Weekly rules only: comma separated MO,TU,WE,TH,FR,SA,SU "
+                                              "(defaults to the weekday of the first occurrence)",
+    )
+    starts_on = models.DateField("First occurrence")
+    until = models.DateField("Last possible occurrence", blank=True, null=True)
+    count = models.PositiveIntegerField(blank=True, null=True, help_text="Stop after this many occurrences")
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rrule(self):
+        from .recurrence import to_rrule
+        return to_rrule(self)
+
+    def occurrence_dates(self, start_date, end_date):
+        from .recurrence import between
+        return between(self, start_date, end_date)
+
+    def clean_rule(self):
+        from .recurrence import parse_weekdays
+
+        try:
+            parse_weekdays(self.weekdays)
+        except ValueError:
+            raise ValidationError({'weekdays': "Use two-letter weekday codes such as MO,WE,FR."})
+        if self.until and self.starts_on and self.until < self.starts_on:
+            raise ValidationError({'until': "The series cannot end before its first occurrence."})
+
+
+class RecurringSchedule(RecurrenceRule):
+    """A repeating Calendar entry (standing meetings, weekly walkthroughs)."""
+    start_time = models.TimeField("Starting Time")
+    end_time = models.TimeField("Ending Time")
+    notes = models.TextField("Notes", blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Recurring schedule"
+        indexes = [
+            models.Index(fields=['starts_on', 'until'], name='recurring_schedule_span_idx'),
+        ]
+
+    def clean(self):
+        self.clean_rule()
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            raise ValidationError("End time must be after start time.")
+        if None in (self.starts_on, self.start_time, self.end_time):
+            return
+        from .recurrence import schedule_conflicts
+
+        conflict = next(schedule_conflicts(self), None)
+        if conflict:
+            raise ValidationError(f"The occurrence on {conflict} overlaps with another scheduled event.")
+
+    def __str__(self):
+        return f"{self.rrule} from {self.start_time} to {self.end_time}"
+
+
+class RecurringEvent(RecurrenceRule):
+    """A repeating Event at one venue; occurrences show up on calendars and feeds and block the venue."""
+    name = models.CharField(max_length=255)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='recurring_events')
+    venue = models.CharField(max_length=255)
+    start_time = models.TimeField()
+    end_time = models.TimeField(help_text="Earlier than the start time for occurrences running past midnight")
+    description = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=50, choices=EVENT_STATUS_CHOICES, default='booked')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['starts_on', 'until'], name='recurring_event_span_idx'),
+            models.Index(fields=['venue', 'starts_on'], name='recurring_event_venue_idx'),
+        ]
+
+    def clean(self):
+        self.clean_rule()
+        if None in (self.starts_on, self.start_time, self.end_time) or not self.venue:
+            return
+        from .conflicts import rule_bookings, validate_bookings
+        from .recurrence import validation_window
+
+        validate_bookings(rule_bookings(self, *validation_window(self)))
+
+    def __str__(self):
+        return f"{self.name} ({self.rrule})"
+
+
+class Counter(models.Model):
+    """Denormalized total kept up to date by signals (see crm/counters.py)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class SearchDocument(models.Model):
+    """One indexed object; its id is the rowid of the matching row in the crm_search FTS5 table."""
+    kind = models.CharField(max_length=20)
+    object_id = models.CharField(max_length=36)
+    label = models.CharField(max_length=255)
+    event_id = models.UUIDField(blank=True, null=True)  # Event the object belongs to, for linking results
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.label}"
+
+
+MERGE_SUGGESTION_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('merged', 'Merged'),
+    ('dismissed', 'Dismissed'),
+]
+
+
+class LeadMergeSuggestion(models.Model):
+    """A likely duplicate pair found by crm/dedupe.py; merging folds ``duplicate`` into ``lead``."""
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='merge_suggestions')
+    duplicate = models.ForeignKey(Lead, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    duplicate_label = models.CharField(max_length=255)  # Kept after a merge deletes the duplicate
+    score = models.FloatField()
+    reasons = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=MERGE_SUGGESTION_STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lead', 'duplicate'], name='unique_lead_merge_suggestion'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-score'], name='merge_suggestion_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.lead} / {self.duplicate_label} ({self.score:.2f})"
+
+
+class LeadConversionBatch(models.Model):
+    """One run of the background Lead -> Client conversion (see crm/conversion.py)."""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    leads_converted = models.PositiveIntegerField(default=0)
+    clients_created = models.PositiveIntegerField(default=0)
+    clients_linked = models.PositiveIntegerField(default=0)  # Leads whose email already belonged to a client
+    events_created = models.PositiveIntegerField(default=0)
+    leads_failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name_plural = "Lead conversion batches"
+
+    def __str__(self):
+        return f"Conversion batch {self.pk} ({self.leads_converted} converted, {self.leads_failed} failed)"
+
+
+class EmailDeliveryBatch(models.Model):
+    """One batch sent by the outbound mail queue, kept for throughput and failure reporting."""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    claimed = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    retried = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)  # Gave up: out of attempts or undeliverable
+    duration_ms = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name_plural = "Email delivery batches"
+
+    def __str__(self):
+        return f"Delivery batch {self.pk} ({self.sent}/{self.claimed} sent)"
+
+    @property
+    def per_second(self):
+        return round(self.sent * 1000 / self.duration_ms, 1) if self.duration_ms else None
+
+
+class TaskReminderRun(models.Model):
+    """
+    One pass of the overdue task scanner (see crm/reminders.py): the tasks due on or before
+    ``scanned_through`` that were not reported yet. The tasks it reported carry its ``started_at``
+    as their ``reminded_at``.
+    """
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    scanned_through = models.DateField()
+    tasks_overdue = models.PositiveIntegerField(default=0)
+    events = models.PositiveIntegerField(default=0)
+    emails_queued = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Reminder run {self.pk} ({self.tasks_overdue} overdue, due by {self.scanned_through})"
+
+
+ROLLUP_PERIOD_CHOICES = [
+    ('day', 'Day'),
+    ('month', 'Month'),
+]
+
+
+class Rollup(models.Model):
+    """
+    Number of rows of a series (leads by inquiry date, events by event date) per status and day
+    or month. Kept up to date incrementally by crm/rollups.py, so reports never scan the tables.
+    """
+    series = models.CharField(max_length=20)
+    period = models.CharField(max_length=5, choices=ROLLUP_PERIOD_CHOICES)
+    period_start = models.DateField()
+    status = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index behind every report: series and period fixed, period_start ranged
+            models.UniqueConstraint(fields=['series', 'period', 'period_start', 'status'], name='unique_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.series} {self.status} {self.period} of {self.period_start}: {self.count}"
@@ -0,0 +1,104 @@
+"""
+The month grid behind calendar_view, cached per month. Each month has a generation, a random
+token in the shared cache that ``invalidate_dates`` replaces once a write has committed. Grids
+are stored under their generation, and only while it is still current, so a grid built from
+rows read before a concurrent write committed is never served afterwards.
+"""
+import calendar
+import uuid
+from datetime import date, timedelta
+
+from django.core.cache import cache
+
+from . import versions
+from .models import Event
+from .recurrence import event_occurrences
+
+CACHE_KEY_PREFIX = 'crm:month-grid:'
+CACHE_TIMEOUT = 60 * 60 * 24  # Entries are invalidated on save/delete, the timeout only bounds drift from bulk writes
+
+
+def _generation_key(year, month):
+    return f"{CACHE_KEY_PREFIX}{year}-{month:02d}"
+
+
+def _cache_key(year, month, generation):
+    # A recurring event touches every month of its series, so rule changes move the key instead of a generation
+    rules_version = versions.get_versions([versions.RECURRING_EVENTS])[versions.RECURRING_EVENTS][0]
+    return f"{_generation_key(year, month)}:{generation}:{rules_version}"
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def generation(year, month):
+    """The month's current generation, starting a new one when the cache has none."""
+    key = _generation_key(year, month)
+    current = cache.get(key)
+    if current is None:
+        cache.add(key, _new_generation(), CACHE_TIMEOUT)
+        current = cache.get(key)  # Whoever added first wins
+    return current
+
+
+def _shift_month(year, month, delta):
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def grid_bounds(year, month):
+    """First and last day shown for a month: from the Monday before the 1st to the Sunday after the last day."""
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    return first_day - timedelta(days=first_day.weekday()), last_day + timedelta(days=6 - last_day.weekday())
+
+
+def months_showing(day):
+    """Every (year, month) whose grid includes ``day``, leading and trailing days included."""
+    months = []
+    for delta in (-1, 0, 1):
+        year, month = _shift_month(day.year, day.month, delta)
+        start_date, end_date = grid_bounds(year, month)
+        if start_date <= day <= end_date:
+            months.append((year, month))
+    return months
+
+
+def build_month_grid(year, month):
+    """
+    Load every event on the visible grid with one indexed event_date range query, plus the
+    occurrences recurring events have on it (expanded for these six weeks only).
+    """
+    start_date, end_date = grid_bounds(year, month)
+    calendar_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    events = Event.objects.filter(event_date__range=(start_date, end_date)).order_by('event_date', 'start')
+    events_by_date = {}
+    for event in events.values('id', 'name', 'event_date', 'start', 'end'):
+        events_by_date.setdefault(event['event_date'].strftime('%Y-%m-%d'), []).append(event)
+    for occurrence in event_occurrences(start_date, end_date):
+        day_events = events_by_date.setdefault(occurrence['event_date'].strftime('%Y-%m-%d'), [])
+        day_events.append(occurrence)
+    for day_events in events_by_date.values():
+        day_events.sort(key=lambda event: event['start'])
+
+    return {'calendar_dates': calendar_dates, 'events_by_date': events_by_date}
+
+
+def month_grid(year, month):
+    """The prepared grid for a month, served from the cache when nothing on it changed."""
+    current = generation(year, month)
+    key = _cache_key(year, month, current)
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_month_grid(year, month)
+        if generation(year, month) == current:  # Otherwise a write committed while the rows were read
+            cache.set(key, grid, CACHE_TIMEOUT)
+    return grid
+
+
+def invalidate_dates(*days):
+    """Start new generations for every month showing ``days``; call it once the write has committed."""
+    keys = {_generation_key(year, month) for day in days if day for year, month in months_showing(day)}
+    cache.set_many({key: _new_generation() for key in keys}, CACHE_TIMEOUT)
@@ -0,0 +1,150 @@
+import uuid
+from datetime import timedelta
+from smtplib import SMTPException
+from time import perf_counter
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import versions
+from .models import Email, EmailDeliveryBatch
+
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(minutes=1)  # Doubles with every failed attempt
+RETRY_MAX_DELAY = timedelta(hours=6)
+CLAIM_TIMEOUT = timedelta(minutes=10)  # A "sending" claim older than this belongs to a worker that died
+ABANDONED_ERROR = "The worker sending this email stopped before it finished."
+
+# Worth another try later (connection refused, 4xx from the server, timeouts)
+TRANSIENT_ERRORS = (SMTPException, OSError)
+# Will fail the same way every time (bad headers, malformed addresses)
+PERMANENT_ERRORS = (ValueError,)
+
+
+def enqueue(queryset):
+    """Queue drafts (and failed emails, for a manual resend) for delivery; returns how many were queued."""
+    queued = queryset.filter(status__in=('draft', 'failed')).update(
+        status='queued', attempts=0, next_attempt_at=timezone.now(), claim='', last_error='',
+    )
+    if queued:
+        versions.bump(versions.EMAILS)
+    return queued
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY)
+
+
+def _claimable(now):
+    return Q(status='queued', next_attempt_at__lte=now)
+
+
+def release_stale(now):
+    """
+    Put emails whose claim went stale back in the queue, counting the claim as a failed attempt:
+    an email that keeps bringing its worker down runs out of attempts and fails like any other.
+    Returns how many were released.
+    """
+    stale = Email.objects.filter(status='sending', claimed_at__lt=now - CLAIM_TIMEOUT)
+    abandoned = {'attempts': F('attempts') + 1, 'claim': '', 'last_error': ABANDONED_ERROR}
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS - 1).update(status='failed', next_attempt_at=None, **abandoned)
+    requeued = stale.update(status='queued', next_attempt_at=now, **abandoned)
+    if failed or requeued:
+        versions.bump(versions.EMAILS)
+    return failed + requeued
+
+
+def claim(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move up to ``batch_size`` due emails to "sending" under a fresh claim token and return them.
+    The UPDATE repeats the due condition, so a row another worker claimed in between no longer
+    matches and is simply not ours; this works the same on SQLite as on a server database.
+    """
+    now = timezone.now()
+    release_stale(now)
+    due = list(
+        Email.objects.filter(_claimable(now)).order_by('next_attempt_at', 'id').values_list('pk', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    token = uuid.uuid4().hex
+    Email.objects.filter(_claimable(now), pk__in=due).update(status='sending', claim=token, claimed_at=now)
+    return list(Email.objects.filter(claim=token, status='sending').order_by('id'))
+
+
+def _message(email, connection):
+    return EmailMessage(email.subject, email.content, email.sender, [email.recipient], connection=connection)
+
+
+def _reschedule(email, error, now):
+    email.attempts += 1
+    email.claim = ''
+    email.last_error = f"{type(error).__name__}: {error}"[:2000]
+    if email.attempts >= MAX_ATTEMPTS or isinstance(error, PERMANENT_ERRORS):
+        email.status = 'failed'
+        email.next_attempt_at = None
+    else:
+        email.status = 'queued'
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def send_batch(batch_size=DEFAULT_BATCH_SIZE, connection=None):
+    """
+    Claim one batch and send it over a single backend connection (one SMTP session for the whole
+    batch). Returns the EmailDeliveryBatch, or None when nothing was due.
+    """
+    emails = claim(batch_size)
+    if not emails:
+        return None
+    batch = EmailDeliveryBatch.objects.create(claimed=len(emails))
+    started = perf_counter()
+    sent, unsent = [], []
+    pending = iter(emails)
+    try:
+        with connection or get_connection() as backend:
+            for email in pending:
+                try:
+                    if not email.recipient:
+                        raise ValueError("Email has no recipient.")
+                    _message(email, backend).send()
+                except TRANSIENT_ERRORS + PERMANENT_ERRORS as error:
+                    unsent.append((email, error))
+                else:
+                    sent.append(email.pk)
+    except TRANSIENT_ERRORS as error:
+        # The connection itself failed: everything not attempted yet goes back in the queue
+        batch.error = f"{type(error).__name__}: {error}"
+        unsent.extend((email, error) for email in pending)
+
+    now = timezone.now()
+    Email.objects.filter(pk__in=sent).update(
+        status='sent', sent_at=now, attempts=F('attempts') + 1, claim='', next_attempt_at=None, last_error='',
+    )
+    for email, error in unsent:
+        _reschedule(email, error, now)
+    Email.objects.bulk_update(
+        [email for email, _ in unsent], ['status', 'attempts', 'claim', 'last_error', 'next_attempt_at'],
+    )
+    versions.bump(versions.EMAILS)
+
+    batch.sent = len(sent)
+    batch.failed = sum(email.status == 'failed' for email, _ in unsent)
+    batch.retried = len(unsent) - batch.failed
+    batch.duration_ms = round((perf_counter() - started) * 1000)
+    batch.finished_at = now
+    batch.save()
+    return batch
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE, time_budget=None):
+    """Send batches until nothing is due or ``time_budget`` seconds have passed; returns the batches."""
+    started = perf_counter()
+    batches = []
+    while time_budget is None or perf_counter() - started < time_budget:
+        batch = send_batch(batch_size)
+        if batch is None:
+            break
+        batches.append(batch)
+    return batches
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import json
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+DEFAULT_PER_PAGE = 50
+
+# Stable list orderings, each backed by an index and ending on a unique column
+EVENT_LIST_ORDERING = ('event_date', 'id')
+LEAD_LIST_ORDERING = ('-inquiry_date', '-id')
+CLIENT_LIST_ORDERING = ('last_name', 'first_name', 'id')
+EMAIL_LIST_ORDERING = ('-sent_at', '-id')
+VENDOR_LIST_ORDERING = ('name',)
+
+ESTIMATE_THRESHOLD = 100_000  # Below this an exact COUNT(*) is cheap enough to keep
+
+
+class KeysetPage:
+    """One page of rows plus the opaque cursors pointing at its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the last row seen instead of using OFFSET,
+    so every page costs one indexed range scan of ``per_page + 1`` rows.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PER_PAGE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        self.per_page = per_page
+
+    def get_page(self, cursor=None):
+        position, backwards = self._decode(cursor)
+        ordering = [('' if desc == backwards else '-') + name for name, desc in self.fields]
+        queryset = self.queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(position, backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        has_next = position is not None if backwards else has_more
+        has_previous = has_more if backwards else position is not None
+        return KeysetPage(
+            rows,
+            next_cursor=self._encode(rows[-1], backwards=False) if rows and has_next else None,
+            previous_cursor=self._encode(rows[0], backwards=True) if rows and has_previous else None,
+        )
+
+    def _seek(self, position, backwards):
+        """Build ``(a > x) OR (a = x AND b > y) OR ...`` for the ordering columns."""
+        condition = Q()
+        for index, (name, desc) in enumerate(self.fields):
+            lookup = 'lt' if desc != backwards else 'gt'
+            clause = Q(**{f'{name}__{lookup}': position[index]})
+            for prior_index, (prior_name, _) in enumerate(self.fields[:index]):
+                clause &= Q(**{prior_name: position[prior_index]})
+            condition |= clause
+        return condition
+
+    def _encode(self, row, backwards):
+        values = [_dump(getattr(row, name)) for name, _ in self.fields]
+        payload = json.dumps({'v': values, 'b': backwards}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        """Return ``(position, backwards)``; a missing or tampered cursor starts at the first page."""
+        if not cursor:
+            return None, False
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = payload['v']
+            if len(values) != len(self.fields):
+                return None, False
+            model_meta = self.queryset.model._meta
+            position = [
+                model_meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+            return position, bool(payload.get('b'))
+        except (ValueError, TypeError, KeyError, binascii.Error, ValidationError):
+            return None, False
+
+
+def _dump(value):
+    if isinstance(value, UUID):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()  # Keeps microseconds, unlike DjangoJSONEncoder
+    return value
+
+
+def paginate(request, queryset, ordering, per_page=DEFAULT_PER_PAGE):
+    """Shortcut for views: page through ``queryset`` using the ``cursor`` query parameter."""
+    return KeysetPaginator(queryset, ordering, per_page).get_page(request.GET.get('cursor'))
+
+
+def estimated_count(model, using='default'):
+    """
+    Approximate row count of a whole table without scanning it, or None where the database
+    can't tell cheaply. PostgreSQL keeps an estimate in its statistics; on SQLite MAX(rowid)
+    is an index lookup that only overshoots by the rows deleted since.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that, for an unfiltered changelist of a big table, uses the planner's
+    estimate instead of COUNT(*). Filtered or small changelists still get the exact count.
+    Pair it with ``show_full_result_count = False`` so the admin doesn't count the table anyway.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is not None and not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
@@ -0,0 +1,190 @@
+import random
+import re
+import threading
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+DEFAULT_MAX_SAMPLES = 1000  # Samples kept per URL name, oldest dropped first
+PERCENTILES = (50, 95, 99)
+METRICS = ('wall_ms', 'sql_ms', 'queries', 'duplicates', 'template_ms')
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+_active_profile = ContextVar('crm_request_profile', default=None)
+_templates_instrumented = False
+
+
+def fingerprint(sql):
+    """Queries arrive with %s placeholders; only IN lists of varying length need folding."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class RequestProfile:
+    __slots__ = ('queries', 'sql_time', 'fingerprints', 'template_time', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper: time every query and remember its shape."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[index]
+
+
+class ProfileStore:
+    """Bounded, thread-safe samples per URL name, plus the most repeated query seen for each."""
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+            self._repeated = defaultdict(Counter)
+
+    def record(self, name, sample, repeated):
+        with self._lock:
+            self._samples[name].append(sample)
+            self._repeated[name].update(repeated)
+
+    def report(self):
+        """One row per URL name, slowest p95 wall time first."""
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+            repeated = {name: counts.most_common(1) for name, counts in self._repeated.items()}
+        rows = []
+        for name, samples in snapshot.items():
+            row = {'url_name': name, 'requests': len(samples)}
+            for index, metric in enumerate(METRICS):
+                values = sorted(sample[index] for sample in samples)
+                for percent in PERCENTILES:
+                    row[f'{metric}_p{percent}'] = round(_percentile(values, percent), 2)
+            row['top_repeated_query'] = repeated[name][0][0] if repeated.get(name) else None
+            rows.append(row)
+        rows.sort(key=lambda row: row['wall_ms_p95'], reverse=True)
+        return rows
+
+
+store = ProfileStore(getattr(settings, 'CRM_PROFILING_MAX_SAMPLES', DEFAULT_MAX_SAMPLES))
+
+
+def instrument_templates():
+    """Time top-level template renders of profiled requests; nested includes are not counted twice."""
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        profile = _active_profile.get()
+        if profile is None:
+            return original_render(self, context)
+        profile.template_depth += 1
+        started = perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += perf_counter() - started
+
+    Template.render = render
+    _templates_instrumented = True
+
+
+def wrap_connections(profile):
+    """An ExitStack that routes every query of this thread's connections through ``profile``."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(profile))
+    return stack
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in request profiler. Set ``CRM_PROFILING_SAMPLE_RATE`` (0-1) to profile that share of
+    requests; at 0 Django drops the middleware entirely. Unsampled requests pay one random() call.
+    Works in sync and async chains alike, so async views are measured without an adapter in between.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'CRM_PROFILING_SAMPLE_RATE', 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        instrument_templates()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        with self.profiled(request) as profile, wrap_connections(profile):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        with self.profiled(request) as profile:
+            # Async ORM calls run in the request's sync thread with that thread's connections, so
+            # the wrappers are installed (and removed) there; the context variable follows on its own
+            wrappers = await sync_to_async(wrap_connections)(profile)
+            try:
+                return await self.get_response(request)
+            finally:
+                await sync_to_async(wrappers.close)()
+
+    @contextmanager
+    def profiled(self, request):
+        """Make ``profile`` the request's active profile and record it once the response is ready."""
+        profile = RequestProfile()
+        token = _active_profile.set(profile)
+        started = perf_counter()
+        try:
+            yield profile
+        finally:
+            _active_profile.reset(token)
+        wall_time = perf_counter() - started
+
+        match = request.resolver_match
+        name = (match.view_name if match else None) or 'unresolved'
+        sample = (
+            wall_time * 1000, profile.sql_time * 1000, profile.queries, profile.duplicates,
+            profile.template_time * 1000,
+        )
+        repeated = {sql: count for sql, count in profile.fingerprints.items() if count > 1}
+        store.record(name, sample, repeated)
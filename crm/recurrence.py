@@ -0,0 +1,212 @@
+"""
+Lazy expansion of RRULE-style recurrence rules (``RecurringEvent``, ``RecurringSchedule``). A rule
+is stored once; its occurrences are generated on demand for the window being looked at, and
+rules without COUNT jump straight to the first period of the window instead of walking the
+series from its first day. Nothing ever materializes an open-ended series.
+
+Supported: FREQ=DAILY/WEEKLY/MONTHLY, INTERVAL, BYDAY (weekly rules), UNTIL and COUNT. Monthly
+rules repeat the day of month of the first occurrence and, as in RFC 5545, skip months that do
+not have that day.
+"""
+import calendar
+import heapq
+from datetime import date, datetime, timedelta
+from itertools import count as counting, takewhile
+from operator import itemgetter
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Calendar, RecurringEvent, RecurringSchedule
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+WEEKDAY_CODES = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Proposed rules are checked for conflicts this far ahead when they have neither UNTIL nor COUNT
+VALIDATION_HORIZON = timedelta(days=366)
+# Feeds asked for no window list occurrences from today up to this far ahead
+FEED_HORIZON = timedelta(days=366)
+
+
+def parse_weekdays(text):
+    """'MO,WE' -> (0, 2). Raises ValueError on anything that is not a weekday code."""
+    codes = [code.strip().upper() for code in (text or '').split(',') if code.strip()]
+    return tuple(sorted({WEEKDAY_CODES.index(code) for code in codes}))
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _periods(starts_on, frequency, interval, weekdays, after):
+    """
+    Candidate dates in order, forever, starting with the period that contains ``after`` (or the
+    first period when ``after`` is None). Callers apply UNTIL and COUNT.
+    """
+    if frequency == DAILY:
+        first = max(-(-(after - starts_on).days // interval), 0) if after else 0
+        for k in counting(first):
+            yield starts_on + timedelta(days=k * interval)
+
+    elif frequency == WEEKLY:
+        days = weekdays or (starts_on.weekday(),)
+        week_zero = starts_on - timedelta(days=starts_on.weekday())
+        first = max((after - week_zero).days // 7 // interval, 0) if after else 0
+        for k in counting(first):
+            week = week_zero + timedelta(weeks=k * interval)
+            for weekday in days:
+                day = week + timedelta(days=weekday)
+                if day >= starts_on:
+                    yield day
+
+    elif frequency == MONTHLY:
+        month_zero = _month_index(starts_on)
+        first = max((_month_index(after) - month_zero) // interval, 0) if after else 0
+        for k in counting(first):
+            year, month = divmod(month_zero + k * interval, 12)
+            if starts_on.day <= calendar.monthrange(year, month + 1)[1]:
+                yield date(year, month + 1, starts_on.day)
+
+    else:
+        raise ValueError(f"Unknown frequency '{frequency}'.")
+
+
+def iter_dates(starts_on, frequency, interval=1, weekdays=(), until=None, count=None, after=None):
+    """
+    Occurrence dates on or after ``after``, in order. Open-ended rules yield forever, so
+    consumers stop on their own (see ``between``). With COUNT the series has to be counted from
+    its first day, but it is finite then.
+    """
+    interval = max(interval or 1, 1)
+    produced = 0
+    for day in _periods(starts_on, frequency, interval, tuple(weekdays), None if count else after):
+        if until and day > until:
+            return
+        produced += 1
+        if count and produced > count:
+            return
+        if after is None or day >= after:
+            yield day
+
+
+def rule_dates(rule, after=None):
+    """``iter_dates`` for a stored rule (anything with the RecurrenceRule fields)."""
+    return iter_dates(
+        rule.starts_on, rule.frequency, rule.interval, parse_weekdays(rule.weekdays),
+        until=rule.until, count=rule.count, after=after,
+    )
+
+
+def between(rule, start_date, end_date):
+    """Occurrence dates of ``rule`` from ``start_date`` to ``end_date`` inclusive, generated lazily."""
+    return takewhile(lambda day: day <= end_date, rule_dates(rule, after=start_date))
+
+
+def validation_window(rule):
+    """(first, last) day of the occurrences checked when a rule is saved."""
+    last = rule.starts_on + VALIDATION_HORIZON
+    if rule.until:
+        last = min(last, rule.until)
+    return rule.starts_on, last
+
+
+def to_rrule(rule, until=None):
+    """
+    The rule in RFC 5545 notation, e.g. ``FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20261231``.
+    ``until`` replaces the UNTIL value, for iCalendar output where it must be a UTC date-time.
+    """
+    parts = [f"FREQ={rule.frequency.upper()}"]
+    if rule.interval and rule.interval > 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    weekdays = parse_weekdays(rule.weekdays)
+    if weekdays and rule.frequency == WEEKLY:
+        parts.append("BYDAY=" + ','.join(WEEKDAY_CODES[weekday] for weekday in weekdays))
+    if rule.until:
+        parts.append(f"UNTIL={until or format(rule.until, '%Y%m%d')}")
+    if rule.count:
+        parts.append(f"COUNT={rule.count}")
+    return ';'.join(parts)
+
+
+def active_between(queryset, start_date, end_date):
+    """Rules that can have an occurrence in the window: started by its end and not over before its start."""
+    return queryset.filter(starts_on__lte=end_date).exclude(until__lt=start_date)
+
+
+def occurrence_span(rule, day):
+    """Aware start and end of a RecurringEvent occurrence; an end time before the start means the next day."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, rule.start_time), tz)
+    end_day = day if rule.end_time > rule.start_time else day + timedelta(days=1)
+    return start, timezone.make_aware(datetime.combine(end_day, rule.end_time), tz)
+
+
+def occurrence_id(rule, day):
+    return f"recurring-{rule.pk}-{day:%Y%m%d}"
+
+
+def _event_rows(rule, start_date, end_date):
+    for day in between(rule, start_date, end_date):
+        start, end = occurrence_span(rule, day)
+        yield {
+            'id': occurrence_id(rule, day), 'recurring_event': rule.pk, 'name': rule.name, 'event_date': day,
+            'start': start, 'end': end, 'venue': rule.venue, 'status': rule.status,
+        }
+
+
+def event_occurrences(start_date, end_date, rules=None):
+    """
+    Event-like row dicts for every RecurringEvent occurrence in the window, ordered by date and
+    start. One query for the rules (unless already loaded ones are passed in); the rows themselves
+    are generated while they are consumed.
+    """
+    if rules is None:
+        rules = active_between(RecurringEvent.objects.all(), start_date, end_date)
+    return heapq.merge(
+        *(_event_rows(rule, start_date, end_date) for rule in rules), key=itemgetter('event_date', 'start'),
+    )
+
+
+def _schedule_rows(rule, start_date, end_date):
+    for day in between(rule, start_date, end_date):
+        yield {
+            'id': occurrence_id(rule, day), 'recurring_schedule': rule.pk, 'day': day,
+            'start_time': rule.start_time, 'end_time': rule.end_time, 'notes': rule.notes,
+        }
+
+
+def schedule_occurrences(start_date, end_date, rules=None):
+    """Calendar-like row dicts for every RecurringSchedule occurrence in the window, by day and start time."""
+    if rules is None:
+        rules = active_between(RecurringSchedule.objects.all(), start_date, end_date)
+    return heapq.merge(
+        *(_schedule_rows(rule, start_date, end_date) for rule in rules), key=itemgetter('day', 'start_time'),
+    )
+
+
+def recurring_schedules_overlapping(day, start_time, end_time, exclude=None):
+    """RecurringSchedules with an occurrence on ``day`` overlapping the given times."""
+    rules = active_between(RecurringSchedule.objects.all(), day, day).filter(
+        start_time__lt=end_time, end_time__gt=start_time,
+    )
+    if exclude is not None:
+        rules = rules.exclude(pk=exclude)
+    return [rule for rule in rules if next(between(rule, day, day), None)]
+
+
+def schedule_conflicts(rule):
+    """
+    Days on which an occurrence of ``rule`` (within ``validation_window``) overlaps a Calendar
+    entry or another RecurringSchedule. One range query each for entries and rules.
+    """
+    first, last = validation_window(rule)
+    overlapping_times = Q(start_time__lt=rule.end_time, end_time__gt=rule.start_time)
+    taken = set(
+        Calendar.objects.filter(overlapping_times, day__range=(first, last)).values_list('day', flat=True)
+    )
+    others = active_between(RecurringSchedule.objects.filter(overlapping_times), first, last).exclude(pk=rule.pk)
+    for other in others:
+        taken.update(between(other, first, last))
+    return (day for day in between(rule, first, last) if day in taken)
@@ -0,0 +1,121 @@
+"""
+Overdue task reminders. A task is overdue from the day after its due date until it is completed.
+Each run reports the overdue tasks that were never reminded about, whenever they were created or
+reopened, and stamps them with ``reminded_at``; a partial index over the incomplete, unreminded
+tasks keeps the scan to those rows however much history there is. Reopening a task or moving its
+due date clears the stamp (see crm/signals.py). Everything a run finds goes out as one digest per
+recipient, grouped by event, through the outbound mail queue (crm/outbox.py).
+
+Tasks are claimed with a conditional UPDATE, as crm/outbox.py claims emails, so two runs at the
+same time (the schedule and the command) never report the same task twice.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from . import outbox
+from .models import Email, Task, TaskReminderRun
+
+SCAN_CHUNK_SIZE = 2000
+MAX_EVENTS_PER_DIGEST = 200
+MAX_TASKS_PER_EVENT = 10
+
+
+def newly_overdue(through):
+    """Incomplete tasks due on or before ``through`` that no run has reported yet (the partial index)."""
+    return Task.objects.filter(is_completed=False, reminded_at__isnull=True, due_date__lte=through)
+
+
+def claim(through, stamp):
+    """
+    Stamp the newly overdue tasks with ``stamp`` chunk by chunk and return the ids this run got.
+    The UPDATE repeats the condition, so a task another run stamped in between is not ours.
+    """
+    pending = newly_overdue(through).order_by('due_date', 'id').values_list('pk', flat=True)
+    claimed = []
+    while ids := list(pending[:SCAN_CHUNK_SIZE]):
+        newly_overdue(through).filter(pk__in=ids).update(reminded_at=stamp)
+        claimed.extend(Task.objects.filter(pk__in=ids, reminded_at=stamp).values_list('pk', flat=True))
+    return claimed
+
+
+def group_by_event(task_ids):
+    """
+    ``({event_id: group}, total)`` for the given tasks, read in chunks. A group keeps the event's
+    name and date, its number of overdue tasks and the first few of them.
+    """
+    groups = {}
+    total = 0
+    for offset in range(0, len(task_ids), SCAN_CHUNK_SIZE):
+        rows = (
+            Task.objects.filter(pk__in=task_ids[offset:offset + SCAN_CHUNK_SIZE]).order_by('due_date', 'id')
+            .values_list('event_id', 'event__name', 'event__event_date', 'due_date', 'description')
+        )
+        for event_id, name, event_date, due_date, description in rows:
+            group = groups.setdefault(event_id, {'name': name, 'event_date': event_date, 'count': 0, 'tasks': []})
+            group['count'] += 1
+            if len(group['tasks']) < MAX_TASKS_PER_EVENT:
+                group['tasks'].append((due_date, description))
+            total += 1
+    return groups, total
+
+
+def recipients():
+    """``CRM_TASK_REMINDER_RECIPIENTS`` when set, otherwise every active staff user with an email address."""
+    configured = getattr(settings, 'CRM_TASK_REMINDER_RECIPIENTS', None)
+    if configured is not None:
+        return list(configured)
+    staff = get_user_model().objects.filter(is_staff=True, is_active=True).exclude(email='')
+    return sorted(set(staff.values_list('email', flat=True)))
+
+
+def digest(groups, total):
+    """Subject and body of the reminder, busiest events first."""
+    ordered = sorted(groups.values(), key=lambda group: (-group['count'], group['event_date'], group['name']))
+    lines = []
+    for group in ordered[:MAX_EVENTS_PER_DIGEST]:
+        lines.append(f"{group['name']} ({group['event_date']}): {group['count']} overdue")
+        lines.extend(f"  - due {due_date}: {description}" for due_date, description in group['tasks'])
+        if group['count'] > len(group['tasks']):
+            lines.append(f"  - and {group['count'] - len(group['tasks'])} more")
+    if len(ordered) > MAX_EVENTS_PER_DIGEST:
+        lines.append(f"... and {len(ordered) - MAX_EVENTS_PER_DIGEST} more event(s).")
+    return f"{total} task(s) became overdue across {len(groups)} event(s)", '\n'.join(lines)
+
+
+def run(today=None):
+    """
+    Report the tasks that became overdue (due before ``today``) and have not been reported yet.
+    Returns the TaskReminderRun, or None when there is nothing new. A failed run rolls its claim
+    back, so the next run reports the same tasks again.
+    """
+    today = today or timezone.localdate()
+    through = today - timedelta(days=1)
+    if not newly_overdue(through).exists():
+        return None
+
+    reminder_run = TaskReminderRun.objects.create(scanned_through=through)
+    try:
+        with transaction.atomic():
+            groups, total = group_by_event(claim(through, reminder_run.started_at))
+            if groups:
+                subject, body = digest(groups, total)
+                sender = settings.DEFAULT_FROM_EMAIL
+                # Created read: the digest is outgoing mail, not something for the unread count
+                emails = [
+                    Email.objects.create(sender=sender, recipient=recipient, subject=subject, content=body, is_read=True)
+                    for recipient in recipients()
+                ]
+                reminder_run.emails_queued = outbox.enqueue(Email.objects.filter(pk__in=[email.pk for email in emails]))
+            reminder_run.tasks_overdue = total
+            reminder_run.events = len(groups)
+            reminder_run.finished_at = timezone.now()
+            reminder_run.save()
+    except Exception as error:
+        reminder_run.error = f"{type(error).__name__}: {error}"
+        reminder_run.save(update_fields=['error'])
+        raise
+    return reminder_run
@@ -0,0 +1,188 @@
+"""
+Analytics rollups: how many leads (by inquiry date) and events (by event date) there are per
+status and day or month, stored in the Rollup table. Signals move rows between buckets as they
+are created, edited and deleted; bulk writers call ``add_objects``. Reports read a few dozen
+Rollup rows per year, however many leads and events there are. ``rebuild`` (the
+``rebuild_rollups`` command) recomputes everything with one GROUP BY per series and period.
+"""
+from collections import Counter as Tally
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+from .models import Event, Lead, Rollup
+
+LEADS = 'lead'
+EVENTS = 'event'
+DAY = 'day'
+MONTH = 'month'
+PERIODS = (DAY, MONTH)
+TRUNCATE = {DAY: F, MONTH: TruncMonth}
+
+# Series -> (model, date field, status field)
+SERIES = {
+    LEADS: (Lead, 'inquiry_date', 'status'),
+    EVENTS: (Event, 'event_date', 'status'),
+}
+SERIES_BY_MODEL = {model: series for series, (model, _, _) in SERIES.items()}
+
+
+def period_start(day, period):
+    return day.replace(day=1) if period == MONTH else day
+
+
+def _buckets(series, day, status):
+    return [(series, period, period_start(day, period), status) for period in PERIODS]
+
+
+def bucket_of(instance):
+    """(date, status) an instance is counted under, or None for models without a series."""
+    series = SERIES_BY_MODEL.get(type(instance))
+    if series is None:
+        return None
+    _, date_field, status_field = SERIES[series]
+    return getattr(instance, date_field), getattr(instance, status_field)
+
+
+def apply(deltas):
+    """Add ``{(series, period, period_start, status): delta}`` to the stored counts, one UPDATE per bucket."""
+    for (series, period, start, status), delta in deltas.items():
+        if not delta:
+            continue
+        bucket = Rollup.objects.filter(series=series, period=period, period_start=start, status=status)
+        if bucket.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                Rollup.objects.create(series=series, period=period, period_start=start, status=status, count=delta)
+        except IntegrityError:
+            bucket.update(count=F('count') + delta)  # Created by a concurrent writer in between
+
+
+def remember(instance):
+    """Called from pre_save: keep the stored (date, status) so ``record_saved`` knows which bucket the row left."""
+    series = SERIES_BY_MODEL[type(instance)]
+    _, date_field, status_field = SERIES[series]
+    instance._stored_rollup_bucket = None
+    if instance.pk is not None:
+        instance._stored_rollup_bucket = (
+            type(instance).objects.filter(pk=instance.pk).values_list(date_field, status_field).first()
+        )
+
+
+def record_saved(instance):
+    series = SERIES_BY_MODEL[type(instance)]
+    old, new = getattr(instance, '_stored_rollup_bucket', None), bucket_of(instance)
+    if old == new:
+        return
+    deltas = Tally()
+    if old is not None:
+        deltas.subtract(_buckets(series, *old))
+    deltas.update(_buckets(series, *new))
+    apply(deltas)
+
+
+def record_deleted(instance):
+    deltas = Tally()
+    deltas.subtract(_buckets(SERIES_BY_MODEL[type(instance)], *bucket_of(instance)))
+    apply(deltas)
+
+
+def add_objects(objects):
+    """Count rows inserted with ``bulk_create`` (which sends no signals), one UPDATE per touched bucket."""
+    deltas = Tally()
+    for instance in objects:
+        bucket = bucket_of(instance)
+        if bucket is not None:
+            deltas.update(_buckets(SERIES_BY_MODEL[type(instance)], *bucket))
+    apply(deltas)
+
+
+def update_status(queryset, status):
+    """
+    ``queryset.update(status=status)`` with the rollups moved along: one GROUP BY over the
+    affected rows for their old buckets, then the UPDATE. Returns the number of rows updated.
+    """
+    series = SERIES_BY_MODEL[queryset.model]
+    _, date_field, status_field = SERIES[series]
+    moving = queryset.exclude(**{status_field: status})
+    groups = list(
+        moving.values(date_field, status_field).annotate(total=Count('pk')).order_by()
+        .values_list(date_field, status_field, 'total')
+    )
+    updated = moving.update(**{status_field: status})
+    deltas = Tally()
+    for day, old_status, total in groups:
+        for bucket in _buckets(series, day, old_status):
+            deltas[bucket] -= total
+        for bucket in _buckets(series, day, status):
+            deltas[bucket] += total
+    apply(deltas)
+    return updated
+
+
+def compute(series, period):
+    """{(series, period, period_start, status): count} straight from the table; a full scan, keep it off the request path."""
+    model, date_field, status_field = SERIES[series]
+    rows = (
+        model.objects.annotate(bucket=TRUNCATE[period](date_field)).values('bucket', status_field)
+        .annotate(total=Count('pk')).order_by().values_list('bucket', status_field, 'total')
+    )
+    return {(series, period, start, status): total for start, status, total in rows}
+
+
+def rebuild(series=None):
+    """
+    Recompute the rollups of ``series`` (all by default) from scratch and return
+    {series: (buckets, drifted)}, ``drifted`` being how many stored buckets were wrong.
+    """
+    summary = {}
+    for name in ([series] if series else SERIES):
+        with transaction.atomic():
+            stored_rows = Rollup.objects.select_for_update().filter(series=name)
+            stored = {
+                (name, period, start, status): count
+                for period, start, status, count in stored_rows.values_list('period', 'period_start', 'status', 'count')
+            }
+            actual = {}
+            for period in PERIODS:
+                actual.update(compute(name, period))
+            drifted = sum(
+                stored.get(key, 0) != actual.get(key, 0) for key in stored.keys() | actual.keys()
+            )
+            Rollup.objects.filter(series=name).delete()
+            Rollup.objects.bulk_create(
+                Rollup(series=name, period=period, period_start=start, status=status, count=count)
+                for (_, period, start, status), count in actual.items()
+            )
+        summary[name] = (len(actual), drifted)
+    return summary
+
+
+def report(series, period, start_date, end_date):
+    """
+    ``[{'period_start', 'counts': {status: n}, 'total'}, ...]`` for the periods between two dates
+    that have any rows, oldest first. One range query over the Rollup table.
+    """
+    rows = (
+        Rollup.objects.filter(
+            series=series, period=period,
+            period_start__range=(period_start(start_date, period), end_date),
+        )
+        .exclude(count=0).order_by('period_start', 'status').values_list('period_start', 'status', 'count')
+    )
+    periods = {}
+    for start, status, count in rows:
+        entry = periods.setdefault(start, {'period_start': start, 'counts': {}, 'total': 0})
+        entry['counts'][status] = count
+        entry['total'] += count
+    return list(periods.values())
+
+
+def lead_funnel(period, start_date, end_date):
+    """Lead counts per status plus the share converted, per period."""
+    periods = report(LEADS, period, start_date, end_date)
+    for entry in periods:
+        entry['conversion_rate'] = round(entry['counts'].get('converted', 0) / entry['total'], 4)
+    return periods
@@ -0,0 +1,190 @@
+import re
+from itertools import islice
+from typing import Any, NamedTuple
+from uuid import UUID
+
+from django.db import NotSupportedError, connection, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Client, Lead, Event, Note, Message, SearchDocument
+
+FTS_TABLE = 'crm_search'  # Created by migration 0007 on SQLite
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+REBUILD_CHUNK_SIZE = 2000
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+SNIPPET_TOKENS = 12
+
+# Private-use markers wrapped around matches by snippet(), turned into <mark> after escaping
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+# Each builder returns (label, title, body, event_id) for one object
+def _client_document(client):
+    return str(client), str(client), _join(client.email, client.phone_number), None
+
+
+def _lead_document(lead):
+    return str(lead), str(lead), _join(lead.email, lead.phone_number, lead.notes), None
+
+
+def _event_document(event):
+    return event.name, event.name, _join(event.venue, event.description), event.pk
+
+
+def _note_document(note):
+    return "Note", '', note.content, note.event_id
+
+
+def _message_document(message):
+    return f"Message from {message.sender}", message.sender, _join(message.recipient, message.content), message.event_id
+
+
+INDEXED = {
+    'client': (Client, _client_document),
+    'lead': (Lead, _lead_document),
+    'event': (Event, _event_document),
+    'note': (Note, _note_document),
+    'message': (Message, _message_document),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, _) in INDEXED.items()}
+
+
+class SearchResult(NamedTuple):
+    kind: str
+    object_id: str
+    label: str
+    event_id: Any
+    snippet: str
+    score: float
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _documents(objects):
+    for obj in objects:
+        kind = KIND_BY_MODEL[type(obj)]
+        label, title, body, event_id = INDEXED[kind][1](obj)
+        yield kind, str(obj.pk), label[:255], event_id, title, body
+
+
+def _delete_rows(cursor, rowids):
+    for chunk in _chunks(rowids, 500):
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def index_objects(objects):
+    """Add or refresh index entries for any mix of indexed model instances."""
+    if not is_supported():
+        return
+    documents = list(_documents(objects))
+    if not documents:
+        return
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        stored = {}
+        for kind in {document[0] for document in documents}:
+            ids = [document[1] for document in documents if document[0] == kind]
+            for chunk in _chunks(ids, 500):
+                for doc in SearchDocument.objects.filter(kind=kind, object_id__in=chunk):
+                    stored[(kind, doc.object_id)] = doc
+
+        changed, created = [], []
+        for kind, object_id, label, event_id, _, _ in documents:
+            doc = stored.get((kind, object_id))
+            if doc is None:
+                created.append(SearchDocument(kind=kind, object_id=object_id, label=label, event_id=event_id))
+            elif (doc.label, doc.event_id) != (label, event_id):
+                doc.label, doc.event_id = label, event_id
+                changed.append(doc)
+        _delete_rows(cursor, [doc.pk for doc in stored.values()])
+        SearchDocument.objects.bulk_update(changed, ['label', 'event_id'])
+        for doc in SearchDocument.objects.bulk_create(created):
+            stored[(doc.kind, doc.object_id)] = doc
+
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+            [(stored[(kind, object_id)].pk, title, body) for kind, object_id, _, _, title, body in documents],
+        )
+
+
+def remove_objects(objects):
+    if not is_supported():
+        return
+    keys = [(KIND_BY_MODEL[type(obj)], str(obj.pk)) for obj in objects]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for kind in {kind for kind, _ in keys}:
+            docs = SearchDocument.objects.filter(kind=kind, object_id__in=[pk for k, pk in keys if k == kind])
+            _delete_rows(cursor, list(docs.values_list('pk', flat=True)))
+            docs.delete()
+
+
+def rebuild(stdout=None):
+    """Drop and rebuild the whole index, reading every indexed table in chunks."""
+    if not is_supported():
+        raise NotSupportedError("Full-text search needs SQLite's FTS5.")
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        SearchDocument.objects.all().delete()
+        totals = {}
+        for kind, (model, _) in INDEXED.items():
+            totals[kind] = 0
+            for chunk in _chunks(model.objects.order_by('pk').iterator(chunk_size=REBUILD_CHUNK_SIZE), REBUILD_CHUNK_SIZE):
+                index_objects(chunk)
+                totals[kind] += len(chunk)
+    return totals
+
+
+def build_match(query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet).replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>'))
+
+
+def search(query, kind=None, limit=DEFAULT_LIMIT):
+    """Ranked matches for ``query``, best first. Titles weigh more than bodies."""
+    if not is_supported():
+        raise NotSupportedError("Full-text search needs SQLite's FTS5.")
+    match = build_match(query)
+    if not match:
+        return []
+
+    sql = (
+        f"SELECT d.kind, d.object_id, d.label, d.event_id, "
+        f"snippet({FTS_TABLE}, -1, char(2), char(3), '…', {SNIPPET_TOKENS}), "
+        f"bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+        f"FROM {FTS_TABLE} JOIN {SearchDocument._meta.db_table} d ON d.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s"
+    )
+    params = [match]
+    if kind:
+        sql += " AND d.kind = %s"
+        params.append(kind)
+    sql += " ORDER BY score LIMIT %s"
+    params.append(max(1, min(limit, MAX_LIMIT)))  # SQLite treats a negative LIMIT as no limit
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            SearchResult(kind, object_id, label, UUID(event_id) if event_id else None, _highlight(snippet), score)
+            for kind, object_id, label, event_id, snippet, score in cursor.fetchall()
+        ]
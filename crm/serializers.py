@@ -4,4 +4,12 @@ from .models import Event
 class EventSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
-        fields = ['id', 'name', 'start', 'end', 'description']
\ No newline at end of file
+        fields = ['id', 'name', 'start', 'end', 'description']
+
+
+class BookingSerializer(serializers.Serializer):
+    venue = serializers.CharField(max_length=255)
+    event_date = serializers.DateField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    id = serializers.UUIDField(required=False, allow_null=True)
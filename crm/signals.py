@@ -1,10 +1,260 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Client
+from . import admin_calendar, broker, counters, ics, month_grid, rollups, search, versions
+from .models import (
+    Client, Lead, Event, Email, Note, Message, Vendor, Calendar, RecurringEvent, RecurringSchedule, Task,
+)
 
 @receiver(pre_save, sender=Client)
 def validate_unique_email(sender, instance, **kwargs):
     if Client.objects.filter(email=instance.email).exclude(pk=instance.pk).exists():
         raise ValidationError(f"A client with email {instance.email} already exists.")
 
+
+# Counters
+@receiver(post_save, sender=Lead)
+def count_lead_created(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(counters.LEADS_COUNT)
+
+
+@receiver(post_delete, sender=Lead)
+def count_lead_deleted(sender, instance, **kwargs):
+    counters.increment(counters.LEADS_COUNT, -1)
+
+
+@receiver(post_save, sender=Event)
+def count_event_created(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(counters.EVENTS_COUNT)
+
+
+@receiver(post_delete, sender=Event)
+def count_event_deleted(sender, instance, **kwargs):
+    counters.increment(counters.EVENTS_COUNT, -1)
+
+
+@receiver(pre_save, sender=Email)
+def remember_email_read_state(sender, instance, **kwargs):
+    """Keep the stored is_read value so post_save knows whether the unread count moved."""
+    instance._was_unread = False
+    if instance.pk:
+        stored = Email.objects.filter(pk=instance.pk).values_list('is_read', flat=True).first()
+        instance._was_unread = stored is False
+
+
+@receiver(post_save, sender=Email)
+def count_email_saved(sender, instance, **kwargs):
+    is_unread = not instance.is_read
+    counters.increment(counters.EMAIL_COUNT, int(is_unread) - int(getattr(instance, '_was_unread', False)))
+
+
+@receiver(post_delete, sender=Email)
+def count_email_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        counters.increment(counters.EMAIL_COUNT, -1)
+
+
+# Calendar month grids
+@receiver(pre_save, sender=Event)
+def remember_event_date(sender, instance, **kwargs):
+    """
+    Keep the stored event_date, client and venue so a rescheduled or moved event also clears the
+    months and iCalendar feeds it moved away from.
+    """
+    stored = Event.objects.filter(pk=instance.pk).values_list('event_date', 'client_id', 'venue').first()
+    instance._stored_event_date, instance._stored_client_id, instance._stored_venue = stored or (None, None, None)
+
+
+@receiver(post_save, sender=Event)
+def invalidate_month_grid_on_save(sender, instance, **kwargs):
+    # After commit: a request rebuilding the grid before then would cache the old one again
+    days = (instance.event_date, getattr(instance, '_stored_event_date', None))
+    transaction.on_commit(lambda: month_grid.invalidate_dates(*days))
+    transaction.on_commit(lambda: admin_calendar.invalidate_dates(*days))
+
+
+@receiver(post_delete, sender=Event)
+def invalidate_month_grid_on_delete(sender, instance, **kwargs):
+    day = instance.event_date
+    transaction.on_commit(lambda: month_grid.invalidate_dates(day))
+    transaction.on_commit(lambda: admin_calendar.invalidate_dates(day))
+
+
+# Admin schedule calendar
+@receiver(pre_save, sender=Calendar)
+def remember_schedule_day(sender, instance, **kwargs):
+    instance._stored_day = Calendar.objects.filter(pk=instance.pk).values_list('day', flat=True).first()
+
+
+@receiver(post_save, sender=Calendar)
+def invalidate_admin_calendar_on_save(sender, instance, **kwargs):
+    days = (instance.day, getattr(instance, '_stored_day', None))
+    transaction.on_commit(lambda: admin_calendar.invalidate_dates(*days))
+
+
+@receiver(post_delete, sender=Calendar)
+def invalidate_admin_calendar_on_delete(sender, instance, **kwargs):
+    day = instance.day
+    transaction.on_commit(lambda: admin_calendar.invalidate_dates(day))
+
+
+# iCalendar feeds (crm/ics.py)
+@receiver(post_save, sender=Event)
+def invalidate_event_feeds_on_save(sender, instance, **kwargs):
+    ics.invalidate(ics.CLIENT, instance.client_id, getattr(instance, '_stored_client_id', None))
+    ics.invalidate(ics.VENUE, instance.venue, getattr(instance, '_stored_venue', None))
+    ics.invalidate(ics.VENDOR, *instance.vendors.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Event)
+def remember_event_vendors(sender, instance, **kwargs):
+    """The vendor links are gone by post_delete (and their removal sends no m2m_changed)."""
+    instance._stored_vendor_ids = list(instance.vendors.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Event)
+def invalidate_event_feeds_on_delete(sender, instance, **kwargs):
+    ics.invalidate(ics.CLIENT, instance.client_id)
+    ics.invalidate(ics.VENUE, instance.venue)
+    ics.invalidate(ics.VENDOR, *getattr(instance, '_stored_vendor_ids', ()))
+
+
+@receiver(m2m_changed, sender=Event.vendors.through)
+def invalidate_vendor_feeds(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # pk_set is None for clear(); remember which vendors are about to be unlinked
+        if not reverse:
+            instance._cleared_feed_ids = list(instance.vendors.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:  # vendor.events.add(...): one vendor feed
+        ics.invalidate(ics.VENDOR, instance.pk)
+    else:
+        ics.invalidate(ics.VENDOR, *(pk_set if action != 'post_clear' else getattr(instance, '_cleared_feed_ids', ())))
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_client_feed(sender, instance, **kwargs):
+    ics.invalidate(ics.CLIENT, instance.pk)
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_vendor_feed(sender, instance, **kwargs):
+    ics.invalidate(ics.VENDOR, instance.pk)
+
+
+@receiver(pre_save, sender=RecurringEvent)
+def remember_recurring_event_feeds(sender, instance, **kwargs):
+    stored = RecurringEvent.objects.filter(pk=instance.pk).values_list('client_id', 'venue').first()
+    instance._stored_client_id, instance._stored_venue = stored or (None, None)
+
+
+@receiver(post_save, sender=RecurringEvent)
+@receiver(post_delete, sender=RecurringEvent)
+def invalidate_recurring_event_feeds(sender, instance, **kwargs):
+    ics.invalidate(ics.CLIENT, instance.client_id, getattr(instance, '_stored_client_id', None))
+    ics.invalidate(ics.VENUE, instance.venue, getattr(instance, '_stored_venue', None))
+
+
+@receiver(post_save, sender=Calendar)
+@receiver(post_delete, sender=Calendar)
+@receiver(post_save, sender=RecurringSchedule)
+@receiver(post_delete, sender=RecurringSchedule)
+def invalidate_schedule_feed(sender, **kwargs):
+    ics.invalidate(ics.SCHEDULE, ics.SCHEDULE_KEY)
+
+
+# Overdue task reminders (crm/reminders.py)
+@receiver(pre_save, sender=Task)
+def reset_task_reminder(sender, instance, **kwargs):
+    """A reopened or rescheduled task is reported again once it is overdue."""
+    if instance.pk is None or instance.reminded_at is None:
+        return
+    stored = Task.objects.filter(pk=instance.pk).values_list('due_date', 'is_completed').first()
+    if stored is None:
+        return
+    due_date, was_completed = stored
+    if due_date != instance.due_date or (was_completed and not instance.is_completed):
+        instance.reminded_at = None
+
+
+# Analytics rollups (crm/rollups.py)
+@receiver(pre_save, sender=Lead)
+@receiver(pre_save, sender=Event)
+def remember_rollup_bucket(sender, instance, **kwargs):
+    rollups.remember(instance)
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Event)
+def update_rollups_on_save(sender, instance, **kwargs):
+    rollups.record_saved(instance)
+
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Event)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.record_deleted(instance)
+
+
+# Full-text search index
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=Message)
+def update_search_index(sender, instance, **kwargs):
+    search.index_objects([instance])
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=Message)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_objects([instance])
+
+
+# Live message streams (crm.async_api.message_stream)
+@receiver(post_save, sender=Message)
+def publish_new_message(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: broker.publish_message(instance))
+
+
+# Collection versions behind the ETags of list pages and feeds (crm/versions.py)
+VERSIONED_MODELS = {
+    Event: versions.EVENTS,
+    Client: versions.CLIENTS,
+    Lead: versions.LEADS,
+    Email: versions.EMAILS,
+    Vendor: versions.VENDORS,
+    # Also part of the month grid and admin calendar cache keys
+    RecurringEvent: versions.RECURRING_EVENTS,
+    RecurringSchedule: versions.RECURRING_SCHEDULES,
+}
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Email)
+@receiver(post_save, sender=Vendor)
+@receiver(post_save, sender=RecurringEvent)
+@receiver(post_save, sender=RecurringSchedule)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Email)
+@receiver(post_delete, sender=Vendor)
+@receiver(post_delete, sender=RecurringEvent)
+@receiver(post_delete, sender=RecurringSchedule)
+def bump_collection_version(sender, **kwargs):
+    versions.bump(VERSIONED_MODELS[sender])
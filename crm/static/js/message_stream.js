@@ -0,0 +1,25 @@
+// Appends new messages to the event detail page as the server pushes them.
+// EventSource reconnects on its own and sends Last-Event-ID, so nothing is missed or repeated.
+document.addEventListener('DOMContentLoaded', function () {
+    var list = document.getElementById('messages');
+    if (!list || !window.EventSource) {
+        return;
+    }
+
+    var url = list.dataset.streamUrl;
+    if (list.dataset.lastId) {
+        url += '?last_event_id=' + encodeURIComponent(list.dataset.lastId);
+    }
+
+    var source = new EventSource(url);
+    source.addEventListener('message', function (event) {
+        var message = JSON.parse(event.data);
+        var empty = list.querySelector('.empty');
+        if (empty) {
+            empty.remove();
+        }
+        var item = document.createElement('li');
+        item.textContent = new Date(message.sent_at).toLocaleString() + ' - ' + message.sender + ': ' + message.content;
+        list.appendChild(item);
+    });
+});
@@ -0,0 +1,223 @@
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Client, Vendor, Event, Task, Message, Note, Lead, Email, Calendar,
+    EVENT_STATUS_CHOICES, LEAD_STATUS_CHOICES, EMAIL_STATUS_CHOICES,
+)
+
+DEFAULT_BATCH_SIZE = 5000
+
+FIRST_NAMES = [
+    'Olivia', 'Liam', 'Emma', 'Noah', 'Ava', 'Elijah', 'Sophia', 'James', 'Isabella', 'Lucas',
+    'Mia', 'Mateo', 'Amelia', 'Benjamin', 'Harper', 'Theo', 'Evelyn', 'Henry', 'Aria', 'Levi',
+    'Priya', 'Wei', 'Fatima', 'Diego', 'Chloe', 'Kenji', 'Zara', 'Omar', 'Nora', 'Samuel',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+    'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+    'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Nguyen',
+]
+VENUES = [
+    'The Grand Ballroom', 'Riverside Barn', 'Oak Hill Estate', 'Harbor View Terrace', 'Magnolia Gardens',
+    'The Glasshouse', 'Willow Creek Vineyard', 'City Loft', 'Cedar Lodge', 'Seaside Pavilion',
+    'Old Mill Hall', 'Rosewood Manor', 'Sunset Rooftop', 'The Conservatory', 'Maple Farm',
+]
+EVENT_KINDS = ['Wedding', 'Rehearsal Dinner', 'Engagement Party', 'Anniversary', 'Vow Renewal', 'Reception']
+VENDOR_KINDS = ['Photography', 'Florals', 'Catering', 'DJ', 'String Quartet', 'Bakery', 'Lighting', 'Rentals']
+TASK_DESCRIPTIONS = [
+    'Confirm headcount', 'Send contract', 'Collect deposit', 'Finalize menu', 'Book tasting',
+    'Schedule walkthrough', 'Send timeline to vendors', 'Confirm floor plan', 'Order linens',
+]
+PHRASES = [
+    'Can we move the ceremony thirty minutes later?', 'Attaching the updated floor plan.',
+    'The florist confirmed peonies for the centerpieces.', 'Please send the final invoice.',
+    'Guests will arrive by shuttle from the hotel.', 'We need two vegetarian meals added.',
+    'Rain plan is the covered terrace.', 'Photographer needs a shot list by Friday.',
+]
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep generated values for auto_now_add fields instead of stamping now()."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _field(model, name):
+    return model._meta.get_field(name)
+
+
+class DataGenerator:
+    """
+    Deterministic, seeded generator for every CRM model. Rows are produced and inserted in
+    batches, and children (tasks, messages, notes, vendor links) are created alongside each
+    batch of events, so memory stays bounded however many rows are requested.
+    """
+
+    def __init__(self, seed=0, batch_size=DEFAULT_BATCH_SIZE, start_date=date(2020, 1, 1), years=6, stdout=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.start_date = start_date
+        self.days = years * 365
+        self.stdout = stdout
+        self.created = {}
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def _uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def _day(self):
+        return self.start_date + timedelta(days=self.rng.randrange(self.days))
+
+    def _moment(self, day):
+        return timezone.make_aware(datetime.combine(day, time(self.rng.randrange(8, 22), self.rng.choice((0, 30)))))
+
+    def _name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def _phone(self):
+        return f"555-{self.rng.randrange(100, 1000)}-{self.rng.randrange(1000, 10000)}"
+
+    def _around(self, average):
+        """A count that averages ``average``, e.g. 10 messages per event on average."""
+        return self.rng.randint(0, round(average * 2)) if average else 0
+
+    def _insert(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.created[model.__name__] = self.created.get(model.__name__, 0) + len(objects)
+
+    def _batches(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield offset, min(self.batch_size, total - offset)
+
+    def clients(self, total):
+        ids = []
+        for offset, size in self._batches(total):
+            batch = []
+            for number in range(offset, offset + size):
+                first, last = self._name()
+                batch.append(Client(
+                    first_name=first, last_name=last, phone_number=self._phone(),
+                    email=f"{first}.{last}.{self.seed}-{number}@example.com".lower(),
+                ))
+            with transaction.atomic():
+                self._insert(Client, batch)
+            ids.extend(client.pk for client in batch)
+        return ids
+
+    def vendors(self, total):
+        batch = [
+            Vendor(
+                name=f"{self.rng.choice(LAST_NAMES)} {self.rng.choice(VENDOR_KINDS)} {self.seed}-{number}",
+                contact_email=f"vendor{self.seed}-{number}@example.com", phone_number=self._phone(),
+            )
+            for number in range(total)
+        ]
+        self._insert(Vendor, batch)
+        return [vendor.pk for vendor in batch]
+
+    def events(self, total, client_ids, vendor_ids, vendors_per_event=2, tasks_per_event=3,
+               messages_per_event=10, notes_per_event=1):
+        Link = Event.vendors.through
+        statuses = [value for value, _ in EVENT_STATUS_CHOICES]
+        with explicit_timestamps(_field(Message, 'sent_at'), _field(Note, 'created_at')):
+            for offset, size in self._batches(total):
+                events, links, tasks, messages, notes = [], [], [], [], []
+                for _ in range(size):
+                    day = self._day()
+                    start = self._moment(day)
+                    event = Event(
+                        id=self._uuid(), client_id=self.rng.choice(client_ids), event_date=day,
+                        start=start, end=start + timedelta(hours=self.rng.choice((2, 3, 4, 5, 6))),
+                        name=f"{self.rng.choice(LAST_NAMES)} {self.rng.choice(EVENT_KINDS)}",
+                        venue=self.rng.choice(VENUES), status=self.rng.choice(statuses),
+                        description=self.rng.choice(PHRASES),
+                    )
+                    events.append(event)
+                    if vendor_ids:
+                        picked = self.rng.sample(vendor_ids, min(len(vendor_ids), self._around(vendors_per_event)))
+                        links.extend(Link(event_id=event.id, vendor_id=vendor_id) for vendor_id in picked)
+                    tasks.extend(
+                        Task(event_id=event.id, description=self.rng.choice(TASK_DESCRIPTIONS),
+                             due_date=day - timedelta(days=self.rng.randrange(1, 120)),
+                             is_completed=self.rng.random() < 0.6)
+                        for _ in range(self._around(tasks_per_event))
+                    )
+                    messages.extend(
+                        Message(event_id=event.id, sender=' '.join(self._name()), content=self.rng.choice(PHRASES),
+                                recipient=f"planner{self.rng.randrange(10)}@example.com",
+                                sent_at=start - timedelta(minutes=self.rng.randrange(60, 60 * 24 * 180)))
+                        for _ in range(self._around(messages_per_event))
+                    )
+                    notes.extend(
+                        Note(event_id=event.id, content=self.rng.choice(PHRASES),
+                             created_at=start - timedelta(days=self.rng.randrange(1, 200)))
+                        for _ in range(self._around(notes_per_event))
+                    )
+                with transaction.atomic():
+                    self._insert(Event, events)
+                    self._insert(Link, links)
+                    self._insert(Task, tasks)
+                    self._insert(Message, messages)
+                    self._insert(Note, notes)
+                self.log(f"  events {offset + size}/{total}")
+
+    def leads(self, total):
+        statuses = [value for value, _ in LEAD_STATUS_CHOICES]
+        with explicit_timestamps(_field(Lead, 'inquiry_date')):
+            for offset, size in self._batches(total):
+                batch = []
+                for number in range(offset, offset + size):
+                    first, last = self._name()
+                    batch.append(Lead(
+                        first_name=first, last_name=last, phone_number=self._phone(),
+                        email=f"{first}.{last}.lead{self.seed}-{number}@example.com".lower(),
+                        inquiry_date=self._day(), status=self.rng.choice(statuses),
+                    ))
+                with transaction.atomic():
+                    self._insert(Lead, batch)
+
+    def emails(self, total):
+        statuses = [value for value, _ in EMAIL_STATUS_CHOICES]
+        with explicit_timestamps(_field(Email, 'sent_at')):
+            for offset, size in self._batches(total):
+                batch = [
+                    Email(
+                        sender=f"planner{self.rng.randrange(10)}@example.com",
+                        recipient=f"guest{self.rng.randrange(100000)}@example.com",
+                        subject=self.rng.choice(EVENT_KINDS), content=self.rng.choice(PHRASES),
+                        sent_at=self._moment(self._day()), is_read=self.rng.random() < 0.8,
+                        status=self.rng.choice(statuses),
+                    )
+                    for _ in range(size)
+                ]
+                with transaction.atomic():
+                    self._insert(Email, batch)
+
+    def schedules(self, total):
+        for offset, size in self._batches(total):
+            batch = []
+            for _ in range(size):
+                hour = self.rng.randrange(8, 20)
+                batch.append(Calendar(
+                    day=self._day(), start_time=time(hour), end_time=time(hour + self.rng.choice((1, 2))),
+                    notes=self.rng.choice(TASK_DESCRIPTIONS),
+                ))
+            with transaction.atomic():
+                self._insert(Calendar, batch)
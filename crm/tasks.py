@@ -0,0 +1,81 @@
+"""
+Entry points for the django_q cluster (``python manage.py qcluster``). Keep these thin: the
+work lives in the crm modules so it can also be run inline from the shell or a command.
+"""
+from django.conf import settings
+from django.db import transaction
+from django_q.tasks import async_task
+
+from . import conversion, outbox, reminders
+
+LEAD_CONVERSION_GROUP = 'crm-lead-conversion'
+
+# Recurring tasks, installed (idempotently) by ``python manage.py install_schedules``
+SCHEDULES = [
+    {
+        'name': 'crm: dispatch lead conversions',
+        'func': 'crm.tasks.dispatch_lead_conversions',
+        'schedule_type': 'I',  # Schedule.MINUTES
+        'minutes': 5,
+    },
+    {
+        'name': 'crm: send queued emails',
+        'func': 'crm.tasks.send_queued_emails',
+        'schedule_type': 'I',
+        'minutes': 1,
+    },
+    {
+        # Hourly: a missed run is caught up soon, and a task reopened or back-dated today is reported within the hour
+        'name': 'crm: overdue task reminders',
+        'func': 'crm.tasks.send_task_reminders',
+        'schedule_type': 'I',
+        'minutes': 60,
+    },
+]
+
+
+def convert_leads(lead_ids=None, batch_size=conversion.DEFAULT_BATCH_SIZE):
+    """Convert one batch. A failure is recorded on its LeadConversionBatch and raised again so django_q logs it too."""
+    batch = conversion.convert_batch(lead_ids, batch_size)
+    if batch is None:
+        return {'converted': 0, 'clients': 0, 'events': 0}
+    return {'converted': batch.leads_converted, 'clients': batch.clients_created, 'events': batch.events_created}
+
+
+def queue_conversions(batches, batch_size=conversion.DEFAULT_BATCH_SIZE):
+    for lead_ids in batches:
+        async_task('crm.tasks.convert_leads', lead_ids, batch_size, group=LEAD_CONVERSION_GROUP)
+    return len(batches)
+
+
+def dispatch_lead_conversions(batch_size=conversion.DEFAULT_BATCH_SIZE):
+    """
+    Queue one task per batch of pending leads, but never more than the cluster takes in one round
+    (``workers * bulk``); whatever is left waits for the next scheduled run instead of flooding the queue.
+    """
+    return queue_conversions(conversion.pending_batches(batch_size, conversion.dispatch_limit()), batch_size)
+
+
+def send_queued_emails(batch_size=outbox.DEFAULT_BATCH_SIZE):
+    """Drain the outbox for at most half the cluster timeout, so the task is never killed mid-batch."""
+    budget = getattr(settings, 'Q_CLUSTER', {}).get('timeout', 60) / 2
+    batches = outbox.drain(batch_size, time_budget=budget)
+    return {'batches': len(batches), 'sent': sum(batch.sent for batch in batches)}
+
+
+def queue_emails(queryset):
+    """Queue emails for delivery and wake a worker once the transaction commits, instead of waiting for the schedule."""
+    queued = outbox.enqueue(queryset)
+    if queued:
+        transaction.on_commit(lambda: async_task('crm.tasks.send_queued_emails'))
+    return queued
+
+
+def send_task_reminders():
+    """Report newly overdue tasks and send the digest right away instead of waiting for the outbox schedule."""
+    reminder_run = reminders.run()
+    if reminder_run is None:
+        return {'overdue': 0}
+    if reminder_run.emails_queued:
+        async_task('crm.tasks.send_queued_emails')
+    return {'overdue': reminder_run.tasks_overdue, 'events': reminder_run.events, 'emails': reminder_run.emails_queued}
@@ -0,0 +1,1140 @@
+import base64
+import io
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import islice
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+
+from . import (
+    admin_calendar, conversion, counters, ics, importers, month_grid, outbox, reminders, rollups, search, versions,
+)
+from .conversion import pending_leads
+from .availability import MAX_MIN_HOURS, MAX_RANGE_DAYS, Interval, IntervalIndex, merge
+from .conflicts import Booking, find_conflicts
+from .dedupe import (
+    apply_suggestion, candidate_pairs, find_duplicates, load_profiles, merge_leads, normalize_email, normalize_phone,
+    soundex, suggest_merges,
+)
+from .loaders import EVENT_DETAIL_QUERIES, CLIENT_DETAIL_QUERIES, load_event_detail
+from .models import (
+    Client, Counter, Email, Event, Lead, LeadConversionBatch, LeadMergeSuggestion, Message, Note, RecurringEvent,
+    Rollup, Task, Vendor,
+)
+from .pagination import EVENT_LIST_ORDERING, KeysetPaginator
+from .recurrence import between, iter_dates
+from .timeline import SOURCES, client_timeline, decode_cursor, encode_cursor
+from .vendor_schedule import Assignment, audit, double_bookings
+
+
+def make_event(client, name, day):
+    start = datetime(day.year, day.month, day.day, 15, tzinfo=timezone.utc)
+    return Event.objects.create(
+        name=name, client=client, event_date=day, start=start, end=start + timedelta(hours=5),
+        venue=f"{name} Hall", status='planned',
+    )
+
+
+# The configured cache is shared with the running site; tests get a private one, emptied per test
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CrmTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class DetailQueryBudgetTests(CrmTestCase):
+    """Detail pages must render in the same number of queries however many related rows exist."""
+
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def populate(self, event, count):
+        Task.objects.bulk_create(
+            Task(event=event, description=f"Task {i}", due_date=date(2030, 1, 1)) for i in range(count)
+        )
+        Message.objects.bulk_create(
+            Message(event=event, sender=f"Sender {i}", content=f"Message {i}") for i in range(count)
+        )
+        vendors = Vendor.objects.bulk_create(Vendor(name=f"{event.name} vendor {i}") for i in range(count))
+        event.vendors.add(*vendors)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_event_detail_query_count_is_constant(self):
+        small = make_event(self.client_record, 'Small', date(2030, 6, 1))
+        large = make_event(self.client_record, 'Large', date(2030, 6, 2))
+        self.populate(small, 1)
+        self.populate(large, 25)
+
+        small_count, _ = self.count_queries(reverse('event_detail', args=[small.pk]))
+        large_count, response = self.count_queries(reverse('event_detail', args=[large.pk]))
+
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, EVENT_DETAIL_QUERIES)
+        self.assertContains(response, 'Task 24')
+        self.assertContains(response, 'Message 24')
+        self.assertContains(response, 'Large vendor 24')
+
+    def test_prefetched_rows_str_does_not_query(self):
+        event = make_event(self.client_record, 'Gala', date(2030, 6, 3))
+        self.populate(event, 5)
+
+        loaded = load_event_detail(event.pk)
+        with self.assertNumQueries(0):
+            [str(task) for task in loaded.tasks.all()]
+            [str(message) for message in loaded.messages.all()]
+
+    def test_client_detail_query_count_is_constant(self):
+        other = Client.objects.create(first_name='Grace', last_name='Hopper', email='grace@example.com')
+        make_event(self.client_record, 'Only', date(2030, 7, 1))
+        for i in range(20):
+            make_event(other, f"Event {i}", date(2030, 7, 1) + timedelta(days=i))
+
+        small_count, _ = self.count_queries(reverse('client_detail', args=[self.client_record.pk]))
+        large_count, response = self.count_queries(reverse('client_detail', args=[other.pk]))
+
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, CLIENT_DETAIL_QUERIES)
+        self.assertContains(response, 'Event 19')
+
+
+class LeadMergeTests(CrmTestCase):
+    def test_merging_a_converted_duplicate_keeps_its_client(self):
+        client = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        primary = Lead.objects.create(first_name='Ada', last_name='Lovelace', email='ada.l@example.com')
+        duplicate = Lead.objects.create(
+            first_name='Ada', last_name='Lovelace', email='ada@example.com', status='converted',
+            client=client, converted_at=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        )
+
+        merge_leads(primary, duplicate)
+
+        primary.refresh_from_db()
+        self.assertEqual(primary.client, client)
+        self.assertEqual(primary.status, 'converted')
+        self.assertEqual(primary.converted_at, datetime(2030, 1, 1, tzinfo=timezone.utc))
+        self.assertFalse(Lead.objects.filter(pk=duplicate.pk).exists())
+        self.assertFalse(pending_leads().filter(pk=primary.pk).exists())
+
+    def test_merging_keeps_the_primarys_own_client(self):
+        own = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        other = Client.objects.create(first_name='Ada', last_name='King', email='ada.king@example.com')
+        primary = Lead.objects.create(
+            first_name='Ada', last_name='Lovelace', email='ada.l@example.com', status='converted', client=own,
+        )
+        duplicate = Lead.objects.create(
+            first_name='Ada', last_name='King', email='ada.k@example.com', status='converted', client=other,
+        )
+
+        merge_leads(primary, duplicate)
+
+        primary.refresh_from_db()
+        self.assertEqual(primary.client, own)
+
+
+class TaskReminderTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        client = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.event = make_event(client, 'Gala', date(2030, 6, 1))
+        self.today = date(2030, 5, 1)
+
+    def test_back_dated_task_is_reported_once(self):
+        reminders.run(self.today)
+        task = Task.objects.create(event=self.event, description="Book band", due_date=date(2029, 1, 1))
+
+        self.assertEqual(reminders.run(self.today).tasks_overdue, 1)
+        self.assertIsNone(reminders.run(self.today))
+        task.refresh_from_db()
+        self.assertIsNotNone(task.reminded_at)
+
+    def test_reopened_task_is_reported_again(self):
+        task = Task.objects.create(event=self.event, description="Book band", due_date=date(2030, 4, 1))
+        reminders.run(self.today)
+        task.is_completed = True
+        task.save()
+        task.is_completed = False
+        task.save()
+
+        self.assertEqual(reminders.run(self.today).tasks_overdue, 1)
+
+    def test_overlapping_runs_do_not_claim_the_same_task(self):
+        Task.objects.create(event=self.event, description="Book band", due_date=date(2030, 4, 1))
+        stamp = datetime(2030, 5, 1, tzinfo=timezone.utc)
+        first = reminders.claim(date(2030, 4, 30), stamp)
+        second = reminders.claim(date(2030, 4, 30), stamp + timedelta(seconds=1))
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+
+
+class KeysetPaginationTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        client = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        # Several events per day, so pages break in the middle of a run of equal dates
+        for i in range(7):
+            make_event(client, f"Event {i}", date(2030, 6, 1 + i % 2))
+        self.expected = list(Event.objects.order_by(*EVENT_LIST_ORDERING))
+        self.paginator = KeysetPaginator(Event.objects.all(), EVENT_LIST_ORDERING, per_page=3)
+
+    def test_forward_pages_cover_every_row_once(self):
+        rows, page = [], self.paginator.get_page()
+        self.assertFalse(page.has_previous)
+        while True:
+            rows += page.object_list
+            if not page.has_next:
+                break
+            page = self.paginator.get_page(page.next_cursor)
+
+        self.assertEqual(rows, self.expected)
+
+    def test_previous_cursors_walk_back_to_the_first_page(self):
+        pages = [self.paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.paginator.get_page(page.previous_cursor)
+            self.assertEqual(page.object_list, expected.object_list)
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+
+    def test_tampered_cursor_starts_at_the_first_page(self):
+        first = self.paginator.get_page().object_list
+
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in ('not a cursor', encode({'v': ['2030-06-01']}), encode({'v': ['June', 'nope']}), encode([1])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.paginator.get_page(cursor).object_list, first)
+
+
+class ConflictSweepTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.day = date(2030, 6, 1)
+        self.stored = make_event(self.client_record, 'Gala', self.day)  # Gala Hall, 15:00-20:00
+
+    def booking(self, start_hour, end_hour, venue='Gala Hall', ref=None, day=None):
+        day = day or self.day
+        return Booking(
+            venue, day, datetime(day.year, day.month, day.day, start_hour, tzinfo=timezone.utc),
+            datetime(day.year, day.month, day.day, end_hour, tzinfo=timezone.utc), ref=ref,
+        )
+
+    def test_overlap_with_a_stored_event(self):
+        conflicts = find_conflicts([self.booking(19, 22, ref=1)])
+
+        self.assertEqual(len(conflicts), 1)
+        self.assertTrue(conflicts[0].existing)
+        self.assertEqual(conflicts[0].other.id, self.stored.pk)
+
+    def test_touching_other_venue_or_other_day_is_free(self):
+        proposals = [
+            self.booking(20, 23, ref=1),
+            self.booking(15, 20, venue='Other Hall', ref=2),
+            self.booking(15, 20, ref=3, day=self.day + timedelta(days=1)),
+        ]
+        self.assertEqual(find_conflicts(proposals), [])
+
+    def test_proposals_conflict_with_each_other_once(self):
+        conflicts = find_conflicts([self.booking(9, 12, ref=1), self.booking(11, 13, ref=2)])
+
+        self.assertEqual(len(conflicts), 1)
+        self.assertFalse(conflicts[0].existing)
+        self.assertEqual({conflicts[0].booking.ref, conflicts[0].other.ref}, {1, 2})
+
+    def test_long_booking_is_checked_against_every_slot_it_spans(self):
+        make_event(self.client_record, 'Gala', self.day - timedelta(days=1))  # Same venue, previous day
+        early = Event.objects.create(
+            name='Breakfast', client=self.client_record, event_date=self.day, venue='Gala Hall', status='planned',
+            start=datetime(2030, 6, 1, 8, tzinfo=timezone.utc), end=datetime(2030, 6, 1, 9, tzinfo=timezone.utc),
+        )
+        conflicts = find_conflicts([self.booking(7, 23, ref=1)])
+
+        self.assertEqual({conflict.other.id for conflict in conflicts}, {early.pk, self.stored.pk})
+
+    def test_rescheduled_event_does_not_conflict_with_itself(self):
+        self.stored.start += timedelta(hours=1)
+        self.stored.end += timedelta(hours=1)
+
+        self.assertEqual(find_conflicts([Booking.from_event(self.stored)]), [])
+
+    def test_stored_events_overlapping_each_other_are_not_reported(self):
+        Event.objects.create(
+            name='Overlap', client=self.client_record, event_date=self.day, venue='Gala Hall', status='planned',
+            start=datetime(2030, 6, 1, 16, tzinfo=timezone.utc), end=datetime(2030, 6, 1, 17, tzinfo=timezone.utc),
+        )
+        self.assertEqual(find_conflicts([self.booking(9, 10, ref=1)]), [])
+
+
+class RecurrenceTests(CrmTestCase):
+    def test_weekly_rule_with_weekdays_and_interval(self):
+        # 2030-01-01 is a Tuesday: Monday the 31st of the first week is before the series starts
+        dates = list(islice(iter_dates(date(2030, 1, 1), 'weekly', 2, weekdays=(0, 3)), 5))
+
+        self.assertEqual(dates, [date(2030, 1, 3), date(2030, 1, 14), date(2030, 1, 17), date(2030, 1, 28),
+                                 date(2030, 1, 31)])
+
+    def test_monthly_rule_skips_months_without_the_day(self):
+        dates = list(iter_dates(date(2030, 1, 31), 'monthly', count=4))
+
+        self.assertEqual(dates, [date(2030, 1, 31), date(2030, 3, 31), date(2030, 5, 31), date(2030, 7, 31)])
+
+    def test_count_is_counted_from_the_first_occurrence(self):
+        dates = list(iter_dates(date(2030, 1, 1), 'daily', count=5, after=date(2030, 1, 4)))
+
+        self.assertEqual(dates, [date(2030, 1, 4), date(2030, 1, 5)])
+
+    def test_until_is_inclusive(self):
+        dates = list(iter_dates(date(2030, 1, 1), 'weekly', until=date(2030, 1, 15)))
+
+        self.assertEqual(dates, [date(2030, 1, 1), date(2030, 1, 8), date(2030, 1, 15)])
+
+    def test_jumping_to_the_window_matches_walking_the_series(self):
+        for frequency, interval in (('daily', 3), ('weekly', 2), ('monthly', 5)):
+            with self.subTest(frequency=frequency):
+                after = date(2034, 3, 17)
+                walked = [day for day in islice(iter_dates(date(2030, 1, 31), frequency, interval), 2000)
+                          if day >= after][:10]
+                jumped = list(islice(iter_dates(date(2030, 1, 31), frequency, interval, after=after), 10))
+                self.assertEqual(jumped, walked)
+
+    def test_recurring_event_blocks_its_venue(self):
+        client = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        rule = RecurringEvent.objects.create(
+            name='Quiz night', client=client, venue='Gala Hall', starts_on=date(2030, 1, 2), frequency='weekly',
+            start_time=time(19), end_time=time(1), count=3,
+        )
+        self.assertEqual(list(between(rule, date(2030, 1, 5), date(2030, 2, 28))), [date(2030, 1, 9), date(2030, 1, 16)])
+
+        event = Event(
+            name='Late party', client=client, event_date=date(2030, 1, 16), venue='Gala Hall', status='planned',
+            start=datetime(2030, 1, 16, 23, tzinfo=timezone.utc), end=datetime(2030, 1, 17, 2, tzinfo=timezone.utc),
+        )
+        with self.assertRaises(ValidationError):
+            event.clean()
+        event.event_date = date(2030, 1, 23)
+        event.start += timedelta(weeks=1)
+        event.end += timedelta(weeks=1)
+        event.clean()  # The series is over after three occurrences
+
+    def test_invalid_rules_are_rejected(self):
+        client = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        for fields in ({'weekdays': 'MO,XX'}, {'until': date(2029, 12, 31)}):
+            with self.subTest(**fields):
+                rule = RecurringEvent(
+                    name='Quiz night', client=client, venue='Gala Hall', starts_on=date(2030, 1, 1),
+                    start_time=time(19), end_time=time(22), **fields,
+                )
+                with self.assertRaises(ValidationError):
+                    rule.clean()
+
+
+class ClientTimelineTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        other = Client.objects.create(first_name='Grace', last_name='Hopper', email='grace@example.com')
+        event = make_event(self.client_record, 'Gala', date(2030, 6, 1))  # Starts at 15:00
+        make_event(other, 'Other', date(2030, 6, 1))
+        midnight = datetime(2030, 6, 1, tzinfo=timezone.utc)
+
+        # Ties on purpose: task due dates sit at midnight next to messages sent at midnight,
+        # and a note shares the event's start time
+        Task.objects.bulk_create(
+            Task(event=event, description=f"Task {i}", due_date=date(2030, 6, 1 + i % 2)) for i in range(3)
+        )
+        for i in range(3):
+            Message.objects.create(event=event, sender=f"Sender {i}", content="Hello")
+        Message.objects.update(sent_at=midnight)
+        Note.objects.create(event=event, content="Bring cake")
+        Note.objects.update(created_at=event.start)
+        Email.objects.create(sender='planner@example.com', recipient='ada@example.com', subject='Quote', content='')
+        Email.objects.create(sender='ada@example.com', recipient='planner@example.com', subject='Thanks', content='')
+        Email.objects.create(sender='planner@example.com', recipient='grace@example.com', subject='Other', content='')
+        Email.objects.update(sent_at=midnight + timedelta(days=2))
+
+    def test_pages_merge_every_source_newest_first(self):
+        items, cursor = [], None
+        while True:
+            page = client_timeline(self.client_record, cursor, per_page=2)
+            items += page.object_list
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        positions = [item.position for item in items]
+        self.assertEqual(positions, sorted(positions, reverse=True))
+        self.assertEqual(len(set(positions)), len(positions))
+        self.assertEqual(
+            sorted(item.kind for item in items),
+            sorted(['email_received', 'email_sent', 'event', 'note'] + ['message'] * 3 + ['task'] * 3),
+        )
+        self.assertEqual(items, client_timeline(self.client_record, per_page=100).object_list)
+
+    def test_deep_page_costs_one_query_per_source(self):
+        page = client_timeline(self.client_record, per_page=6)
+        with self.assertNumQueries(len(SOURCES)):
+            client_timeline(self.client_record, page.next_cursor, per_page=2)
+
+    def test_tampered_cursor_starts_from_the_newest_activity(self):
+        newest = client_timeline(self.client_record, per_page=3).object_list
+        valid = encode_cursor(newest[0])
+        self.assertIsNotNone(decode_cursor(valid))
+
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in ('not a cursor', encode(['2030-06-01T00:00:00', 'task', '1']),
+                       encode(['2030-06-01T00:00:00+00:00', 'invoice', '1']), encode(['yesterday', 'task', '1']),
+                       encode(['2030-06-01T00:00:00+00:00', 'event', 'not a uuid'])):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                self.assertEqual(client_timeline(self.client_record, cursor, per_page=3).object_list, newest)
+
+
+class RollupTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def assertRollupsMatchTable(self):
+        stored = {
+            (series, period, start, status): count
+            for series, period, start, status, count in Rollup.objects.exclude(count=0).values_list(
+                'series', 'period', 'period_start', 'status', 'count')
+        }
+        actual = {}
+        for series in rollups.SERIES:
+            for period in rollups.PERIODS:
+                actual.update(rollups.compute(series, period))
+        self.assertEqual(stored, actual)
+
+    def test_event_moves_buckets_on_status_and_date_change(self):
+        event = make_event(self.client_record, 'Gala', date(2030, 6, 30))
+        make_event(self.client_record, 'Ball', date(2030, 6, 1))
+        self.assertRollupsMatchTable()
+
+        event.status = 'booked'
+        event.save()
+        self.assertRollupsMatchTable()
+
+        event.event_date = date(2030, 7, 1)  # Another day and another month
+        event.save()
+        self.assertRollupsMatchTable()
+        self.assertEqual(rollups.report(rollups.EVENTS, rollups.MONTH, date(2030, 7, 1), date(2030, 7, 31)),
+                         [{'period_start': date(2030, 7, 1), 'counts': {'booked': 1}, 'total': 1}])
+
+        event.delete()
+        self.assertRollupsMatchTable()
+
+    def test_bulk_status_update_moves_buckets(self):
+        for i in range(3):
+            Lead.objects.create(first_name='Lead', last_name=str(i), email=f"lead{i}@example.com")
+        Lead.objects.filter(last_name='0').update(status='contacted')
+        rollups.rebuild(rollups.LEADS)
+
+        self.assertEqual(rollups.update_status(Lead.objects.all(), 'converted'), 3)
+        self.assertRollupsMatchTable()
+
+    def test_rebuild_repairs_and_reports_drift(self):
+        make_event(self.client_record, 'Gala', date(2030, 6, 1))
+        Rollup.objects.filter(series=rollups.EVENTS, period=rollups.DAY).update(count=5)
+        Rollup.objects.create(series=rollups.EVENTS, period=rollups.MONTH, period_start=date(2031, 1, 1),
+                              status='planned', count=2)
+
+        self.assertEqual(rollups.rebuild(rollups.EVENTS), {rollups.EVENTS: (2, 2)})
+        self.assertRollupsMatchTable()
+        self.assertEqual(rollups.rebuild(rollups.EVENTS), {rollups.EVENTS: (2, 0)})
+
+
+class UnreachableBackend(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("SMTP server unreachable")
+
+
+class OutboxTests(CrmTestCase):
+    def queue(self, count, recipient='ada@example.com'):
+        Email.objects.bulk_create(
+            Email(sender='planner@example.com', recipient=recipient, subject=f"Quote {i}", content='')
+            for i in range(count)
+        )
+        return outbox.enqueue(Email.objects.all())
+
+    def go_stale(self):
+        Email.objects.update(claimed_at=F('claimed_at') - outbox.CLAIM_TIMEOUT - timedelta(seconds=1))
+
+    def test_claim_is_exclusive_until_it_goes_stale(self):
+        self.queue(3)
+        first = outbox.claim()
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(outbox.claim(), [])
+
+        self.go_stale()
+        reclaimed = outbox.claim()
+        self.assertEqual(len(reclaimed), 3)
+        self.assertEqual({email.attempts for email in reclaimed}, {1})  # The lost claim counts as an attempt
+        self.assertEqual({email.last_error for email in reclaimed}, {outbox.ABANDONED_ERROR})
+
+    def test_email_that_keeps_killing_its_worker_fails(self):
+        self.queue(1)
+        for _ in range(outbox.MAX_ATTEMPTS):
+            self.assertEqual(len(outbox.claim()), 1)
+            self.go_stale()  # The worker died mid-send
+
+        self.assertEqual(outbox.claim(), [])
+        email = Email.objects.get()
+        self.assertEqual((email.status, email.attempts), ('failed', outbox.MAX_ATTEMPTS))
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.queue(3)
+        batch = outbox.send_batch()
+
+        self.assertEqual((batch.claimed, batch.sent, batch.retried, batch.failed), (3, 3, 0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(Email.objects.exclude(status='sent').exists())
+        self.assertIsNone(outbox.send_batch())
+
+    def test_unreachable_server_requeues_the_batch_with_backoff(self):
+        self.queue(2)
+        batch = outbox.send_batch(connection=UnreachableBackend())
+
+        self.assertEqual((batch.sent, batch.retried, batch.failed), (0, 2, 0))
+        self.assertIn('ConnectionRefusedError', batch.error)
+        for email in Email.objects.all():
+            self.assertEqual((email.status, email.attempts, email.claim), ('queued', 1, ''))
+            self.assertEqual(email.next_attempt_at, batch.finished_at + outbox.retry_delay(1))
+        self.assertIsNone(outbox.send_batch())  # Not due again until the delay has passed
+
+    def test_undeliverable_email_fails_without_holding_up_the_rest(self):
+        self.queue(2)
+        self.queue(1, recipient='')
+
+        batch = outbox.send_batch()
+
+        self.assertEqual((batch.sent, batch.retried, batch.failed), (2, 0, 1))
+        failed = Email.objects.get(status='failed')
+        self.assertIn('no recipient', failed.last_error)
+        self.assertIsNone(failed.next_attempt_at)
+
+    def test_gives_up_after_the_last_attempt(self):
+        self.queue(1)
+        Email.objects.update(attempts=outbox.MAX_ATTEMPTS - 1)
+
+        batch = outbox.send_batch(connection=UnreachableBackend())
+
+        self.assertEqual((batch.retried, batch.failed), (0, 1))
+        self.assertEqual(Email.objects.get().status, 'failed')
+
+
+class LeadDedupeTests(CrmTestCase):
+    def lead(self, first_name, last_name, email, phone_number=None):
+        return Lead.objects.create(first_name=first_name, last_name=last_name, email=email, phone_number=phone_number)
+
+    def test_normalization(self):
+        self.assertEqual(normalize_email(' Ada.Lovelace+crm@GMail.com '), 'adalovelace@gmail.com')
+        self.assertEqual(normalize_email('ada.lovelace+crm@example.com'), 'ada.lovelace+crm@example.com')
+        self.assertEqual(normalize_phone('+1 (555) 010-1234'), '5550101234')
+        self.assertEqual(normalize_phone('12-34'), '')
+        self.assertEqual(soundex('Robert'), 'R163')
+        self.assertEqual(soundex('Rupert'), 'R163')
+
+    def test_finds_duplicates_within_blocks_only(self):
+        ada = self.lead('Ada', 'Lovelace', 'ada.lovelace@gmail.com')
+        ada_tagged = self.lead('Ada', 'Lovelace', 'adalovelace+events@gmail.com')
+        grace = self.lead('Grace', 'Hopper', 'grace@example.com', '555-010-1234')
+        grace_phone = self.lead('Grace', 'Hopper', 'g.hopper@example.org', '+1 555 010 1234')
+        self.lead('Alan', 'Turing', 'alan@example.com')
+
+        self.assertEqual(candidate_pairs(load_profiles()), ({(ada.pk, ada_tagged.pk), (grace.pk, grace_phone.pk)}, 0))
+        matches, skipped = find_duplicates()
+        self.assertEqual(skipped, 0)
+        found = {(older, newer): reasons for older, newer, _, reasons in matches}
+        self.assertEqual(set(found), {(ada.pk, ada_tagged.pk), (grace.pk, grace_phone.pk)})
+        self.assertIn('email', found[ada.pk, ada_tagged.pk])
+        self.assertIn('phone', found[grace.pk, grace_phone.pk])
+
+    def test_oversized_blocks_are_skipped_and_counted(self):
+        for i in range(3):
+            self.lead('John', 'Smith', f"john{i}@example{i}.com")
+
+        pairs, skipped = candidate_pairs(load_profiles())
+        self.assertEqual((len(pairs), skipped), (3, 0))
+        self.assertEqual(candidate_pairs(load_profiles(), max_block_size=2), (set(), 1))
+        self.assertEqual(suggest_merges(max_block_size=2), (0, 1))
+
+    def test_oversized_blocks_are_split_by_first_name_then_phone(self):
+        johns = [self.lead('John', 'Smith', f"john{i}@example{i}.com", f"555-010-{i}{i}00") for i in range(2)]
+        janes = [self.lead('Jane', 'Smith', f"jane{i}@example{i}.com", '555-010-1234') for i in range(3)]
+        jane_elsewhere = self.lead('Jane', 'Smith', 'jane@example.org', '555-020-9876')
+
+        pairs, skipped = candidate_pairs(load_profiles(), max_block_size=2)
+        self.assertEqual(skipped, 2)  # The three Janes sharing a phone number stay too many in the phone and name blocks
+        self.assertIn((johns[0].pk, johns[1].pk), pairs)
+        self.assertFalse(any(jane_elsewhere.pk in pair for pair in pairs))
+
+        pairs, skipped = candidate_pairs(load_profiles(), max_block_size=3)
+        self.assertEqual(skipped, 0)
+        self.assertTrue({(janes[0].pk, janes[1].pk), (janes[1].pk, janes[2].pk)} <= pairs)
+
+    def test_suggestions_are_stored_once_and_applied(self):
+        ada = self.lead('Ada', 'Lovelace', 'ada.lovelace@gmail.com', '555-010-1234')
+        duplicate = self.lead('Ada', 'Lovelace', 'adalovelace+events@gmail.com')
+        duplicate.status = 'contacted'
+        duplicate.save()
+
+        suggest_merges()
+        suggest_merges()
+        suggestion = LeadMergeSuggestion.objects.get()
+        self.assertEqual((suggestion.lead, suggestion.duplicate), (ada, duplicate))
+
+        self.assertTrue(apply_suggestion(suggestion))
+        suggestion.refresh_from_db()
+        ada.refresh_from_db()
+        self.assertEqual(suggestion.status, 'merged')
+        self.assertEqual(suggestion.duplicate_label, 'Ada Lovelace <adalovelace+events@gmail.com>')
+        self.assertEqual(ada.status, 'contacted')
+        self.assertFalse(Lead.objects.filter(pk=duplicate.pk).exists())
+        self.assertFalse(apply_suggestion(suggestion))
+
+
+class MonthGridCacheTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        make_event(self.client_record, 'Gala', date(2030, 6, 10))
+
+    def names(self, grid):
+        return sorted(event['name'] for events in grid['events_by_date'].values() for event in events)
+
+    def test_grid_is_cached_until_a_write_commits(self):
+        self.assertEqual(self.names(month_grid.month_grid(2030, 6)), ['Gala'])
+        with self.assertNumQueries(0):
+            month_grid.month_grid(2030, 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_event(self.client_record, 'Ball', date(2030, 6, 11))
+        self.assertEqual(self.names(month_grid.month_grid(2030, 6)), ['Ball', 'Gala'])
+
+    def test_grid_built_before_a_concurrent_commit_is_not_cached(self):
+        build = month_grid.build_month_grid
+
+        def build_then_commit_elsewhere(year, month):
+            grid = build(year, month)  # Rows read before the other transaction commits
+            with self.captureOnCommitCallbacks(execute=True):
+                make_event(self.client_record, 'Ball', date(2030, 6, 11))
+            return grid
+
+        with mock.patch.object(month_grid, 'build_month_grid', side_effect=build_then_commit_elsewhere):
+            self.assertEqual(self.names(month_grid.month_grid(2030, 6)), ['Gala'])
+
+        self.assertEqual(self.names(month_grid.month_grid(2030, 6)), ['Ball', 'Gala'])
+
+
+class AdminCalendarCacheTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        make_event(self.client_record, 'Gala', date(2030, 6, 10))
+
+    def test_month_is_cached_until_a_write_commits(self):
+        self.assertIn('Gala', admin_calendar.render_month(2030, 6))
+        with self.assertNumQueries(0):
+            admin_calendar.render_month(2030, 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_event(self.client_record, 'Ball', date(2030, 6, 11))
+        self.assertIn('Ball', admin_calendar.render_month(2030, 6))
+
+    def test_month_rendered_before_a_concurrent_commit_is_not_cached(self):
+        load = admin_calendar.load_entries
+
+        def load_then_commit_elsewhere(year, month):
+            entries = load(year, month)  # Rows read before the other transaction commits
+            with self.captureOnCommitCallbacks(execute=True):
+                make_event(self.client_record, 'Ball', date(2030, 6, 11))
+            return entries
+
+        with mock.patch.object(admin_calendar, 'load_entries', side_effect=load_then_commit_elsewhere):
+            self.assertNotIn('Ball', admin_calendar.render_month(2030, 6))
+
+        self.assertIn('Ball', admin_calendar.render_month(2030, 6))
+
+
+class LeadConversionTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        existing = Client.objects.create(first_name='Ada', last_name='Lovelace', email='lead0@example.com')
+        make_event(existing, 'Gala', date(2030, 6, 1))
+        for i in range(3):
+            Lead.objects.create(first_name='Lead', last_name=str(i), email=f"lead{i}@example.com", status='converted')
+
+    def test_batch_converts_pending_leads_once(self):
+        batch = conversion.convert_batch()
+
+        self.assertEqual((batch.leads_converted, batch.clients_created, batch.clients_linked), (3, 2, 1))
+        self.assertEqual(batch.events_created, 2)  # The client already on file keeps its own events
+        self.assertFalse(pending_leads().exists())
+        self.assertIsNone(conversion.convert_batch())
+        self.assertEqual(LeadConversionBatch.objects.count(), 1)
+
+    def test_leads_claimed_by_another_run_are_not_converted_twice(self):
+        claimed = conversion.claim(None, 2, django_timezone.now())  # Another worker is converting these
+
+        batch = conversion.convert_batch()
+
+        self.assertEqual(batch.leads_converted, 1)
+        self.assertFalse(Lead.objects.filter(pk__in=claimed, client__isnull=False).exists())
+        self.assertIsNone(conversion.convert_batch())
+        self.assertEqual(LeadConversionBatch.objects.count(), 1)
+
+    def test_stale_claims_are_taken_over(self):
+        conversion.claim(None, 3, django_timezone.now() - conversion.CLAIM_TIMEOUT - timedelta(seconds=1))
+
+        self.assertEqual(conversion.convert_batch().leads_converted, 3)
+
+    def test_failed_batch_releases_its_leads(self):
+        with mock.patch.object(conversion, 'first_event', side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                conversion.convert_batch()
+
+        failed = LeadConversionBatch.objects.get()
+        self.assertEqual((failed.leads_failed, failed.error), (3, "RuntimeError: boom"))
+        self.assertFalse(Client.objects.exclude(email='lead0@example.com').exists())
+        self.assertEqual(conversion.convert_batch().leads_converted, 3)
+
+
+class CounterTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def counts(self):
+        return counters.get_counts()
+
+    def test_creates_and_deletes_move_the_counts(self):
+        before = self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            lead = Lead.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+            event = make_event(self.client_record, 'Gala', date(2030, 6, 1))
+
+        after = self.counts()
+        self.assertEqual(after[counters.LEADS_COUNT], before[counters.LEADS_COUNT] + 1)
+        self.assertEqual(after[counters.EVENTS_COUNT], before[counters.EVENTS_COUNT] + 1)
+        with self.assertNumQueries(0):
+            self.counts()  # The committed values were stored in the cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lead.delete()
+            event.delete()
+        self.assertEqual(self.counts(), before)
+
+    def test_unread_email_count_follows_is_read(self):
+        before = self.counts()[counters.EMAIL_COUNT]
+        with self.captureOnCommitCallbacks(execute=True):
+            email = Email.objects.create(sender='planner@example.com', subject='Quote', content='')
+        self.assertEqual(self.counts()[counters.EMAIL_COUNT], before + 1)
+
+        for is_read, expected in ((True, before), (True, before), (False, before + 1)):
+            with self.captureOnCommitCallbacks(execute=True):
+                email.is_read = is_read
+                email.save()
+            self.assertEqual(self.counts()[counters.EMAIL_COUNT], expected)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            email.delete()
+        self.assertEqual(self.counts()[counters.EMAIL_COUNT], before)
+
+    def test_bulk_writers_patch_the_counts_by_hand(self):
+        self.counts()  # Warm the cache
+        with self.captureOnCommitCallbacks(execute=True):
+            start = datetime(2030, 6, 1, 15, tzinfo=timezone.utc)
+            Event.objects.bulk_create(
+                Event(name=f"Event {i}", client=self.client_record, event_date=start.date(), start=start,
+                      end=start + timedelta(hours=2), venue=f"Hall {i}")
+                for i in range(3)
+            )
+            counters.increment(counters.EVENTS_COUNT, 3)
+
+        self.assertEqual(self.counts()[counters.EVENTS_COUNT], Event.objects.count())
+
+    def test_dashboard_shows_the_counts(self):
+        self.client.force_login(get_user_model().objects.create_user('planner'))
+        with self.captureOnCommitCallbacks(execute=True):
+            make_event(self.client_record, 'Gala', date(2030, 6, 1))
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['events_count'], 1)
+
+    def test_reconcile_repairs_drift(self):
+        make_event(self.client_record, 'Gala', date(2030, 6, 1))
+        self.counts()
+        Counter.objects.filter(name=counters.EVENTS_COUNT).update(value=99)  # e.g. a bulk write that forgot
+
+        self.assertEqual(counters.reconcile(), {counters.EVENTS_COUNT: (99, 1)})
+        self.assertEqual(self.counts()[counters.EVENTS_COUNT], 1)
+        self.assertEqual(counters.reconcile(), {})
+
+
+def listing(request):
+    return HttpResponse("ok")
+
+
+class ConditionalGetTests(CrmTestCase):
+    shared_view = staticmethod(versions.conditional(versions.EVENTS, versions.CLIENTS)(listing))
+    user_view = staticmethod(versions.conditional(versions.EVENTS, per_user=True)(listing))
+    extra_view = staticmethod(versions.conditional(versions.EVENTS, extra=lambda request: 'today')(listing))
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.user = get_user_model().objects.create_user('planner')
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def get(self, view, user=None, **headers):
+        request = self.factory.get('/listing/', headers=headers)
+        request.user = user or self.user
+        return view(request)
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get(self.shared_view)['ETag']
+
+        self.assertEqual(self.get(self.shared_view, if_none_match=etag).status_code, 304)
+        self.assertEqual(self.get(self.shared_view, if_none_match='"stale"').status_code, 200)
+
+    def test_write_to_each_collection_changes_the_etag(self):
+        writes = (
+            lambda: make_event(self.client_record, 'Gala', date(2030, 6, 1)),
+            lambda: Client.objects.create(first_name='Grace', last_name='Hopper', email='grace@example.com'),
+        )
+        for write in writes:
+            etag = self.get(self.shared_view)['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            response = self.get(self.shared_view, if_none_match=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_per_user_etag_follows_accept_and_user(self):
+        other = get_user_model().objects.create_user('assistant')
+        etag = self.get(self.user_view, accept='text/html')['ETag']
+
+        self.assertEqual(self.get(self.user_view, accept='text/html')['ETag'], etag)
+        self.assertNotEqual(self.get(self.user_view, accept='application/json')['ETag'], etag)
+        self.assertNotEqual(self.get(self.user_view, user=other, accept='text/html')['ETag'], etag)
+        self.assertEqual(self.get(self.user_view, user=other, accept='text/html', if_none_match=etag).status_code, 200)
+
+    def test_last_modified_only_without_per_user_or_extra(self):
+        self.assertTrue(self.get(self.shared_view).has_header('Last-Modified'))
+        self.assertFalse(self.get(self.user_view).has_header('Last-Modified'))
+        self.assertFalse(self.get(self.extra_view).has_header('Last-Modified'))
+
+        response = self.client.get(reverse('event-list-json'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.client.get(reverse('event-list-json'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class IcsFeedTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.event = make_event(self.client_record, 'Gala', date(2030, 6, 1))
+        self.vendor = Vendor.objects.create(name='Florist')
+        self.client_url = ics.feed_url(ics.CLIENT, self.client_record.pk)
+        self.vendor_url = ics.feed_url(ics.VENDOR, self.vendor.pk)
+
+    def fetch(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode()
+
+    def test_matching_etag_is_not_modified(self):
+        response, body = self.fetch(self.client_url)
+        self.assertIn('SUMMARY:Gala', body)
+
+        self.assertEqual(self.fetch(self.client_url, if_none_match=response['ETag'])[0].status_code, 304)
+        cached, cached_body = self.fetch(self.client_url)
+        self.assertFalse(cached.streaming)
+        self.assertEqual(cached_body, body)
+
+    def test_etag_changes_once_an_event_edit_commits(self):
+        etag = self.fetch(self.client_url)[0]['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.name = 'Masked ball'
+            self.event.save()
+            self.assertEqual(self.fetch(self.client_url, if_none_match=etag)[0].status_code, 304)
+
+        response, body = self.fetch(self.client_url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:Masked ball', body)
+
+    def test_etag_changes_after_vendor_edits(self):
+        edits = (
+            lambda: self.event.vendors.add(self.vendor),
+            lambda: self.vendor.save(),
+            lambda: self.event.vendors.remove(self.vendor),
+        )
+        for edit in edits:
+            etag = self.fetch(self.vendor_url)[0]['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                edit()
+            self.assertNotEqual(self.fetch(self.vendor_url)[0]['ETag'], etag)
+
+    def test_body_streamed_while_the_generation_moved_is_not_cached(self):
+        response = self.client.get(self.client_url)
+        stale = ics.generation(ics.CLIENT, self.client_record.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.name = 'Masked ball'
+            self.event.save()
+        b''.join(response.streaming_content)  # Finished after the write committed
+
+        self.assertIsNone(cache.get(ics._cache_key(ics.CLIENT, self.client_record.pk, stale)))
+        fresh, body = self.fetch(self.client_url)
+        self.assertTrue(fresh.streaming)
+        self.assertIn('SUMMARY:Masked ball', body)
+
+
+class ImporterTests(CrmTestCase):
+    def rows(self, *emails):
+        return [{'first_name': 'Ada', 'last_name': 'Lovelace', 'email': email} for email in emails]
+
+    def test_duplicates_in_the_file_and_the_database_are_row_errors(self):
+        Client.objects.create(first_name='Ada', last_name='Lovelace', email='taken@example.com')
+        rows = self.rows('a@example.com', 'taken@example.com', 'a@example.com', 'b@example.com', 'c@example.com')
+
+        with CaptureQueriesContext(connection) as queries:
+            report = importers.import_rows('clients', rows, chunk_size=2, dry_run=True)
+
+        self.assertEqual((report.rows, report.created), (5, 3))
+        self.assertEqual([(error.row, error.field) for error in report.errors], [(2, 'email'), (3, 'email')])
+        self.assertEqual(len(queries), 3)  # One email IN (...) query per chunk
+        self.assertFalse(Client.objects.filter(email='a@example.com').exists())
+
+        report = importers.import_rows('clients', rows, chunk_size=2)
+        self.assertEqual(report.created, 3)
+        self.assertEqual(Client.objects.count(), 4)
+
+    def test_rows_claimed_concurrently_fall_back_to_row_by_row_inserts(self):
+        write = importers._write
+
+        def write_after_a_concurrent_import(model, valid, report):
+            Client.objects.create(first_name='Ada', last_name='Lovelace', email='b@example.com')
+            return write(model, valid, report)
+
+        with mock.patch.object(importers, '_write', side_effect=write_after_a_concurrent_import):
+            report = importers.import_rows('clients', self.rows('a@example.com', 'b@example.com', 'c@example.com'))
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual([(error.row, error.field) for error in report.errors], [(2, 'email')])
+        self.assertEqual(Client.objects.filter(email__in=['a@example.com', 'c@example.com']).count(), 2)
+
+    def test_leads_keep_the_counter_in_step(self):
+        before = counters.get_counts()[counters.LEADS_COUNT]
+        with self.captureOnCommitCallbacks(execute=True):
+            importers.import_rows('leads', self.rows('a@example.com', 'b@example.com'))
+
+        self.assertEqual(counters.get_counts()[counters.LEADS_COUNT], before + 2)
+
+    def test_unparseable_csv_record_is_a_row_error(self):
+        data = (
+            "first_name,last_name,email\n"
+            "Ada,Lovelace,a@example.com\n"
+            f"Grace,{'x' * 140_000},g@example.com\n"  # Over the csv module's field size limit
+            "Alan,Turing,t@example.com\n"
+        )
+        report = importers.import_rows('clients', importers.read_rows(io.StringIO(data), importers.CSV))
+
+        self.assertEqual((report.rows, report.created), (3, 2))
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(report.errors[0].row, 2)
+        self.assertIn('Line 3', report.errors[0].message)
+
+    def test_unparseable_ndjson_line_is_a_row_error(self):
+        data = '{"first_name": "Ada", "last_name": "Lovelace", "email": "a@example.com"}\n{"first_name": \n\n[1, 2]\n'
+        report = importers.import_rows('clients', importers.read_rows(io.StringIO(data), importers.NDJSON))
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual([error.row for error in report.errors], [2, 3])
+        self.assertIn('Line 2: invalid JSON', report.errors[0].message)
+
+
+class VendorDoubleBookingTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.florist = Vendor.objects.create(name='Florist')
+        self.band = Vendor.objects.create(name='Band')
+        self.gala = make_event(self.client_record, 'Gala', date(2030, 6, 1))  # 15:00-20:00
+        self.ball = make_event(self.client_record, 'Ball', date(2030, 6, 2))
+        self.gala.vendors.add(self.florist, self.band)
+        self.ball.vendors.add(self.florist)
+
+    def test_new_event_skips_the_vendor_check(self):
+        event = Event(
+            name='Party', client=self.client_record, event_date=date(2030, 6, 1), venue='Party Hall',
+            status='planned', start=self.gala.start, end=self.gala.end,
+        )
+        with CaptureQueriesContext(connection) as queries:
+            event.clean()
+
+        self.assertFalse(any(Assignment._meta.db_table in query['sql'] for query in queries))
+
+    def test_rescheduling_onto_a_vendors_other_booking_is_rejected(self):
+        self.ball.event_date = self.gala.event_date
+        self.ball.start, self.ball.end = self.gala.start + timedelta(hours=4), self.gala.end + timedelta(hours=4)
+
+        with self.assertRaisesMessage(ValidationError, "Florist is already booked for 'Gala'"):
+            self.ball.clean()
+
+        self.ball.start, self.ball.end = self.gala.end, self.gala.end + timedelta(hours=2)  # Back to back is fine
+        self.ball.clean()
+
+    def test_double_bookings_checks_only_the_given_vendors(self):
+        party = make_event(self.client_record, 'Party', date(2030, 6, 1))
+
+        self.assertEqual([clash.vendor for clash in double_bookings(party, [self.band.pk, self.florist.pk])],
+                         ['Band', 'Florist'])
+        self.assertEqual(double_bookings(party, Vendor.objects.filter(pk=self.band.pk))[0].other.name, 'Gala')
+
+    def test_audit_reports_overlaps_per_vendor(self):
+        party = make_event(self.client_record, 'Party', date(2030, 6, 1))
+        party.vendors.add(self.band)
+        canceled = make_event(self.client_record, 'Dinner', date(2030, 6, 1))
+        canceled.status = 'canceled'
+        canceled.save()
+        canceled.vendors.add(self.florist)
+
+        found = [(clash.vendor, {clash.event.name, clash.other.name}) for clash in audit()]
+        self.assertEqual(found, [('Band', {'Gala', 'Party'})])
+
+
+def at(hour, minute=0):
+    return datetime(2030, 6, 1, hour, minute, tzinfo=timezone.utc)
+
+
+class AvailabilityTests(CrmTestCase):
+    def test_merge_folds_overlapping_and_touching_intervals(self):
+        intervals = [
+            Interval(at(13), at(14)), Interval(at(9), at(11)), Interval(at(10), at(12)),
+            Interval(at(12), at(12, 30)), Interval(at(9, 30), at(10)), Interval(at(16), at(17)),
+        ]
+        self.assertEqual(
+            merge(intervals), [Interval(at(9), at(12, 30)), Interval(at(13), at(14)), Interval(at(16), at(17))],
+        )
+
+    def test_free_slots_skip_gaps_shorter_than_the_minimum(self):
+        index = IntervalIndex([Interval(at(9), at(12)), Interval(at(12, 30), at(14)), Interval(at(18), at(23))])
+
+        self.assertEqual(index.free_slots(at(8), at(20)),
+                         [Interval(at(8), at(9)), Interval(at(12), at(12, 30)), Interval(at(14), at(18))])
+        self.assertEqual(index.free_slots(at(8), at(20), min_duration=timedelta(hours=1)),
+                         [Interval(at(8), at(9)), Interval(at(14), at(18))])
+        self.assertEqual(index.free_slots(at(10), at(11)), [])
+
+    def test_view_returns_free_slots_around_events(self):
+        client = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        make_event(client, 'Gala', date(2030, 6, 1))  # 15:00-20:00
+
+        response = self.client.get(reverse('api_availability'), {
+            'start': '2030-06-01', 'min_hours': 2, 'open': '08:00', 'close': '22:00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['days'], [{'date': '2030-06-01', 'free': [
+            {'start': at(8).isoformat(), 'end': at(15).isoformat()},
+            {'start': at(20).isoformat(), 'end': at(22).isoformat()},
+        ]}])
+
+    def test_bad_parameters_are_rejected(self):
+        last_allowed = date(2030, 1, 1) + timedelta(days=MAX_RANGE_DAYS - 1)
+        for params in (
+            {}, {'start': 'June'}, {'start': '2030-01-01', 'open': '25:00'},
+            *({'start': '2030-01-01', 'min_hours': value} for value in ('nan', 'inf', '-inf', '-1', '25', '1e10', 'two')),
+            {'start': '2030-01-02', 'end': '2030-01-01'},
+            {'start': '2030-01-01', 'end': str(last_allowed + timedelta(days=1))},
+        ):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get(reverse('api_availability'), params).status_code, 400)
+
+        for params in ({'start': '2030-01-01', 'min_hours': MAX_MIN_HOURS},
+                       {'start': '2030-01-01', 'end': str(last_allowed)}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get(reverse('api_availability'), params).status_code, 200)
+
+
+class SearchIndexTests(CrmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user('planner'))
+        self.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+
+    def hits(self, query, **kwargs):
+        return {(result.kind, result.object_id) for result in search.search(query, **kwargs)}
+
+    def test_every_indexed_model_is_searchable_once_saved(self):
+        lead = Lead.objects.create(first_name='Grace', last_name='Hopper', email='grace@example.com')
+        event = make_event(self.client_record, 'Zeppelin gala', date(2030, 6, 1))
+        note = Note.objects.create(event=event, content="Order the zeppelin balloons")
+        message = Message.objects.create(event=event, sender='Florist', content="Zeppelin garlands confirmed")
+
+        self.assertEqual(self.hits('lovelace'), {('client', str(self.client_record.pk))})
+        self.assertEqual(self.hits('hopper'), {('lead', str(lead.pk))})
+        self.assertEqual(self.hits('zeppelin'), {
+            ('event', str(event.pk)), ('note', str(note.pk)), ('message', str(message.pk)),
+        })
+        self.assertEqual(self.hits('zepp', kind='note'), {('note', str(note.pk))})
+
+    def test_edits_and_deletes_keep_the_index_in_sync(self):
+        self.client_record.last_name = 'King'
+        self.client_record.save()
+        self.assertEqual(self.hits('lovelace'), set())
+        self.assertEqual(self.hits('king'), {('client', str(self.client_record.pk))})
+
+        event = make_event(self.client_record, 'Zeppelin gala', date(2030, 6, 1))
+        Note.objects.create(event=event, content="Zeppelin balloons")
+        Message.objects.create(event=event, sender='Florist', content="Zeppelin garlands")
+        event.delete()  # Notes and messages go with it
+        self.assertEqual(self.hits('zeppelin'), set())
+
+        self.client_record.delete()
+        self.assertEqual(self.hits('king'), set())
+
+    def test_limit_is_clamped(self):
+        for i in range(3):
+            Lead.objects.create(first_name='Grace', last_name='Hopper', email=f"grace{i}@example.com")
+
+        def count(limit):
+            response = self.client.get(reverse('api_search'), {'q': 'hopper', 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            return len(response.json()['results'])
+
+        self.assertEqual([count(limit) for limit in (-1, 0, 2, 1000)], [1, 1, 2, 3])
+        with mock.patch.object(search, 'MAX_LIMIT', 2):
+            self.assertEqual(count(1000), 2)
+        self.assertEqual(self.client.get(reverse('api_search'), {'q': 'hopper', 'limit': 'all'}).status_code, 400)
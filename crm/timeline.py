@@ -0,0 +1,163 @@
+"""
+A client's activity (events, tasks, notes, messages, emails) as one stream, newest first. Each
+kind of activity is read with its own indexed query of at most one page, and the per-kind pages
+are combined with a k-way merge (``heapq.merge``). The cursor is the position of the last item
+shown, so page 1000 costs the same handful of LIMITed queries as page 1.
+"""
+import base64
+import binascii
+import heapq
+import json
+from datetime import datetime, time
+from itertools import islice
+from typing import Any, Callable, NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Email, Event, Message, Note, Task
+from .pagination import DEFAULT_PER_PAGE, KeysetPage
+
+MAX_PER_PAGE = 200
+
+
+class Activity(NamedTuple):
+    at: datetime      # Aware; date-only activity (task due dates) sits at midnight
+    kind: str
+    pk: Any
+    title: str
+    summary: str = ''
+    event_id: Any = None
+    event_name: str = ''
+
+    @property
+    def position(self):
+        return self.at, self.kind, self.pk
+
+
+class Source(NamedTuple):
+    """One kind of activity: which rows belong to a client, the column they are ordered by, how to show one."""
+    kind: str
+    model: Any
+    time_field: str
+    client_filter: Callable  # client -> Q
+    fields: tuple
+    describe: Callable       # row dict -> (title, summary)
+
+    @property
+    def is_date(self):
+        return self.model._meta.get_field(self.time_field).get_internal_type() == 'DateField'
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def _through_event(client):
+    return Q(event__client_id=client.pk)
+
+
+SOURCES = (
+    Source(
+        'event', Event, 'start', lambda client: Q(client_id=client.pk),
+        ('id', 'start', 'name', 'venue', 'status'),
+        lambda row: (row['name'], f"{row['venue']} ({row['status']})"),
+    ),
+    Source(
+        'task', Task, 'due_date', _through_event,
+        ('id', 'due_date', 'description', 'is_completed', 'event_id', 'event__name'),
+        lambda row: (f"Task due: {row['description']}", "Completed" if row['is_completed'] else "Open"),
+    ),
+    Source(
+        'note', Note, 'created_at', _through_event,
+        ('id', 'created_at', 'content', 'event_id', 'event__name'),
+        lambda row: ("Note", row['content']),
+    ),
+    Source(
+        'message', Message, 'sent_at', _through_event,
+        ('id', 'sent_at', 'sender', 'content', 'event_id', 'event__name'),
+        lambda row: (f"Message from {row['sender']}", row['content']),
+    ),
+    # Emails are matched by address; sent and received are two sources so each uses its own index
+    Source(
+        'email_received', Email, 'sent_at', lambda client: Q(recipient=client.email),
+        ('id', 'sent_at', 'subject', 'sender', 'status'),
+        lambda row: (f"Email from {row['sender']}: {row['subject']}", row['status']),
+    ),
+    Source(
+        'email_sent', Email, 'sent_at', lambda client: Q(sender=client.email),
+        ('id', 'sent_at', 'subject', 'status'),
+        lambda row: (f"Email sent: {row['subject']}", row['status']),
+    ),
+)
+SOURCES_BY_KIND = {source.kind: source for source in SOURCES}
+
+
+def _seek(source, position):
+    """Rows of ``source`` strictly older than ``position`` in (time, kind, pk) order."""
+    at, kind, pk = position
+    value = at
+    if source.is_date:
+        value = timezone.localtime(at).date()
+        if at != _start_of(value):
+            return Q(**{f'{source.time_field}__lte': value})  # The whole day lies before ``at``
+    older = Q(**{f'{source.time_field}__lt': value})
+    if source.kind < kind:
+        return older | Q(**{source.time_field: value})
+    if source.kind == kind:
+        return older | Q(**{source.time_field: value, 'pk__lt': pk})
+    return older
+
+
+def _activity(source, row):
+    at = row[source.time_field]
+    title, summary = source.describe(row)
+    if source.model is Event:
+        event_id, event_name = row['id'], row['name']
+    else:
+        event_id, event_name = row.get('event_id'), row.get('event__name', '')
+    return Activity(_start_of(at) if source.is_date else at, source.kind, row['id'], title, summary, event_id, event_name)
+
+
+def _page_of(source, client, position, per_page):
+    """At most ``per_page`` rows of one source past ``position``, newest first, from one indexed query."""
+    rows = source.model.objects.filter(source.client_filter(client))
+    if position is not None:
+        rows = rows.filter(_seek(source, position))
+    rows = rows.order_by(f'-{source.time_field}', '-pk').values(*source.fields)[:per_page]
+    return (_activity(source, row) for row in rows)
+
+
+def encode_cursor(activity):
+    payload = json.dumps([activity.at.isoformat(), activity.kind, str(activity.pk)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(at, kind, pk) of the last item shown; a missing or tampered cursor starts from the newest activity."""
+    if not cursor:
+        return None
+    try:
+        at, kind, pk = json.loads(base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode()))
+        at = datetime.fromisoformat(at)
+        if timezone.is_naive(at):
+            return None
+        return at, kind, SOURCES_BY_KIND[kind].model._meta.pk.to_python(pk)
+    except (ValueError, TypeError, KeyError, binascii.Error, ValidationError):
+        return None
+
+
+def client_timeline(client, cursor=None, per_page=DEFAULT_PER_PAGE):
+    """
+    One page of ``client``'s activity, newest first, as a KeysetPage of Activity items with a
+    ``next_cursor`` for the older items. Costs one query per source whatever the page number:
+    each source contributes at most ``per_page + 1`` rows and the merge stops once the page is full.
+    """
+    position = decode_cursor(cursor)
+    streams = [_page_of(source, client, position, per_page + 1) for source in SOURCES]
+    merged = heapq.merge(*streams, key=lambda activity: activity.position, reverse=True)
+    items = list(islice(merged, per_page + 1))
+    has_next = len(items) > per_page
+    items = items[:per_page]
+    return KeysetPage(items, next_cursor=encode_cursor(items[-1]) if has_next else None)
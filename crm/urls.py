@@ -1,5 +1,5 @@
 from django.urls import path, register_converter, include
-from . import views
+from . import views, async_api
 from .views import TaskListView, TaskCreateView, TaskUpdateView, NoteCreateView, NoteListView, calendar_view
 from uuid import UUID
 
@@ -27,11 +27,11 @@ register_converter(UuidConverter, 'uuid')
 
 
 # Utility function to create item detail paths
-def detail_path(base_url, view_func, name_prefix):
+def detail_path(base_url, view_func, name_prefix, converter='uuid'):
     return [
-        path(f'{base_url}/<uuid:pk>/', view_func, name=f'{name_prefix}_detail'),
-        path(f'{base_url}/<uuid:pk>/edit/', view_func, name=f'{name_prefix}_edit'),
-        path(f'{base_url}/<uuid:pk>/delete/', view_func, name=f'{name_prefix}_delete')
+        path(f'{base_url}/<{converter}:pk>/', view_func, name=f'{name_prefix}_detail'),
+        path(f'{base_url}/<{converter}:pk>/edit/', view_func, name=f'{name_prefix}_edit'),
+        path(f'{base_url}/<{converter}:pk>/delete/', view_func, name=f'{name_prefix}_delete')
     ]
 
 
@@ -44,7 +44,8 @@ urlpatterns = [
     # Clients
     path('clients/', views.client_list, name='client_list'),
     path('clients/add/', views.client_create, name='client_create'),
-    *detail_path('clients', views.client_detail, 'client'),
+    *detail_path('clients', views.client_detail, 'client', converter='int'),  # Clients have integer keys
+    path('clients/<int:pk>/timeline/', views.client_timeline_view, name='client_timeline'),
 
     # Events
     path('events/', views.event_list, name='event_list'),
@@ -70,15 +71,42 @@ urlpatterns = [
     # Calendar
     path('calendar/', views.calendar_view, name='calendar'),
     path('appointment/', include('appointment.urls')),
-    #path('api/events/', views.event_list_json, name='event-list-json'),
-    #path('api/events/list/', EventListAPIView.as_view(), name='api_events'),
+    path('api/events/', views.event_list_json, name='event-list-json'),
+    path('api/events/list/', views.EventListAPIView.as_view(), name='api_events'),
+    path('api/events/conflicts/', views.EventConflictAPIView.as_view(), name='api_event_conflicts'),
+    path('api/availability/', views.availability_json, name='api_availability'),
+    path('api/clients/<int:pk>/timeline/', views.client_timeline_json, name='api_client_timeline'),
+
+    # iCalendar subscriptions
+    path('ics/clients/<int:pk>.ics', views.client_ics, name='ics_client'),
+    path('ics/vendors/<int:pk>.ics', views.vendor_ics, name='ics_vendor'),
+    path('ics/venues/<path:venue>.ics', views.venue_ics, name='ics_venue'),
+    path('ics/schedule.ics', views.schedule_ics, name='ics_schedule'),
+
+    # Async (ASGI) read-only API
+    path('api/async/events/', async_api.event_feed, name='async_event_feed'),
+    path('api/async/calendar/', async_api.calendar_data, name='async_calendar'),
+    path('api/async/dashboard/', async_api.dashboard_counts, name='async_dashboard'),
+    path('api/async/clients/', async_api.client_lookup, name='async_clients'),
+    path('events/<uuid:pk>/messages/stream/', async_api.message_stream, name='event_message_stream'),
+
+    # Search
+    path('search/', views.search_view, name='search'),
+    path('api/search/', views.search_json, name='api_search'),
 
     # Leads
     path('leads/', views.lead_list, name='lead_list'),
 
+    # Analytics (served from the rollup tables)
+    path('analytics/', views.analytics_view, name='analytics'),
+    path('api/analytics/', views.analytics_json, name='api_analytics'),
+
     # Vendors
     path('vendors/', views.vendor_list, name='vendors'),
 
+    # Profiling (staff only, fed by crm.profiling.ProfilingMiddleware)
+    path('profiling/', views.profiling_report, name='profiling_report'),
+
     # Authentication
     path('logout/', views.logout_view, name='logout'),
 ]
@@ -0,0 +1,92 @@
+"""
+Vendor double bookings: the same vendor assigned to two events whose ``start``/``end`` windows
+overlap. ``double_bookings`` checks one event against a set of vendors with a single range query
+(used when vendors are assigned and when an event is rescheduled); ``audit`` reads every
+assignment once, ordered by vendor and start, and sweeps each vendor's schedule in one pass.
+Canceled events hold nobody.
+"""
+import heapq
+from typing import Any, NamedTuple
+
+from django.db.models import Q
+
+from .models import Event
+
+FREE_STATUSES = ('canceled',)
+ROWS_PER_CHUNK = 2000
+
+Assignment = Event.vendors.through
+
+
+class Slot(NamedTuple):
+    event_id: Any
+    name: str
+    start: Any
+    end: Any
+
+
+class DoubleBooking(NamedTuple):
+    vendor_id: Any
+    vendor: str
+    event: Slot
+    other: Slot
+
+    def __str__(self):
+        return (
+            f"{self.vendor} is already booked for '{self.other.name}' "
+            f"({self.other.start:%Y-%m-%d %H:%M}-{self.other.end:%H:%M}), which overlaps '{self.event.name}'."
+        )
+
+
+ASSIGNMENT_FIELDS = ('vendor_id', 'vendor__name', 'event_id', 'event__name', 'event__start', 'event__end')
+
+
+def _booked():
+    return ~Q(event__status__in=FREE_STATUSES)
+
+
+def double_bookings(event, vendors):
+    """
+    Assignments of ``vendors`` (Vendor instances, ids or a queryset) to other events overlapping
+    ``event``'s window, as DoubleBookings. One range query however many vendors are passed.
+    """
+    if event.start is None or event.end is None or event.status in FREE_STATUSES:
+        return []
+    this = Slot(event.pk, event.name, event.start, event.end)
+    rows = (
+        Assignment.objects.filter(_booked(), vendor__in=vendors, event__start__lt=event.end, event__end__gt=event.start)
+        .exclude(event_id=event.pk).order_by('vendor__name', 'event__start').values_list(*ASSIGNMENT_FIELDS)
+    )
+    return [
+        DoubleBooking(vendor_id, vendor, this, Slot(event_id, name, start, end))
+        for vendor_id, vendor, event_id, name, start, end in rows
+    ]
+
+
+def _sweep(vendor_id, vendor, slots):
+    """Every overlapping pair in one vendor's slots, which arrive ordered by start."""
+    active = []  # Heap of (end, sequence, slot) still open at the current start
+    for sequence, slot in enumerate(slots):
+        while active and active[0][0] <= slot.start:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield DoubleBooking(vendor_id, vendor, slot, other)
+        heapq.heappush(active, (slot.end, sequence, slot))
+
+
+def audit():
+    """
+    Every double booking in the calendar, vendor by vendor. One query over the assignments,
+    streamed in chunks; memory holds one vendor's assignments at a time.
+    """
+    rows = (
+        Assignment.objects.filter(_booked()).order_by('vendor_id', 'event__start', 'event_id')
+        .values_list(*ASSIGNMENT_FIELDS).iterator(chunk_size=ROWS_PER_CHUNK)
+    )
+    current, vendor, slots = None, '', []
+    for vendor_id, vendor_name, event_id, name, start, end in rows:
+        if vendor_id != current:
+            yield from _sweep(current, vendor, slots)
+            current, vendor, slots = vendor_id, vendor_name, []
+        slots.append(Slot(event_id, name, start, end))
+    yield from _sweep(current, vendor, slots)
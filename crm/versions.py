@@ -0,0 +1,134 @@
+"""
+Version counters per collection (events, clients, ...), bumped on every write, and the
+``conditional`` view decorator built on them. A view's ETag comes from the versions of the
+collections it renders plus the request URL, so answering ``304 Not Modified`` costs one cache
+read (one Counter query on a miss) and no rendering or serializing at all. Unlike MAX(updated_at)
+or a row count, a version also changes when a row is deleted and another added.
+
+The cache must be shared by every process that writes (settings.CACHES): a bump made by the task
+cluster or a management command has to reach the web workers. Writers store the committed version
+once their transaction commits, and readers only fill in versions that are missing, so a reader
+that loaded the row before the commit cannot put the old version back.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import Counter
+
+EVENTS = 'event'
+CLIENTS = 'client'
+LEADS = 'lead'
+EMAILS = 'email'
+VENDORS = 'vendor'
+RECURRING_EVENTS = 'recurring-event'
+RECURRING_SCHEDULES = 'recurring-schedule'
+COLLECTIONS = (EVENTS, CLIENTS, LEADS, EMAILS, VENDORS, RECURRING_EVENTS, RECURRING_SCHEDULES)
+
+# Logged-in pages also show the sidebar counters, which follow these collections
+SIDEBAR = (LEADS, EVENTS, EMAILS)
+
+COUNTER_PREFIX = 'version:'
+CACHE_KEY_PREFIX = 'crm:version:'
+CACHE_TIMEOUT = 60 * 5  # Refreshed on every bump, the timeout only bounds how long a lost refresh lingers
+
+
+def _counter_name(collection):
+    return f"{COUNTER_PREFIX}{collection}"
+
+
+def _cache_key(collection):
+    return f"{CACHE_KEY_PREFIX}{collection}"
+
+
+def _load(collections):
+    """{collection: (version, changed_at)} straight from the Counter table, creating missing rows."""
+    rows = Counter.objects.filter(name__in=[_counter_name(collection) for collection in collections])
+    stored = {name[len(COUNTER_PREFIX):]: (value, updated) for name, value, updated in
+              rows.values_list('name', 'value', 'updated_at')}
+    for collection in collections:
+        if collection not in stored:
+            counter = Counter.objects.get_or_create(name=_counter_name(collection))[0]
+            stored[collection] = (counter.value, counter.updated_at)
+    return stored
+
+
+def get_versions(collections):
+    """{collection: (version, changed_at)}, from the cache first and the Counter table second."""
+    keys = {_cache_key(collection): collection for collection in collections}
+    versions = {keys[key]: value for key, value in cache.get_many(keys.keys()).items()}
+
+    missing = [collection for collection in collections if collection not in versions]
+    if missing:
+        stored = _load(missing)
+        for collection in missing:
+            # ``add``: a version stored by a writer that committed meanwhile wins over this read
+            cache.add(_cache_key(collection), stored[collection], CACHE_TIMEOUT)
+        versions.update(stored)
+    return versions
+
+
+def refresh(*collections):
+    """Store the committed versions of ``collections`` in the cache."""
+    stored = _load(collections)
+    cache.set_many({_cache_key(collection): stored[collection] for collection in collections}, CACHE_TIMEOUT)
+
+
+def bump(*collections):
+    """Mark collections as changed, inside the current transaction; the cache gets the new versions on commit."""
+    now = timezone.now()
+    for collection in collections:
+        name = _counter_name(collection)
+        if not Counter.objects.filter(name=name).update(value=F('value') + 1, updated_at=now):
+            Counter.objects.get_or_create(name=name, defaults={'value': 1})
+    transaction.on_commit(lambda: refresh(*collections))
+
+
+def conditional(*collections, per_user=False, extra=None):
+    """
+    ETag/Last-Modified for a view that only depends on ``collections`` and its URL. With
+    ``per_user`` the ETag also covers who is asking, for pages that differ per user; ``extra(request)``
+    adds anything else the response depends on. Those views get no Last-Modified, which could only
+    follow the collections and would answer 304 to a different user or after ``extra`` changed.
+    Works on plain views and, through ``method_decorator``, on DRF ``APIView`` methods.
+    """
+    collections = tuple(dict.fromkeys(collections))
+
+    def validators(request):
+        # Computed once per request even though both validator functions need it
+        memo = getattr(request, '_crm_versions', None)
+        if memo is None:
+            memo = request._crm_versions = get_versions(collections)
+        return memo
+
+    def etag(request, *args, **kwargs):
+        versions = validators(request)
+        parts = [f"{collection}:{versions[collection][0]}" for collection in collections]
+        parts += [request.get_full_path(), request.META.get('HTTP_ACCEPT', '')]
+        if per_user:
+            parts.append(str(request.user.pk))
+        if extra:
+            parts.append(str(extra(request)))
+        return hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return max(changed_at for _, changed_at in validators(request).values())
+
+    def decorator(view_func):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=None if per_user or extra else last_modified,
+        )(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Let browsers and pollers keep the copy but check back every time
+            response.setdefault('Cache-Control', 'private, no-cache' if per_user else 'no-cache')
+            return response
+        return wrapper
+    return decorator
@@ -4,15 +4,34 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.views.generic import ListView, CreateView, UpdateView
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, Http404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Client, Event, Task, Note, Lead, Email, Vendor
+from .models import Client, Event, Task, Note, Lead, Email, Vendor, EVENT_STATUS_CHOICES, LEAD_STATUS_CHOICES
 from .forms import ClientForm, EventForm, AddVendorToEventForm
-from .serializers import EventSerializer
+from .serializers import EventSerializer, BookingSerializer
+from .conflicts import Booking, find_conflicts
+from .availability import free_slots_by_day, MAX_MIN_HOURS, MAX_RANGE_DAYS
+from . import counters, ics, rollups, search, profiling, vendor_schedule, versions
+from .versions import conditional
+from .month_grid import month_grid
+from .recurrence import FEED_HORIZON, event_occurrences
+from .loaders import load_event_detail, load_client_detail
+from .exports import iter_values, streaming_export, EXPORT_FORMATS, JSON
+from .timeline import client_timeline, MAX_PER_PAGE as MAX_TIMELINE_PER_PAGE
+from .pagination import (
+    paginate, DEFAULT_PER_PAGE, EVENT_LIST_ORDERING, LEAD_LIST_ORDERING, CLIENT_LIST_ORDERING, EMAIL_LIST_ORDERING,
+    VENDOR_LIST_ORDERING,
+)
 from uuid import UUID
-from datetime import datetime, timedelta
+from operator import itemgetter
+import heapq
+import math
+from datetime import date, datetime, time, timedelta
 import calendar
 from calendar import HTMLCalendar
 
@@ -27,11 +46,7 @@ def home_view(request):
 # Dashboard View
 @login_required
 def dashboard_view(request):
-    context = {
-        'leads_count': Lead.objects.count(),
-        'events_count': Event.objects.count(),
-        'email_count': Email.objects.filter(is_read=False).count(),
-    }
+    context = counters.get_counts()
     return render(request, 'crm/dashboard.html', context)
 
 
@@ -54,6 +69,10 @@ def logout_view(request):
     return redirect('home')
 
 
+# Without ?month= the page shows the current month, so the date is part of the ETag
+@conditional(
+    versions.EVENTS, versions.RECURRING_EVENTS, *versions.SIDEBAR, per_user=True, extra=lambda request: date.today(),
+)
 def calendar_view(request):
     # Get current date or query parameters for month/year
     today = datetime.today()
@@ -64,31 +83,8 @@ def calendar_view(request):
     year = int(year)
     current_date = datetime(year, month, 1)
 
-    # Generate all dates to display in the calendar
-    first_day_of_month = current_date
-    last_day_of_month = datetime(year, month, calendar.monthrange(year, month)[1])
-
-    # Create a range to include surrounding days for the calendar grid
-    start_date = first_day_of_month - timedelta(days=first_day_of_month.weekday())  # Start from the previous Monday
-    end_date = last_day_of_month + timedelta(days=6 - last_day_of_month.weekday())  # End on the next Sunday
-
-    calendar_dates = [
-        start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)
-    ]
-
-    # Query database for events in the given month
-    month_events = Event.objects.filter(
-        event_date__year=year,
-        event_date__month=month,
-    )
-
-    # Associate events with specific calendar dates
-    events_by_date = {}
-    for event in month_events:
-        date_key = event.event_date.strftime('%Y-%m-%d')
-        if date_key not in events_by_date:
-            events_by_date[date_key] = []
-        events_by_date[date_key].append(event)
+    # Dates and events for the whole visible grid, leading and trailing days included (cached per month)
+    grid = month_grid(year, month)
 
     # Prepare navigation links
     previous_month = current_date - timedelta(days=1)
@@ -99,50 +95,233 @@ def calendar_view(request):
 
     # Pass data to the template
     context = {
-        'calendar_dates': calendar_dates,
+        'calendar_dates': grid['calendar_dates'],
         'current_month': current_date.strftime('%B %Y'),
+        'month': month,
         'previous_month': f"?month={previous_month.month}&year={previous_month.year}",
         'next_month': f"?month={next_month.month}&year={next_month.year}",
         'days_of_week': days_of_week,
-        'events_by_date': events_by_date,  # Key: date, Value: list of events
+        'events_by_date': grid['events_by_date'],  # Key: date, Value: list of events
     }
 
     return render(request, 'crm/calendar.html', context)
 
 
+EVENT_FEED_FIELDS = ('id', 'name', 'event_date', 'start', 'end')
 
-def event_list_json(request):  # New name
+
+def event_feed_row(row):
+    return {
+        "id": row['id'],
+        "title": row['name'],
+        "start": row['start'].isoformat(),
+        "end": row['end'].isoformat(),
+    }
+
+
+def feed_window(params):
+    """
+    (start_date, end_date, windowed) from ?start=&end= (ISO dates or datetimes, as FullCalendar
+    sends them). Without a window every stored event is listed, and recurring events from today
+    up to ``FEED_HORIZON`` ahead. Raises ValueError on malformed dates.
+    """
+    if params.get('start') and params.get('end'):
+        return date.fromisoformat(params['start'][:10]), date.fromisoformat(params['end'][:10]), True
+    today = date.today()
+    return today, today + FEED_HORIZON, False
+
+
+def event_feed_rows(start_date, end_date, windowed):
+    """
+    Event feed rows read in chunks from ``values_list``, oldest event first, merged with the
+    recurring event occurrences of the window as both are consumed.
+    """
     events = Event.objects.all()
-    data = [
-        {
-            "id": event.id,
-            "title": event.name,
-            "start": event.start.isoformat(),
-            "end": event.end.isoformat(),
-        }
-        for event in events
-    ]
-    return JsonResponse(data, safe=False)
+    if windowed:
+        events = events.filter(event_date__range=(start_date, end_date))
+    stored = iter_values(events, EVENT_FEED_FIELDS, ordering=EVENT_LIST_ORDERING)
+    for row in heapq.merge(stored, event_occurrences(start_date, end_date), key=itemgetter('event_date')):
+        yield event_feed_row(row)
 
 
+@conditional(versions.EVENTS, versions.RECURRING_EVENTS, extra=lambda request: date.today())
+def event_list_json(request):  # New name
+    # Streamed as a JSON array by default, ?export=ndjson for one event per line
+    export_format = request.GET.get('export', JSON)
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"Unknown export format '{export_format}'."}, status=400)
+    try:
+        window = feed_window(request.GET)
+    except ValueError:
+        return JsonResponse({'error': "Pass start and end as ISO dates."}, status=400)
+    return streaming_export(event_feed_rows(*window), export_format)
+
+
+def availability_json(request):
+    """Free slots per day, e.g. ?start=2025-06-01&end=2025-06-30&min_hours=2&open=08:00&close=22:00&venue=Hall"""
+    try:
+        start_date = date.fromisoformat(request.GET['start'])
+        end_date = date.fromisoformat(request.GET.get('end', request.GET['start']))
+        min_hours = float(request.GET.get('min_hours', 0))
+        opens = time.fromisoformat(request.GET.get('open', '00:00'))
+        closes = time.fromisoformat(request.GET['close']) if request.GET.get('close') else None
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "Pass start (and optionally end) as YYYY-MM-DD, min_hours, open/close as HH:MM."},
+                            status=400)
+    if not (math.isfinite(min_hours) and 0 <= min_hours <= MAX_MIN_HOURS):
+        return JsonResponse({'error': f"min_hours must be between 0 and {MAX_MIN_HOURS}."}, status=400)
+    min_duration = timedelta(hours=min_hours)
+    if end_date < start_date or (end_date - start_date).days >= MAX_RANGE_DAYS:
+        return JsonResponse({'error': f"The range must be between 1 and {MAX_RANGE_DAYS} days."}, status=400)
+
+    days = free_slots_by_day(start_date, end_date, min_duration, opens, closes, venue=request.GET.get('venue'))
+    return JsonResponse({
+        'start': start_date,
+        'end': end_date,
+        'min_minutes': int(min_duration.total_seconds() // 60),
+        'days': [
+            {'date': day, 'free': [{'start': slot.start.isoformat(), 'end': slot.end.isoformat()} for slot in slots]}
+            for day, slots in days
+        ],
+    })
+
+
+# iCalendar subscriptions (crm/ics.py): staff can open any feed, calendar apps need the URL's token
+def _ics_feed(request, kind, key):
+    if not (request.user.is_staff or ics.check_token(kind, key, request.GET.get('token'))):
+        raise Http404("No such feed.")
+    response = ics.feed_response(request, kind, key)
+    if response is None:
+        raise Http404("No such feed.")
+    return response
+
+
+def client_ics(request, pk):
+    return _ics_feed(request, ics.CLIENT, pk)
+
+
+def vendor_ics(request, pk):
+    return _ics_feed(request, ics.VENDOR, pk)
+
+
+def venue_ics(request, venue):
+    return _ics_feed(request, ics.VENUE, venue)
+
+
+def schedule_ics(request):
+    return _ics_feed(request, ics.SCHEDULE, ics.SCHEDULE_KEY)
+
+
+ANALYTICS_DEFAULT_YEARS = 3  # Calendar years shown when no ?start= is given
+
+
+def _analytics_window(params):
+    """(period, start_date, end_date) from ?period=day|month&start=&end=; raises ValueError on bad input."""
+    period = params.get('period', rollups.MONTH)
+    if period not in rollups.PERIODS:
+        raise ValueError(period)
+    end_date = date.fromisoformat(params['end']) if params.get('end') else date.today()
+    if params.get('start'):
+        start_date = date.fromisoformat(params['start'])
+    else:
+        start_date = date(end_date.year - ANALYTICS_DEFAULT_YEARS + 1, 1, 1)
+    if end_date < start_date or (period == rollups.DAY and (end_date - start_date).days >= MAX_RANGE_DAYS):
+        raise ValueError(start_date)
+    return period, start_date, end_date
+
+
+def _analytics(params):
+    period, start_date, end_date = _analytics_window(params)
+    return {
+        'period': period,
+        'start': start_date,
+        'end': end_date,
+        'leads': rollups.lead_funnel(period, start_date, end_date),
+        'events': rollups.report(rollups.EVENTS, period, start_date, end_date),
+    }
+
+
+ANALYTICS_ERROR = f"Pass period as day or month and start/end as YYYY-MM-DD; daily ranges cover at most {MAX_RANGE_DAYS} days."
+
+
+@login_required
+@conditional(versions.LEADS, versions.EVENTS, extra=lambda request: date.today())
+def analytics_json(request):
+    """Lead funnel and event pipeline per day or month, read from the rollup tables only."""
+    try:
+        return JsonResponse(_analytics(request.GET))
+    except ValueError:
+        return JsonResponse({'error': ANALYTICS_ERROR}, status=400)
+
+
+@login_required
+@conditional(versions.LEADS, versions.EVENTS, *versions.SIDEBAR, per_user=True, extra=lambda request: date.today())
+def analytics_view(request):
+    try:
+        context = _analytics(request.GET)
+    except ValueError:
+        return HttpResponse(ANALYTICS_ERROR, status=400)
+    context.update({
+        'lead_statuses': LEAD_STATUS_CHOICES,
+        'event_statuses': EVENT_STATUS_CHOICES,
+    })
+    return render(request, 'crm/analytics.html', context)
+
+
+@method_decorator(conditional(versions.EVENTS), name='get')
 class EventListAPIView(APIView):
     def get(self, request):
+        export_format = request.query_params.get('export')
+        if export_format:
+            return self.export(export_format)
         events = Event.objects.all()
         serializer = EventSerializer(events, many=True)
         return Response(serializer.data)
 
+    def export(self, export_format):
+        """Stream every event using the serializer's field formatting but no model instances."""
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"Unknown export format '{export_format}'."}, status=400)
+        fields = EventSerializer().fields
+        names = tuple(fields.keys())
+        rows = (
+            {name: None if value is None else fields[name].to_representation(value) for name, value in row.items()}
+            for row in iter_values(Event.objects.all(), names, ordering=EVENT_LIST_ORDERING)
+        )
+        return streaming_export(rows, export_format, filename='events')
+
+
+class EventConflictAPIView(APIView):
+    """POST a list of proposed bookings, get back every conflict with stored events or each other."""
+
+    def post(self, request):
+        serializer = BookingSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        bookings = [Booking(ref=index, **data) for index, data in enumerate(serializer.validated_data)]
+        conflicts = []
+        for conflict in find_conflicts(bookings):
+            other = {'event': conflict.other.id, 'name': conflict.other.ref} if conflict.existing \
+                else {'index': conflict.other.ref}
+            conflicts.append({'index': conflict.booking.ref, 'conflicts_with': other})
+        return Response({'conflicts': conflicts})
+
 
 # Event Views
+@conditional(versions.EVENTS, *versions.SIDEBAR, per_user=True)
 def event_list(request):
-    events = Event.objects.all()
-    return render(request, 'crm/event_list.html', {'events': events})
+    page = paginate(request, Event.objects.all(), EVENT_LIST_ORDERING)
+    return render(request, 'crm/event_list.html', {'events': page.object_list, 'page': page})
 
 
 def event_detail(request, pk):
-    event = get_object_or_404(Event, pk=pk)
+    event = load_event_detail(pk)  # Client, tasks, messages and vendors in a fixed number of queries
     tasks = event.tasks.all()
-    messages = event.messages.all()
-    return render(request, 'crm/event_detail.html', {'event': event, 'tasks': tasks, 'messages': messages})
+    messages = list(event.messages.all())
+    return render(request, 'crm/event_detail.html', {
+        'event': event, 'tasks': tasks, 'messages': messages, 'vendors': event.vendors.all(),
+        'last_message_id': messages[-1].pk if messages else 0,  # Where the live stream picks up
+        'venue_feed_url': ics.feed_url(ics.VENUE, event.venue),
+    })
 
 
 def event_create(request):
@@ -182,9 +361,14 @@ def add_vendor_to_event(request, pk):
     if request.method == "POST":
         form = AddVendorToEventForm(request.POST)
         if form.is_valid():
-            vendor = form.cleaned_data['vendor']
-            event.vendors.add(vendor)
-            return redirect('event_detail', pk=event.pk)
+            vendors = form.cleaned_data['vendors']
+            clashes = vendor_schedule.double_bookings(event, vendors)
+            if clashes:
+                for clash in clashes:
+                    form.add_error('vendors', str(clash))
+            else:
+                event.vendors.add(*vendors)
+                return redirect('event_detail', pk=event.pk)
     else:
         form = AddVendorToEventForm()
     return render(request, 'crm/add_vendor_to_event.html', {'event': event, 'form': form})
@@ -199,20 +383,47 @@ def remove_vendor_from_event(request, event_pk, vendor_pk):
     return render(request, 'crm/remove_vendor.html', {'event': event, 'vendor': vendor})
 
 # Leads
+@conditional(versions.LEADS, *versions.SIDEBAR, per_user=True)
 def lead_list(request):
-    leads = Lead.objects.all()
-    return render(request, 'crm/lead_list.html', {'leads': leads})
+    page = paginate(request, Lead.objects.all(), LEAD_LIST_ORDERING)
+    return render(request, 'crm/lead_list.html', {'leads': page.object_list, 'page': page})
 
 
 # Clients
+@conditional(versions.CLIENTS, *versions.SIDEBAR, per_user=True)
 def client_list(request):
-    clients = Client.objects.all()
-    return render(request, 'crm/client_list.html', {'clients': clients})
+    page = paginate(request, Client.objects.all(), CLIENT_LIST_ORDERING)
+    return render(request, 'crm/client_list.html', {'clients': page.object_list, 'page': page})
 
 
 def client_detail(request, pk):
+    client = load_client_detail(pk)
+    return render(request, 'crm/client_detail.html', {
+        'client': client, 'events': client.events.all(), 'calendar_feed_url': ics.feed_url(ics.CLIENT, client.pk),
+    })
+
+
+def _timeline_page(request, pk):
     client = get_object_or_404(Client, pk=pk)
-    return render(request, 'crm/client_detail.html', {'client': client})
+    limit = request.GET.get('limit', '')
+    per_page = min(int(limit), MAX_TIMELINE_PER_PAGE) if limit.isdigit() and int(limit) > 0 else DEFAULT_PER_PAGE
+    return client, client_timeline(client, request.GET.get('cursor'), per_page)
+
+
+def client_timeline_view(request, pk):
+    """Everything that happened around a client, newest first, one cursor page at a time."""
+    client, page = _timeline_page(request, pk)
+    return render(request, 'crm/client_timeline.html', {'client': client, 'activities': page.object_list, 'page': page})
+
+
+def client_timeline_json(request, pk):
+    """?cursor= from the previous response's ``next_cursor``, ?limit= up to ``MAX_TIMELINE_PER_PAGE``."""
+    client, page = _timeline_page(request, pk)
+    return JsonResponse({
+        'client': client.pk,
+        'items': [activity._asdict() for activity in page.object_list],
+        'next_cursor': page.next_cursor,
+    })
 
 
 def client_create(request):
@@ -275,11 +486,60 @@ class NoteCreateView(CreateView):
 
 
 # Emails
+@conditional(versions.EMAILS, *versions.SIDEBAR, per_user=True)
 def email_list(request):
-    emails = Email.objects.all()
-    return render(request, 'crm/email_list.html', {'emails': emails})
+    page = paginate(request, Email.objects.all(), EMAIL_LIST_ORDERING)
+    return render(request, 'crm/email_list.html', {'emails': page.object_list, 'page': page})
 
 # Vendor list view (add this to your views.py)
+@conditional(versions.VENDORS, *versions.SIDEBAR, per_user=True)
 def vendor_list(request):
-    vendors = Vendor.objects.all()  # Assuming Vendor is a model imported correctly
-    return render(request, 'crm/vendor_list.html', {'vendors': vendors})
+    page = paginate(request, Vendor.objects.all(), VENDOR_LIST_ORDERING)
+    return render(request, 'crm/vendor_list.html', {'vendors': page.object_list, 'page': page})
+
+
+# Search
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind') or None
+    results = search.search(query, kind=kind) if query else []
+    return render(request, 'crm/search.html', {
+        'query': query,
+        'kind': kind,
+        'kinds': search.INDEXED.keys(),
+        'results': results,
+    })
+
+
+def search_json(request):
+    """Ranked full-text matches, e.g. ?q=smith barn&kind=note&limit=20"""
+    try:
+        limit = int(request.GET.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': "limit must be a number."}, status=400)
+    kind = request.GET.get('kind') or None
+    if kind and kind not in search.INDEXED:
+        return JsonResponse({'error': f"Unknown kind '{kind}'."}, status=400)
+    results = search.search(request.GET.get('q', ''), kind=kind, limit=limit)
+    return JsonResponse({'results': [result._asdict() for result in results]})
+
+
+# Profiling
+@staff_member_required
+def profiling_report(request):
+    """Hot-path table from ProfilingMiddleware samples. ?format=json for JSON, POST to reset."""
+    if request.method == "POST":
+        profiling.store.reset()
+        return redirect('profiling_report')
+    rows = profiling.store.report()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'sample_rate': settings.CRM_PROFILING_SAMPLE_RATE, 'views': rows})
+
+    columns = ['url_name', 'requests'] + [
+        f'{metric}_p{percent}' for metric in profiling.METRICS for percent in profiling.PERCENTILES
+    ]
+    lines = ['\t'.join(columns)]
+    lines += ['\t'.join(str(row[column]) for column in columns) for row in rows]
+    lines += ['', 'Most repeated query per view (N+1 suspects):']
+    lines += [f"{row['url_name']}: {row['top_repeated_query']}" for row in rows if row['top_repeated_query']]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain')